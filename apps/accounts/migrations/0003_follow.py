@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL)),
+                ('follower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Follow',
+                'verbose_name_plural': 'Follows',
+                'db_table': 'follows',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['author', 'follower'], name='follows_author__537a65_idx')],
+                'constraints': [models.UniqueConstraint(fields=('follower', 'author'), name='unique_follow'), models.CheckConstraint(condition=models.Q(('follower', models.F('author')), _negated=True), name='no_self_follow')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_follow'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['created_at'], name='follows_created_95ec29_idx'),
+        ),
+    ]
@@ -4,14 +4,20 @@ from django.db import models
 
 class User(AbstractUser):
     """Кастомная модель пользователя"""
+    COUNTER_FIELDS = ('followers_count',)
+
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=30, blank=True)
     last_name = models.CharField(max_length=30, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Уменьшенные копии аватара (см. apps.main.images)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Количество подписчиков, поддерживается сигналами Follow
+    followers_count = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -24,6 +30,54 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Счетчик подписчиков меняется только через F()-выражения
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
+
+
+class Follow(models.Model):
+    """Подписка пользователя на автора"""
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='followers'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'follows'
+        verbose_name = 'Follow'
+        verbose_name_plural = 'Follows'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'author'], name='unique_follow'),
+            models.CheckConstraint(
+                condition=~models.Q(follower=models.F('author')), name='no_self_follow'
+            ),
+        ]
+        indexes = [
+            # Перебор подписчиков автора пачками по id при fan-out
+            models.Index(fields=['author', 'follower']),
+            # Новые подписки за день для статистики авторов
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} -> {self.author_id}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from apps.main.images import variant_urls
 from .models import User
 
 
@@ -68,12 +69,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     posts_count = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
             'id', 'username', 'email', 'first_name', 'last_name',
-            'full_name', 'avatar', 'bio', 'created_at', 'updated_at',
+            'full_name', 'avatar', 'avatar_variants', 'bio', 'created_at', 'updated_at',
             'posts_count', 'comments_count'
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
@@ -86,6 +88,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             # Если атрибут posts не существует, возвращаем 0
             return 0
     
+    def get_avatar_variants(self, obj):
+        """Уменьшенные копии аватара (оригинал, пока они не готовы)"""
+        return variant_urls(obj, 'avatar')
+
     def get_comments_count(self, obj):
         """Безопасное получение количества комментариев"""
         try:
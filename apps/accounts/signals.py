@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.main.images import schedule_variants
+from apps.main.timelines import add_author_posts, remove_author_posts
+from .models import Follow, User
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, **kwargs):
+    """Ставит в очередь построение уменьшенных копий нового аватара"""
+    schedule_variants(instance, 'avatar')
+
+
+@receiver(post_save, sender=Follow)
+def follow_post_save(sender, instance, created, **kwargs):
+    """Увеличивает счетчик подписчиков и добавляет посты автора в ленту"""
+    if not created:
+        return
+    User.objects.filter(pk=instance.author_id).update(followers_count=F('followers_count') + 1)
+    transaction.on_commit(partial(add_author_posts, instance.follower_id, instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_post_delete(sender, instance, **kwargs):
+    """Уменьшает счетчик подписчиков и убирает посты автора из ленты"""
+    User.objects.filter(pk=instance.author_id).update(
+        followers_count=Greatest(F('followers_count') - 1, 0)
+    )
+    transaction.on_commit(partial(remove_author_posts, instance.follower_id, instance.author_id))
@@ -3,8 +3,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import login
+from django.shortcuts import get_object_or_404
 
-from .models import User
+from .models import Follow, User
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -60,6 +61,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     """Просмотр и обновление профиля"""
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 6}
 
     def get_object(self):
         return self.request.user
@@ -105,3 +107,28 @@ def logout_view(request):
             'error': 'Invalid token'
         }, status=status.HTTP_400_BAD_REQUEST)
 
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def follow_user(request, user_id):
+    """Подписаться на автора (POST) или отписаться (DELETE)"""
+    author = get_object_or_404(User, pk=user_id, is_active=True)
+    if author == request.user:
+        return Response({
+            'error': 'You cannot follow yourself'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method == 'POST':
+        _, created = Follow.objects.get_or_create(follower=request.user, author=author)
+        response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    else:
+        # delete() по объектам, чтобы сработали сигналы счетчика и ленты
+        for follow in Follow.objects.filter(follower=request.user, author=author):
+            follow.delete()
+        response_status = status.HTTP_200_OK
+
+    author.refresh_from_db(fields=['followers_count'])
+    return Response({
+        'following': request.method == 'POST',
+        'followers_count': author.followers_count,
+    }, status=response_status)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+        ('main', '0002_post_comments_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['is_active', '-created_at'], name='comments_is_acti_6539ae_idx'),
+        ),
+    ]
@@ -1,7 +1,60 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 
+class CommentQuerySet(models.QuerySet):
+    """QuerySet комментариев с поддержкой счетчика Post.comments_count"""
+
+    def with_replies_count(self):
+        """Число активных ответов подзапросом: replies_count без запроса на каждую строку"""
+        replies = (
+            Comment.objects.filter(parent=models.OuterRef('pk'), is_active=True)
+            .order_by().values('parent').annotate(total=models.Count('pk')).values('total')
+        )
+        return self.annotate(active_replies_count=Coalesce(models.Subquery(replies), 0))
+
+    def with_active_replies(self):
+        """Предзагружает активные ответы с авторами в active_replies"""
+        return self.prefetch_related(models.Prefetch(
+            'replies',
+            queryset=Comment.objects.filter(is_active=True).select_related('author')
+            .with_replies_count().order_by('created_at'),
+            to_attr='active_replies',
+        ))
+
+    def set_active(self, is_active):
+        """
+        Массово меняет is_active и корректирует счетчики комментариев постов.
+        Возвращает количество измененных комментариев.
+        """
+        from apps.main.models import Post
+        from .signals import invalidate_comment_tags
+
+        with transaction.atomic():
+            # Блокируем изменяемые строки, чтобы дельты совпали с UPDATE
+            rows = list(
+                self.exclude(is_active=is_active)
+                .select_for_update()
+                .order_by()
+                .values_list('id', 'post_id')
+            )
+            if not rows:
+                return 0
+
+            per_post = Counter(post_id for _, post_id in rows)
+            updated = Comment.objects.filter(
+                id__in=[comment_id for comment_id, _ in rows]
+            ).update(is_active=is_active)
+
+            for post_id, total in per_post.items():
+                Post.objects.adjust_comments_count(post_id, total if is_active else -total)
+        invalidate_comment_tags(per_post)
+        return updated
+
+
 class Comment(models.Model):
     """Модель комментария"""
     post = models.ForeignKey(
@@ -26,6 +79,8 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         db_table = 'comments'
         verbose_name = 'Comment'
@@ -35,6 +90,7 @@ class Comment(models.Model):
             models.Index(fields=['post', '-created_at']),
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['parent', '-created_at']),
+            models.Index(fields=['is_active', '-created_at']),
         ]
 
     def __str__(self):
@@ -42,8 +98,11 @@ class Comment(models.Model):
 
     @property
     def replies_count(self):
+        # Списки получают число аннотацией (CommentQuerySet.with_replies_count)
+        if hasattr(self, 'active_replies_count'):
+            return self.active_replies_count
         return self.replies.filter(is_active=True).count()
 
     @property
     def is_reply(self):
-        return self.parent is not None
+        return self.parent_id is not None
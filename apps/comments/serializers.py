@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from .models import Comment
+from apps.main.images import variant_url
 from apps.main.models import Post
+from apps.main.sparse import SparseFieldsetSerializerMixin
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Базовый сериализатор для комментариев"""
     author_info = serializers.SerializerMethodField()
     replies_count = serializers.ReadOnlyField()
@@ -17,13 +19,22 @@ class CommentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['author', 'is_active']
+        # Колонки и связи полей для ?fields= (см. apps.main.sparse)
+        field_sources = {
+            'author_info': (
+                'author__username', 'author__first_name', 'author__last_name',
+                'author__avatar', 'author__avatar_variants',
+            ),
+            'is_reply': ('parent',),
+            'replies_count': (),
+        }
 
     def get_author_info(self, obj):
         return {
             'id': obj.author.id,
             'username': obj.author.username,
             'full_name': obj.author.full_name,
-            'avatar': obj.author.avatar.url if obj.author.avatar else None
+            'avatar': variant_url(obj.author, 'avatar', 'thumb')
         }
     
 
@@ -72,8 +83,13 @@ class CommentDetailSerializer(CommentSerializer):
         fields = CommentSerializer.Meta.fields + ['replies']
 
     def get_replies(self, obj):
-        if obj.parent is None:  # Показываем ответы только для основных комментариев
-            replies = obj.replies.filter(is_active=True).order_by('created_at')
+        if obj.parent_id is None:  # Показываем ответы только для основных комментариев
+            # Списки предзагружают ответы (CommentQuerySet.with_active_replies)
+            replies = getattr(obj, 'active_replies', None)
+            if replies is None:
+                replies = obj.replies.filter(is_active=True).select_related(
+                    'author'
+                ).with_replies_count().order_by('created_at')
             return CommentSerializer(replies, many=True, context=self.context).data
         return []
     
@@ -0,0 +1,67 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.main.models import Post
+from apps.main.response_cache import invalidate_tags
+from .models import Comment
+
+
+def invalidate_comment_tags(post_ids, counts_changed=True):
+    """
+    Меняет версии комментариев постов; при изменении счетчика
+    также версии самих постов и ленты, где показан comments_count
+    """
+    tags = [f'comments:{post_id}' for post_id in post_ids]
+    if counts_changed:
+        tags += [f'post:{post_id}' for post_id in post_ids] + ['feed']
+    invalidate_tags(*tags)
+
+
+def _remember_state(instance):
+    """Запоминает сохраненное в БД состояние комментария"""
+    if instance.pk is None:
+        instance._saved_post_id = None
+        instance._saved_is_active = False
+    else:
+        # Читаем через __dict__, чтобы не загружать отложенные поля
+        instance._saved_post_id = instance.__dict__.get('post_id')
+        instance._saved_is_active = instance.__dict__.get('is_active', False)
+
+
+@receiver(post_init, sender=Comment)
+def comment_post_init(sender, instance, **kwargs):
+    """Обработчик загрузки комментария"""
+    _remember_state(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_post_save(sender, instance, created, **kwargs):
+    """Поддерживает Post.comments_count при создании и изменении комментария"""
+    was_active = False if created else instance._saved_is_active
+    old_post_id = None if created else instance._saved_post_id
+
+    if old_post_id is not None and old_post_id != instance.post_id:
+        # Комментарий перенесен в другой пост
+        if was_active:
+            Post.objects.adjust_comments_count(old_post_id, -1)
+        if instance.is_active:
+            Post.objects.adjust_comments_count(instance.post_id, 1)
+        invalidate_comment_tags([old_post_id, instance.post_id], was_active or instance.is_active)
+    elif was_active != instance.is_active:
+        Post.objects.adjust_comments_count(instance.post_id, 1 if instance.is_active else -1)
+        invalidate_comment_tags([instance.post_id])
+    else:
+        invalidate_comment_tags([instance.post_id], counts_changed=False)
+
+    _remember_state(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_post_delete(sender, instance, origin=None, **kwargs):
+    """Уменьшает счетчик при физическом удалении комментария"""
+    # При удалении самого поста счетчик обновлять не нужно
+    if isinstance(origin, Post):
+        return
+    if instance._saved_is_active:
+        Post.objects.adjust_comments_count(instance._saved_post_id, -1)
+    invalidate_comment_tags([instance._saved_post_id], instance._saved_is_active)
@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -90,6 +93,139 @@ class CommentModelTests(TestCase):
         self.assertEqual(parent_comment.replies_count, 3)
 
 
+class CommentsCountTests(TestCase):
+    """Test the denormalized Post.comments_count column"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Counted Post',
+            content='Post with counted comments',
+            author=self.user,
+            status='published'
+        )
+
+    def add_comment(self, **kwargs):
+        kwargs.setdefault('content', 'Comment')
+        return Comment.objects.create(post=self.post, author=self.user, **kwargs)
+
+    def assertCommentsCount(self, expected):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, expected)
+
+    def test_create_increments_count(self):
+        """Test creating active comments and replies increments the counter"""
+        parent = self.add_comment()
+        self.add_comment(parent=parent)
+        self.add_comment(is_active=False)
+        self.assertCommentsCount(2)
+
+    def test_soft_delete_and_restore(self):
+        """Test toggling is_active through save() keeps the counter in sync"""
+        comment = self.add_comment()
+        comment.is_active = False
+        comment.save()
+        self.assertCommentsCount(0)
+
+        comment.is_active = True
+        comment.save()
+        self.assertCommentsCount(1)
+
+    def test_hard_delete_decrements_count(self):
+        """Test hard deletes, including cascaded replies, decrement the counter"""
+        parent = self.add_comment()
+        self.add_comment(parent=parent)
+        inactive = self.add_comment(is_active=False)
+
+        inactive.delete()
+        self.assertCommentsCount(2)
+        parent.delete()
+        self.assertCommentsCount(0)
+
+    def test_bulk_set_active(self):
+        """Test queryset.set_active() used by admin bulk actions"""
+        comments = [self.add_comment() for _ in range(3)]
+
+        updated = Comment.objects.filter(id__in=[c.id for c in comments[:2]]).set_active(False)
+        self.assertEqual(updated, 2)
+        self.assertCommentsCount(1)
+
+        # Already inactive rows are not counted twice
+        updated = Comment.objects.filter(post=self.post).set_active(False)
+        self.assertEqual(updated, 1)
+        self.assertCommentsCount(0)
+
+        Comment.objects.filter(post=self.post).set_active(True)
+        self.assertCommentsCount(3)
+
+    def test_post_edit_does_not_overwrite_count(self):
+        """Test saving a stale post instance keeps the stored counter"""
+        stale_post = Post.objects.get(pk=self.post.pk)
+        self.add_comment()
+
+        stale_post.title = 'Edited title'
+        stale_post.save()
+        self.assertCommentsCount(1)
+
+    def test_reconcile_command_fixes_drift(self):
+        """Test reconcile_comments_count repairs drifted counters"""
+        self.add_comment()
+        self.add_comment()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=7)
+
+        out = StringIO()
+        call_command('reconcile_comments_count', '--chunk-size', '1', '--dry-run', stdout=out)
+        self.assertIn('stored 7, actual 2', out.getvalue())
+        self.assertCommentsCount(7)
+
+        call_command('reconcile_comments_count', '--chunk-size', '1', stdout=StringIO())
+        self.assertCommentsCount(2)
+
+
+class PostCommentsConditionalTests(TestCase):
+    """Test ETag revalidation of the post comments endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Discussed Post',
+            content='Post with comments',
+            author=self.user,
+            status='published'
+        )
+        self.comment = Comment.objects.create(post=self.post, author=self.user, content='First')
+        self.url = f'/api/v1/comments/post/{self.post.id}/'
+
+    def test_unchanged_comments_return_304(self):
+        """Test If-None-Match with the current ETag returns 304"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_changes_invalidate_etag(self):
+        """Test editing, adding and bulk-hiding comments change the ETag"""
+        etag = self.client.get(self.url)['ETag']
+
+        self.comment.content = 'Edited'
+        self.comment.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Comment.objects.filter(pk=self.comment.pk).set_active(False)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['comments_count'], 0)
+
+
 class CommentAPICurlTests(APITestCase):
     """Test Comments API endpoints with CURL command generation"""
     
@@ -140,6 +276,24 @@ class CommentAPICurlTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_comment_list_cursor_pagination(self):
+        """Test comment lists page with cursors and no total count"""
+        for i in range(4):
+            Comment.objects.create(post=self.post, author=self.user2, content=f'Comment {i}')
+
+        url = f"{reverse('comment-list')}?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(comment['id'] for comment in response.data['results'])
+            url = response.data['next']
+
+        expected = list(
+            Comment.objects.filter(is_active=True).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
     def test_comment_create_authenticated(self):
         """Test comment creation with authentication"""
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token1}')
@@ -205,6 +359,8 @@ class CommentAPICurlTests(APITestCase):
         # Check that comment still exists but is inactive
         self.comment.refresh_from_db()
         self.assertFalse(self.comment.is_active)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
 
     def test_my_comments(self):
         """Test my comments endpoint"""
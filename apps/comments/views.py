@@ -2,7 +2,7 @@ from rest_framework import generics, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 
 from .models import Comment
 from .serializers import (
@@ -13,21 +13,28 @@ from .serializers import (
 )
 from .permissions import IsAuthorOrReadOnly
 from apps.main.models import Post
+from apps.main.pagination import KeysetPagination
+from apps.main.query_budget import query_budget
+from apps.main.asyncapi import aserialize, async_api_view
+from apps.main.conditional import Validators, request_parts
+from apps.main.sparse import SparseFieldsetViewMixin
 
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """Список и создание комментариев"""
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['post', 'author', 'parent']
     search_fields = ['content']
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    query_budget = {'GET': 5}
 
     def get_queryset(self):
         return Comment.objects.filter(is_active=True).select_related(
             'author', 'post', 'parent'
-        )
+        ).with_replies_count()
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -37,7 +44,9 @@ class CommentListCreateView(generics.ListCreateAPIView):
 
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Детальный просмотр, обновление и удаление комментария"""
-    queryset = Comment.objects.filter(is_active=True).select_related('author', 'post')
+    queryset = Comment.objects.filter(is_active=True).select_related(
+        'author', 'post'
+    ).with_replies_count().with_active_replies()
     serializer_class = CommentDetailSerializer
     permission_classes = [IsAuthorOrReadOnly]
 
@@ -47,62 +56,74 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
         return CommentDetailSerializer
 
     def perform_destroy(self, instance):
-        # Мягкое удаление - помечаем как неактивный
+        # Мягкое удаление - помечаем как неактивный,
+        # счетчик поста уменьшается в обработчике post_save
         instance.is_active = False
-        instance.save()
+        instance.save(update_fields=['is_active', 'updated_at'])
 
 
-class MyCommentsView(generics.ListAPIView):
+class MyCommentsView(SparseFieldsetViewMixin, generics.ListAPIView):
     """Список комментариев текущего пользователя"""
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['post', 'parent', 'is_active']
     search_fields = ['content']
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    query_budget = 5
 
     def get_queryset(self):
         return Comment.objects.filter(author=self.request.user).select_related(
-            'post', 'parent'
-        )
+            'author', 'post', 'parent'
+        ).with_replies_count()
     
-@api_view(['GET'])
+@query_budget(5)
+@async_api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def post_comments(request, post_id):
+async def post_comments(request, post_id):
     """Получить комментарий к определенному посту"""
-    post = get_object_or_404(Post, id=post_id, status='published')
+    post = await aget_object_or_404(Post, id=post_id, status='published')
+
+    validators = await Validators.acreate(
+        [f'comments:{post.id}', f'post:{post.id}'], *request_parts(request)
+    )
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
 
     # Получаем только основные комментарии
-    comments = Comment.objects.filter(
+    comments = [comment async for comment in Comment.objects.filter(
         post=post,
         parent=None,
         is_active=True
-    ).select_related('author').prefetch_related(
-        'replies__author'
-    ).order_by('-created_at')
+    ).select_related('author').with_replies_count().with_active_replies().order_by('-created_at')]
 
     serializer = CommentDetailSerializer(comments, many=True, context={'request': request})
-    return Response({
+    return validators.apply(Response({
         'post': {
             'id': post.id,
             'title': post.title,
             'slug': post.slug
         },
-        'comments': serializer.data,
-        'comments_count': post.comments.filter(is_active=True).count()
-    })
+        'comments': await aserialize(serializer),
+        'comments_count': post.comments_count
+    }))
 
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def comment_replies(request, comment_id):
     """Получить ответы на комментарий"""
-    parent_comment = get_object_or_404(Comment, id=comment_id, is_active=True)
+    parent_comment = get_object_or_404(
+        Comment.objects.select_related('author').with_replies_count(), id=comment_id, is_active=True
+    )
     
     replies = Comment.objects.filter(
         parent=parent_comment,
         is_active=True
-    ).select_related('author').order_by('created_at')
+    ).select_related('author').with_replies_count().order_by('created_at')
     
     serializer = CommentSerializer(replies, many=True, context={'request': request})
     return Response({
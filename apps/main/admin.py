@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Category, Post
+from .leaderboards import ALL_TIME, DAY, WEEK, top_post_ids
 
 
 @admin.register(Category)
@@ -9,11 +10,26 @@ class CategoryAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'posts_count')
 
-    def posts_count(self, obj):
-        return obj.posts.count()
-    posts_count.short_description = 'Posts Count'
+
+class LeaderboardFilter(admin.SimpleListFilter):
+    """Самые просматриваемые посты из лидерборда, без сортировки всей таблицы"""
+    title = 'Top viewed'
+    parameter_name = 'top'
+    limit = 50
+
+    def lookups(self, request, model_admin):
+        return (
+            (ALL_TIME, 'All time'),
+            (WEEK, 'Last 7 days'),
+            (DAY, 'Last 24 hours'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() in (ALL_TIME, WEEK, DAY):
+            return queryset.filter(id__in=top_post_ids(self.value(), self.limit))
+        return queryset
 
 
 @admin.register(Post)
@@ -22,10 +38,13 @@ class PostAdmin(admin.ModelAdmin):
         'title', 'author', 'category', 'status',
         'views_count', 'comments_count', 'created_at'
     )
-    list_filter = ('status', 'category', 'created_at', 'updated_at')
+    list_filter = ('status', LeaderboardFilter, 'category', 'created_at', 'updated_at')
     search_fields = ('title', 'content', 'author__username')
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ('created_at', 'updated_at', 'views_count')
+    readonly_fields = (
+        'created_at', 'updated_at', 'views_count', 'comments_count',
+        'word_count', 'reading_time'
+    )
     raw_id_fields = ('author',)
     
     fieldsets = (
@@ -36,14 +55,13 @@ class PostAdmin(admin.ModelAdmin):
             'fields': ('category', 'author', 'status')
         }),
         ('Statistics', {
-            'fields': ('views_count', 'created_at', 'updated_at'),
+            'fields': (
+                'views_count', 'comments_count', 'word_count', 'reading_time',
+                'created_at', 'updated_at'
+            ),
             'classes': ('collapse',)
         }),
     )
 
-    def comments_count(self, obj):
-        return obj.comments.count()
-    comments_count.short_description = 'Comments'
-
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('author', 'category')
@@ -0,0 +1,144 @@
+"""
+Аналитика просмотров постов по времени.
+
+События просмотра (пост, час, авторизован ли читатель) накапливаются
+в буфере просмотров (counters.py) и при сбросе добавляются в почасовые
+корзины post_view_hours одним INSERT ... ON CONFLICT DO UPDATE на пачку.
+Периодическая задача сворачивает корзины в дневные агрегаты
+post_view_days и удаляет корзины старше ANALYTICS_HOURLY_RETENTION_DAYS.
+
+Ряды для графиков читаются только из дневной таблицы: ряд поста - по
+индексу (post, day), ряд автора - по индексу (author, day).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Строк в одном INSERT при записи корзин и дневных агрегатов
+WRITE_BATCH_SIZE = 500
+
+
+def hour_start(hour):
+    """Начало часа по номеру часа от начала эпохи"""
+    return datetime.fromtimestamp(hour * 3600, tz=dt_timezone.utc)
+
+
+def add_view_events(events, using='default'):
+    """
+    Добавляет события {(post_id, час, авторизован): количество}
+    в почасовые корзины. Возвращает число затронутых корзин.
+    """
+    from .models import Post, PostViewHour
+
+    buckets = defaultdict(lambda: [0, 0])
+    for (post_id, hour, authenticated), amount in events.items():
+        bucket = buckets[(post_id, hour)]
+        bucket[0] += amount
+        if not authenticated:
+            bucket[1] += amount
+    if not buckets:
+        return 0
+
+    # Пост мог быть удален, пока событие ждало в буфере
+    existing = set(
+        Post.objects.using(using)
+        .filter(id__in={post_id for post_id, _ in buckets}).values_list('id', flat=True)
+    )
+    connection = connections[using]
+    rows = [
+        (post_id, connection.ops.adapt_datetimefield_value(hour_start(hour)), views, anonymous)
+        for (post_id, hour), (views, anonymous) in sorted(buckets.items())
+        if post_id in existing
+    ]
+    table = PostViewHour._meta.db_table
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            batch = rows[start:start + WRITE_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} (post_id, hour, views, anonymous_views) VALUES {values} '
+                'ON CONFLICT (post_id, hour) DO UPDATE SET '
+                f'views = {table}.views + excluded.views, '
+                f'anonymous_views = {table}.anonymous_views + excluded.anonymous_views',
+                [value for row in batch for value in row],
+            )
+    return len(rows)
+
+
+def rollup_daily_views(since=None):
+    """
+    Пересчитывает дневные агрегаты из почасовых корзин начиная с дня since
+    (по умолчанию - со вчерашнего) и удаляет устаревшие корзины.
+    Возвращает число записанных дневных строк.
+    """
+    from .models import PostViewDay, PostViewHour
+
+    since = since or timezone.localdate() - timedelta(days=1)
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    rows = (
+        PostViewHour.objects.filter(hour__gte=start)
+        .annotate(day=TruncDate('hour'))
+        .values('post_id', 'post__author_id', 'day')
+        .annotate(total=Sum('views'), anonymous=Sum('anonymous_views'))
+        .order_by()
+    )
+
+    written, batch = 0, []
+    for row in rows.iterator(chunk_size=WRITE_BATCH_SIZE):
+        batch.append(PostViewDay(
+            post_id=row['post_id'], author_id=row['post__author_id'], day=row['day'],
+            views=row['total'], anonymous_views=row['anonymous'],
+        ))
+        if len(batch) >= WRITE_BATCH_SIZE:
+            written += _write_days(batch)
+            batch = []
+    written += _write_days(batch)
+
+    retention = getattr(settings, 'ANALYTICS_HOURLY_RETENTION_DAYS', 14)
+    PostViewHour.objects.filter(hour__lt=timezone.now() - timedelta(days=retention)).delete()
+    return written
+
+
+def _write_days(batch):
+    from .models import PostViewDay
+
+    if batch:
+        # Корзины за день полные, поэтому агрегат перезаписывается, а не суммируется
+        PostViewDay.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['post', 'day'],
+            update_fields=['author', 'views', 'anonymous_views'],
+        )
+    return len(batch)
+
+
+def views_series(days, post=None, author=None):
+    """
+    Просмотры по дням за последние days дней для поста или всех постов
+    автора: [{'date', 'views', 'anonymous_views'}], дни без просмотров - нули.
+    """
+    from .models import PostViewDay
+
+    last_day = timezone.localdate()
+    first_day = last_day - timedelta(days=days - 1)
+    queryset = PostViewDay.objects.filter(day__gte=first_day, day__lte=last_day)
+    queryset = queryset.filter(post=post) if post is not None else queryset.filter(author=author)
+    totals = {
+        row['day']: row for row in
+        queryset.values('day').annotate(total=Sum('views'), anonymous=Sum('anonymous_views')).order_by()
+    }
+
+    series = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        row = totals.get(day, {})
+        series.append({
+            'date': day.isoformat(),
+            'views': row.get('total', 0),
+            'anonymous_views': row.get('anonymous', 0),
+        })
+    return series
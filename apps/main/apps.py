@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def setup_search_index(sender, using='default', **kwargs):
+    """Создает FTS5-индекс постов после миграций (только SQLite)"""
+    from .search import install_sqlite_fts
+    install_sqlite_fts(using)
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.main'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .query_budget import install_query_counter, install_query_delay
+        post_migrate.connect(setup_search_index, sender=self)
+        connection_created.connect(install_query_counter)
+        if getattr(settings, 'QUERY_DELAY_MS', 0):
+            connection_created.connect(install_query_delay)
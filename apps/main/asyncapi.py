@@ -0,0 +1,120 @@
+"""
+Асинхронные представления DRF для ASGI.
+
+DRF выполняет представления синхронно, поэтому под ASGI медленный запрос
+к БД занимает поток воркера. AsyncAPIView выполняет async-обработчики
+в цикле событий: аутентификация и проверка прав (синхронный код DRF)
+идут через sync_to_async, обработчики используют асинхронный ORM и кэш.
+Синхронные обработчики (запись) выполняются в потоке в транзакции, как
+при ATOMIC_REQUESTS: Django не оборачивает async-представления в транзакцию.
+
+Асинхронный ORM выполняет запросы одного HTTP-запроса по очереди в
+одном потоке. Независимые запросы run_concurrently выполняет в отдельных
+потоках со своими соединениями; внутри транзакции (в тестах) - по очереди
+на соединении транзакции, иначе они не увидели бы ее данные.
+"""
+import asyncio
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from rest_framework.views import APIView
+
+_DECORATOR_ATTRIBUTES = (
+    'renderer_classes', 'parser_classes', 'authentication_classes',
+    'throttle_classes', 'permission_classes',
+)
+
+
+class AsyncAPIView(APIView):
+    """APIView, обработчики которого могут быть корутинами"""
+
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Транзакция для записи открывается в call_sync
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(self.call_sync)(handler, request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def call_sync(self, handler, request, *args, **kwargs):
+        if not connections[DEFAULT_DB_ALIAS].settings_dict.get('ATOMIC_REQUESTS'):
+            return handler(request, *args, **kwargs)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            return handler(request, *args, **kwargs)
+
+
+def async_api_view(http_method_names=None):
+    """Аналог @api_view для async-функций"""
+    http_method_names = ['GET'] if http_method_names is None else http_method_names
+
+    def decorator(func):
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        attributes = {
+            '__doc__': func.__doc__,
+            '__module__': func.__module__,
+            'http_method_names': [method.lower() for method in http_method_names] + ['options'],
+        }
+        attributes.update(
+            (name, getattr(func, name)) for name in _DECORATOR_ATTRIBUTES if hasattr(func, name)
+        )
+        attributes.update((method.lower(), handler) for method in http_method_names)
+        return type(func.__name__, (AsyncAPIView,), attributes).as_view()
+
+    return decorator
+
+
+async def aserialize(serializer):
+    """
+    Данные сериализатора. Поля могут обращаться к незагруженным связям
+    (pinned_info, can_pin), поэтому сериализация выполняется в потоке.
+    """
+    return await sync_to_async(lambda: serializer.data)()
+
+
+def _in_transaction():
+    return any(
+        connection.in_atomic_block for connection in connections.all(initialized_only=True)
+    )
+
+
+def _call_with_own_connection(func):
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def run_concurrently(*funcs):
+    """Результаты синхронных функций с запросами к БД, выполненных параллельно"""
+    if await sync_to_async(_in_transaction)():
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(
+        sync_to_async(partial(_call_with_own_connection, func), thread_sensitive=False)()
+        for func in funcs
+    ))
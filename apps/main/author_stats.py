@@ -0,0 +1,175 @@
+"""
+Статистика автора по дням (премиум-функция "Statistics").
+
+Таблица author_daily_stats хранит для автора и дня просмотры его постов,
+новые комментарии к ним, опубликованные посты, новых подписчиков и число
+подписчиков на конец дня (NULL - снимка за день нет). Задача пересчитывает
+только затронутые дни (по умолчанию вчера и сегодня) из данных за эти дни:
+дневных агрегатов просмотров и строк, созданных в этот день, по индексам
+с датой. Строки авторов, у которых за день больше нет данных, обнуляются.
+
+Ответ эндпоинта читает не больше ANALYTICS_MAX_DAYS строк по индексу
+(author, day) и кэшируется для автора на AUTHOR_STATS_CACHE_TIMEOUT секунд.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+CACHE_KEY = 'author_stats:{author_id}:{days}'
+TOP_POSTS_LIMIT = 5
+# Поля, которые суммируются за период
+SUMMED_FIELDS = ('views', 'anonymous_views', 'comments', 'posts_published', 'new_followers')
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def author_day_rows(day):
+    """{author_id: {поле: значение}} по данным, созданным за день"""
+    from apps.accounts.models import Follow
+    from apps.comments.models import Comment
+    from .models import Post, PostViewDay
+
+    start, end = day_bounds(day)
+    stats = defaultdict(dict)
+    for row in (
+        PostViewDay.objects.filter(day=day).values('author_id')
+        .annotate(total=Sum('views'), anonymous=Sum('anonymous_views')).order_by()
+    ):
+        stats[row['author_id']].update(views=row['total'], anonymous_views=row['anonymous'])
+
+    sources = (
+        ('comments', Comment.objects.filter(is_active=True), 'post__author_id'),
+        ('posts_published', Post.objects.filter(status='published'), 'author_id'),
+        ('new_followers', Follow.objects.all(), 'author_id'),
+    )
+    for field, queryset, author_field in sources:
+        rows = (
+            queryset.filter(created_at__gte=start, created_at__lt=end)
+            .values(author_field).annotate(total=Count('id')).order_by()
+        )
+        for row in rows:
+            stats[row[author_field]][field] = row['total']
+    return stats
+
+
+def reset_missing_rows(day, authors, fields):
+    """
+    Обнуляет поля строк дня у авторов, которых нет в authors (например,
+    единственный комментарий дня деактивирован). Возвращает число строк.
+    """
+    from .models import AuthorDailyStats
+
+    stale = [
+        author_id for author_id in
+        AuthorDailyStats.objects.filter(day=day).values_list('author_id', flat=True)
+        if author_id not in authors
+    ]
+    for start in range(0, len(stale), 1000):
+        AuthorDailyStats.objects.filter(day=day, author_id__in=stale[start:start + 1000]).update(
+            **{field: 0 for field in fields}
+        )
+    return len(stale)
+
+
+def update_author_stats(since=None, until=None):
+    """
+    Пересчитывает строки статистики за дни с since по until (по умолчанию
+    вчера и сегодня). Возвращает число записанных строк.
+    """
+    from apps.accounts.models import User
+    from .models import AuthorDailyStats
+
+    today = timezone.localdate()
+    until = until or today
+    day = since or today - timedelta(days=1)
+    written = 0
+    while day <= until:
+        stats = author_day_rows(day)
+        update_fields = list(SUMMED_FIELDS)
+        if day == today:
+            # Число подписчиков - снимок: записывается только для текущего дня,
+            # последний запуск за день фиксирует значение на его конец
+            followers = dict(
+                User.objects.filter(followers_count__gt=0).values_list('id', 'followers_count')
+            )
+            # Снимок 0 нужен и авторам, потерявшим последних подписчиков
+            lost_all = AuthorDailyStats.objects.filter(
+                day__gte=day - timedelta(days=1), day__lte=day,
+                followers__gt=0, author__followers_count=0,
+            ).values_list('author_id', flat=True)
+            for author_id in [*followers, *lost_all]:
+                stats.setdefault(author_id, {})
+            update_fields.append('followers')
+        else:
+            followers = None
+
+        rows = [
+            AuthorDailyStats(
+                author_id=author_id, day=day,
+                followers=None if followers is None else followers.get(author_id, 0),
+                **{field: values.get(field, 0) for field in SUMMED_FIELDS},
+            )
+            for author_id, values in stats.items()
+        ]
+        AuthorDailyStats.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True,
+            unique_fields=['author', 'day'], update_fields=update_fields,
+        )
+        written += len(rows) + reset_missing_rows(day, stats, update_fields)
+        day += timedelta(days=1)
+    return written
+
+
+def build_author_stats(author, days):
+    """Ответ эндпоинта: итоги, ряд по дням и самые просматриваемые посты"""
+    from .models import AuthorDailyStats, Post
+
+    last_day = timezone.localdate()
+    first_day = last_day - timedelta(days=days - 1)
+    rows = {
+        row['day']: row for row in
+        AuthorDailyStats.objects.filter(author=author, day__gte=first_day, day__lte=last_day)
+        .values('day', 'followers', *SUMMED_FIELDS)
+    }
+
+    series, followers = [], 0
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        row = rows.get(day, {})
+        # Для дней без снимка берется последний известный; 0 - тоже снимок
+        if row.get('followers') is not None:
+            followers = row['followers']
+        point = {'date': day.isoformat(), 'followers': followers}
+        point.update((field, row.get(field, 0)) for field in SUMMED_FIELDS)
+        series.append(point)
+
+    top_posts = (
+        Post.objects.filter(author=author, status='published')
+        .order_by('-views_count', '-id')
+        .values('id', 'title', 'slug', 'views_count', 'comments_count')[:TOP_POSTS_LIMIT]
+    )
+    return {
+        'author_id': author.pk,
+        'days': days,
+        'followers': author.followers_count,
+        'totals': {field: sum(point[field] for point in series) for field in SUMMED_FIELDS},
+        'series': series,
+        'top_posts': list(top_posts),
+    }
+
+
+def get_author_stats(author, days):
+    """Статистика автора из кэша или из таблицы агрегатов"""
+    key = CACHE_KEY.format(author_id=author.pk, days=days)
+    data = cache.get(key)
+    if data is None:
+        data = build_author_stats(author, days)
+        cache.set(key, data, getattr(settings, 'AUTHOR_STATS_CACHE_TIMEOUT', 60))
+    return data
@@ -0,0 +1,368 @@
+"""
+Синтетический набор данных для нагрузочных тестов (manage.py seed_bench).
+
+Пользователи, категории, посты, комментарии с ответами, подписки и
+закрепления вставляются через bulk_create пачками, как в импорте
+(apps/main/importer.py): без save(), сигналов и запросов на каждую строку.
+Денормализованные счетчики обновляются после каждой пачки.
+
+Данные детерминированы: у каждой сущности свой генератор случайных чисел
+от --seed, поэтому при тех же параметрах получаются те же строки
+(pk зависят от состояния БД). Распределения приближены к живому блогу:
+- длина постов и комментариев - логнормальная (много коротких, длинный хвост);
+- авторы и комментарии к постам распределены неравномерно (степенной закон);
+- у части комментариев есть родитель (ветки обсуждений).
+
+Пользователи называются bench<N> (email bench<N>@bench.example.com) с общим
+паролем BENCH_PASSWORD: по ним нагрузочный тест выполняет вход.
+"""
+import math
+import random
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from apps.comments.models import Comment
+from apps.subscribe.models import PinnedPost, Subscription, SubscriptionPlan
+from .hot import refresh_hot_scores
+from .importer import increment_counters, keep_timestamps
+from .leaderboards import rebuild_leaderboards
+from .models import Category, Post, post_text_stats
+from .response_cache import invalidate_tags
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench'
+BENCH_EMAIL_DOMAIN = 'bench.example.com'
+BENCH_PASSWORD = 'bench-password'
+BENCH_PLAN_PRICE_ID = 'bench_monthly'
+
+# Число слов: медиана и разброс логнормального распределения, границы
+POST_WORDS = (350, 0.9, 20, 6000)
+COMMENT_WORDS = (20, 0.8, 1, 400)
+TITLE_WORDS = (3, 9)
+
+# Доли статусов постов, подписок и скрытых комментариев
+DRAFT_RATIO = 0.05
+INACTIVE_COMMENT_RATIO = 0.02
+SUBSCRIPTION_STATUSES = (('active', 0.8), ('expired', 0.1), ('cancelled', 0.1))
+
+VOCABULARY = (
+    'access', 'account', 'action', 'admin', 'analysis', 'api', 'app', 'archive',
+    'async', 'author', 'backend', 'balance', 'batch', 'benchmark', 'blog', 'branch',
+    'browser', 'budget', 'buffer', 'build', 'cache', 'category', 'change', 'client',
+    'cloud', 'cluster', 'code', 'comment', 'commit', 'config', 'connection', 'content',
+    'context', 'counter', 'cursor', 'data', 'database', 'debug', 'deploy', 'design',
+    'detail', 'developer', 'django', 'docker', 'domain', 'draft', 'editor', 'email',
+    'engine', 'error', 'event', 'export', 'feature', 'feed', 'field', 'filter',
+    'format', 'framework', 'frontend', 'function', 'gateway', 'graph', 'guide', 'handler',
+    'header', 'history', 'hosting', 'image', 'import', 'index', 'input', 'issue',
+    'join', 'json', 'kernel', 'key', 'language', 'latency', 'layer', 'library',
+    'limit', 'linux', 'list', 'load', 'lock', 'log', 'memory', 'message',
+    'method', 'metric', 'migration', 'model', 'module', 'monitor', 'network', 'node',
+    'object', 'offset', 'order', 'output', 'package', 'page', 'parser', 'patch',
+    'performance', 'pipeline', 'plan', 'platform', 'plugin', 'pool', 'post', 'process',
+    'profile', 'project', 'protocol', 'proxy', 'python', 'query', 'queue', 'rate',
+    'reader', 'release', 'replica', 'report', 'request', 'resource', 'response', 'review',
+    'route', 'runtime', 'scale', 'schema', 'script', 'search', 'server', 'service',
+    'session', 'shard', 'signal', 'socket', 'source', 'stack', 'storage', 'stream',
+    'subscription', 'system', 'table', 'task', 'template', 'test', 'thread', 'throughput',
+    'token', 'tool', 'trace', 'traffic', 'update', 'user', 'value', 'version',
+    'view', 'worker', 'workflow', 'write',
+)
+FIRST_NAMES = (
+    'Alex', 'Anna', 'Boris', 'Daria', 'Elena', 'Ivan', 'Kira', 'Leo', 'Maria', 'Nikita',
+    'Olga', 'Pavel', 'Sofia', 'Timur', 'Vera', 'Yuri',
+)
+LAST_NAMES = (
+    'Belov', 'Egorova', 'Frolov', 'Gromova', 'Ivanov', 'Kozlova', 'Lebedev', 'Morozova',
+    'Novikov', 'Orlova', 'Petrov', 'Sokolova', 'Titov', 'Volkova', 'Zaitsev',
+)
+
+
+class BenchDataError(Exception):
+    """Синтетические данные нельзя создать в текущей БД"""
+
+
+def word_count(rng, distribution):
+    """Число слов из логнормального распределения (медиана, sigma, min, max)"""
+    median, sigma, low, high = distribution
+    return max(low, min(high, round(rng.lognormvariate(math.log(median), sigma))))
+
+
+def text(rng, words):
+    return ' '.join(rng.choices(VOCABULARY, k=words))
+
+
+def skewed_index(rng, size, power=2.0):
+    """Индекс в [0, size): младшие индексы выпадают чаще (степенной закон)"""
+    return min(size - 1, int(size * rng.random() ** power))
+
+
+def bench_email(index):
+    return f'{BENCH_PREFIX}{index}@{BENCH_EMAIL_DOMAIN}'
+
+
+class BenchDataset:
+    """Создает синтетический набор данных пачками"""
+
+    def __init__(self, users=1000, categories=20, posts=10000, comments=50000,
+                 subscribers=None, reply_ratio=0.4, days=365, seed=42,
+                 batch_size=2000, now=None, log=None):
+        self.users = users
+        self.categories = categories
+        self.posts = posts
+        self.comments = comments
+        self.subscribers = min(users, users // 100 if subscribers is None else subscribers)
+        self.reply_ratio = reply_ratio
+        self.seed = seed
+        self.batch_size = batch_size
+        self.now = now or timezone.now()
+        self.since = self.now - timedelta(days=days)
+        self.log = log or (lambda message: None)
+        self.stats = defaultdict(int)
+
+    def rng(self, entity):
+        """Отдельный генератор на сущность: данные не зависят от размера пачки"""
+        return random.Random(f'{self.seed}:{entity}')
+
+    def moment(self, position, total):
+        """Время position-го из total объектов: равномерно по периоду, по возрастанию"""
+        span = (self.now - self.since).total_seconds()
+        return self.since + timedelta(seconds=span * position / max(total, 1))
+
+    def run(self):
+        if User.objects.filter(username=f'{BENCH_PREFIX}0').exists():
+            raise BenchDataError(
+                'Benchmark data already exists. Use an empty database (manage.py flush).'
+            )
+        if self.posts and not (self.users and self.categories):
+            raise BenchDataError('Posts need at least one user and one category.')
+
+        with keep_timestamps(User, Category, Post, Comment, Subscription, PinnedPost):
+            self.create_users()
+            self.create_categories()
+            self.create_posts()
+            self.create_comments()
+            self.create_subscriptions()
+
+        invalidate_tags('posts', 'feed', 'pins')
+        rebuild_leaderboards()
+        refresh_hot_scores()
+        return dict(self.stats)
+
+    def insert(self, entity, model, objects, after=None):
+        """Вставляет пачку и обновляет счетчики в одной транзакции"""
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects)
+            if after is not None:
+                after(created)
+        self.stats[entity] += len(created)
+        self.log(f'{entity}: {self.stats[entity]} created')
+        return created
+
+    def batches(self, items):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # Пользователи и категории
+
+    def build_users(self):
+        rng = self.rng('users')
+        # Хэш один на всех: хэширование на строку заняло бы часы
+        password = make_password(BENCH_PASSWORD, salt=f'{BENCH_PREFIX}{self.seed}')
+        for index in range(self.users):
+            joined = self.moment(index, self.users)
+            yield User(
+                username=f'{BENCH_PREFIX}{index}',
+                email=bench_email(index),
+                password=password,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                bio=text(rng, rng.randint(0, 30)),
+                date_joined=joined,
+                created_at=joined,
+                updated_at=joined,
+            )
+
+    def create_users(self):
+        self.user_ids = array('q')
+        for batch in self.batches(self.build_users()):
+            self.user_ids.extend(user.pk for user in self.insert('users', User, batch))
+
+    def build_categories(self):
+        rng = self.rng('categories')
+        for index in range(self.categories):
+            yield Category(
+                name=f'Bench {VOCABULARY[index % len(VOCABULARY)].title()} {index}',
+                slug=f'{BENCH_PREFIX}-{index}',
+                description=text(rng, rng.randint(5, 25)),
+                created_at=self.since,
+            )
+
+    def create_categories(self):
+        self.category_ids = array('q')
+        for batch in self.batches(self.build_categories()):
+            self.category_ids.extend(
+                category.pk for category in self.insert('categories', Category, batch)
+            )
+
+    # Посты
+
+    def build_posts(self):
+        """Посты по возрастанию даты; автор - по степенному закону (index 0 пишет больше всех)"""
+        rng = self.rng('posts')
+        for index in range(self.posts):
+            content = text(rng, word_count(rng, POST_WORDS))
+            created_at = self.moment(index, self.posts)
+            author_index = skewed_index(rng, len(self.user_ids))
+            post = Post(
+                title=text(rng, rng.randint(*TITLE_WORDS)).capitalize(),
+                slug=f'{BENCH_PREFIX}-post-{index}',
+                content=content,
+                **post_text_stats(content),
+                author_id=self.user_ids[author_index],
+                category_id=self.category_ids[skewed_index(rng, len(self.category_ids), 1.5)],
+                status='draft' if rng.random() < DRAFT_RATIO else 'published',
+                views_count=int(rng.paretovariate(1.2) * 20) - 20,
+                comments_count=0,
+                created_at=created_at,
+                updated_at=created_at,
+            )
+            yield post, author_index
+
+    def create_posts(self):
+        # Опубликованные посты и их даты - для комментариев; последний пост
+        # подписчиков - для закрепления
+        self.post_ids = array('q')
+        self.post_times = array('d')
+        self.latest_posts = {}
+        for batch in self.batches(self.build_posts()):
+            self.insert('posts', Post, [post for post, _ in batch], self.after_posts)
+            for post, author_index in batch:
+                if post.status != 'published':
+                    continue
+                self.post_ids.append(post.pk)
+                self.post_times.append(post.created_at.timestamp())
+                if author_index < self.subscribers:
+                    self.latest_posts[author_index] = post.pk
+
+    def after_posts(self, posts):
+        deltas = defaultdict(int)
+        for post in posts:
+            if post.status == 'published':
+                deltas[post.category_id] += 1
+        increment_counters(Category, 'posts_count', deltas)
+
+    # Комментарии: сначала верхний уровень, затем ответы на них
+
+    def comment(self, rng, post_id, after):
+        """Комментарий к посту, написанный после метки времени after"""
+        created_at = datetime.fromtimestamp(
+            after + rng.random() * (self.now.timestamp() - after), tz=dt_timezone.utc
+        )
+        return Comment(
+            post_id=post_id,
+            author_id=self.user_ids[rng.randrange(len(self.user_ids))],
+            content=text(rng, word_count(rng, COMMENT_WORDS)),
+            is_active=rng.random() >= INACTIVE_COMMENT_RATIO,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+
+    def build_comments(self, total):
+        """Комментарии верхнего уровня: свежие посты обсуждают чаще"""
+        rng = self.rng('comments')
+        size = len(self.post_ids)
+        for _ in range(total):
+            index = size - 1 - skewed_index(rng, size, 1.5)
+            yield self.comment(rng, self.post_ids[index], self.post_times[index])
+
+    def build_replies(self, total):
+        """Ответы на комментарии верхнего уровня, в том же посте"""
+        rng = self.rng('replies')
+        size = len(self.thread_ids)
+        for _ in range(total):
+            index = rng.randrange(size)
+            reply = self.comment(rng, self.thread_posts[index], self.thread_times[index])
+            reply.parent_id = self.thread_ids[index]
+            yield reply
+
+    def create_comments(self):
+        if not self.comments or not self.post_ids:
+            return
+        replies = round(self.comments * self.reply_ratio)
+        self.thread_ids = array('q')
+        self.thread_posts = array('q')
+        self.thread_times = array('d')
+        for batch in self.batches(self.build_comments(self.comments - replies)):
+            for comment in self.insert('comments', Comment, batch, self.after_comments):
+                self.thread_ids.append(comment.pk)
+                self.thread_posts.append(comment.post_id)
+                self.thread_times.append(comment.created_at.timestamp())
+        if self.thread_ids:
+            for batch in self.batches(self.build_replies(replies)):
+                self.insert('comments', Comment, batch, self.after_comments)
+
+    def after_comments(self, comments):
+        deltas = defaultdict(int)
+        for comment in comments:
+            if comment.is_active:
+                deltas[comment.post_id] += 1
+        increment_counters(Post, 'comments_count', deltas)
+
+    # Подписки и закрепления: подписчики - самые активные авторы
+
+    def build_subscriptions(self, plan):
+        rng = self.rng('subscriptions')
+        statuses, weights = zip(*SUBSCRIPTION_STATUSES)
+        for index in range(self.subscribers):
+            status = rng.choices(statuses, weights)[0]
+            if status == 'active':
+                end_date = self.now + timedelta(days=rng.uniform(1, plan.duration_days))
+            else:
+                end_date = self.now - timedelta(days=rng.uniform(1, 90))
+            start_date = end_date - timedelta(days=plan.duration_days)
+            yield Subscription(
+                user_id=self.user_ids[index],
+                plan=plan,
+                status=status,
+                start_date=start_date,
+                end_date=end_date,
+                auto_renew=status == 'active',
+                created_at=start_date,
+                updated_at=start_date,
+            ), index
+
+    def create_subscriptions(self):
+        if not self.subscribers:
+            return
+        plan, _ = SubscriptionPlan.objects.get_or_create(
+            stripe_price_id=BENCH_PLAN_PRICE_ID,
+            defaults={'name': 'Bench Monthly', 'price': Decimal('9.99'), 'duration_days': 30},
+        )
+        pins = []
+        for batch in self.batches(self.build_subscriptions(plan)):
+            self.insert('subscriptions', Subscription, [subscription for subscription, _ in batch])
+            for subscription, index in batch:
+                # Закреплять посты может только активный подписчик
+                if subscription.status == 'active' and index in self.latest_posts:
+                    pins.append(PinnedPost(
+                        user_id=subscription.user_id,
+                        post_id=self.latest_posts[index],
+                        pinned_at=subscription.start_date,
+                    ))
+        for batch in self.batches(pins):
+            self.insert('pins', PinnedPost, batch)
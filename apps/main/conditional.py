@@ -0,0 +1,65 @@
+"""
+Условные GET-запросы (ETag / If-None-Match, Last-Modified / If-Modified-Since).
+
+Валидаторы строятся из версий тегов кэша ответов (см. response_cache):
+версии меняются при записи в связанные модели, поэтому ETag вычисляется
+до сериализации и 304 отдается без построения ответа. Версии меняются
+и после коммита записи, поэтому валидатор, выданный вместе со старыми
+данными до коммита, после него не совпадает.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .response_cache import aget_tag_versions, get_tag_versions, version_timestamp
+
+
+class Validators:
+    """ETag и время последнего изменения ресурса"""
+
+    def __init__(self, tags, *parts, modified_at=None, versions=None):
+        if versions is None:
+            versions = get_tag_versions(tags)
+        payload = '|'.join(
+            [str(part) for part in parts]
+            + [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+        )
+        # Слабый ETag: счетчик просмотров в теле ответа может отличаться
+        self.etag = 'W/' + quote_etag(
+            hashlib.md5(payload.encode('utf-8'), usedforsecurity=False).hexdigest()
+        )
+
+        timestamps = [version_timestamp(version) for version in versions.values()]
+        if modified_at is not None:
+            timestamps.append(modified_at)
+        self.last_modified = int(max(timestamps).timestamp()) if timestamps else None
+
+    @classmethod
+    async def acreate(cls, tags, *parts, modified_at=None):
+        """Валидаторы для async-представлений: версии тегов читаются асинхронно"""
+        return cls(tags, *parts, modified_at=modified_at, versions=await aget_tag_versions(tags))
+
+    def not_modified(self, request):
+        """Ответ 304 (или 412), если копия клиента актуальна, иначе None"""
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        """Добавляет заголовки ETag и Last-Modified к ответу"""
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+
+def request_parts(request):
+    """Части ответа, зависящие от клиента: пользователь и формат"""
+    return (
+        request.user.pk if request.user.is_authenticated else 'anonymous',
+        getattr(request, 'accepted_media_type', ''),
+    )
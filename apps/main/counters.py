@@ -0,0 +1,311 @@
+"""
+Буферизованный счетчик просмотров постов.
+
+Просмотры не пишутся в строку поста на каждый GET: они накапливаются
+в буфере (память процесса или Redis) и периодически сбрасываются
+в БД пакетными UPDATE с F()-выражениями.
+
+Рядом с приращением поста в буфер пишется событие для аналитики:
+ключ (post_id, час, авторизован ли читатель). При сбросе события
+добавляются в почасовые корзины (см. analytics.py) в той же транзакции.
+
+Пачка из Redis получает id, который записывается в post_view_flushes
+в той же транзакции, что и приращения. Если процесс упал после коммита,
+но до ack(), следующий сброс найдет id в БД и только удалит пачку из
+Redis, не применяя ее второй раз.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранятся id примененных пачек: повторить можно только последнюю
+FLUSH_ID_RETENTION = timedelta(days=1)
+
+
+def current_hour():
+    """Номер текущего часа от начала эпохи"""
+    return int(time.time() // 3600)
+
+
+class LocalViewBuffer:
+    """Буфер просмотров в памяти текущего процесса"""
+
+    # Локальный буфер виден только своему процессу,
+    # поэтому он сбрасывается самим процессом после ответа
+    flushes_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def add(self, post_id, amount=1, event=None):
+        """event - (час, авторизован) для почасовой аналитики"""
+        with self._lock:
+            self._pending[post_id] += amount
+            if event is not None:
+                self._pending[(post_id, *event)] += amount
+
+    def get_many(self, post_ids):
+        with self._lock:
+            return {post_id: self._pending.get(post_id, 0) for post_id in post_ids}
+
+    def flush_due(self, interval):
+        return time.monotonic() - self._last_flush >= interval
+
+    @contextmanager
+    def flush_lock(self):
+        acquired = self._flush_lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._flush_lock.release()
+
+    def drain(self):
+        """(id пачки, приращения); пачка в памяти не повторяется, поэтому id нет"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        return None, dict(pending)
+
+    def ack(self):
+        pass
+
+    def restore(self, deltas):
+        """Возвращает несохраненные приращения обратно в буфер"""
+        with self._lock:
+            self._pending.update(deltas)
+
+
+class RedisViewBuffer:
+    """Буфер просмотров в Redis, общий для всех процессов"""
+
+    flushes_inline = False
+
+    pending_key = 'post_views:pending'
+    processing_key = 'post_views:processing'
+    processing_id_key = 'post_views:processing_id'
+    lock_key = 'post_views:flush_lock'
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def add(self, post_id, amount=1, event=None):
+        if event is None:
+            self._client.hincrby(self.pending_key, post_id, amount)
+            return
+        pipe = self._client.pipeline(transaction=False)
+        pipe.hincrby(self.pending_key, post_id, amount)
+        pipe.hincrby(self.pending_key, self.event_field(post_id, *event), amount)
+        pipe.execute()
+
+    @staticmethod
+    def event_field(post_id, hour, authenticated):
+        return f'{post_id}:{hour}:{int(authenticated)}'
+
+    @staticmethod
+    def parse_field(field):
+        """id поста или ключ события (post_id, час, авторизован)"""
+        parts = field.decode().split(':') if isinstance(field, bytes) else str(field).split(':')
+        if len(parts) == 1:
+            return int(parts[0])
+        return int(parts[0]), int(parts[1]), bool(int(parts[2]))
+
+    def get_many(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        # Пачка в обработке еще не в БД; ack() удаляет ее сразу после коммита,
+        # а после сбоя между ними - следующий сброс, не применяя повторно
+        pipe = self._client.pipeline()
+        pipe.hmget(self.pending_key, post_ids)
+        pipe.hmget(self.processing_key, post_ids)
+        pending, processing = pipe.execute()
+        return {
+            post_id: int(waiting or 0) + int(in_flight or 0)
+            for post_id, waiting, in_flight in zip(post_ids, pending, processing)
+        }
+
+    def flush_due(self, interval):
+        return False
+
+    @contextmanager
+    def flush_lock(self):
+        lock = self._client.lock(self.lock_key, timeout=300)
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+    def drain(self):
+        """
+        Переносит накопленные приращения в ключ обработки и назначает пачке id.
+        Если предыдущий сброс прервался, возвращается та же пачка с тем же id.
+        """
+        if not self._client.exists(self.processing_key):
+            if not self._client.exists(self.pending_key):
+                return None, {}
+            self._client.rename(self.pending_key, self.processing_key)
+        # id задается один раз: повтор пачки после сбоя приходит с прежним id
+        self._client.set(self.processing_id_key, uuid.uuid4().hex, nx=True)
+        pipe = self._client.pipeline()
+        pipe.get(self.processing_id_key)
+        pipe.hgetall(self.processing_key)
+        flush_id, fields = pipe.execute()
+        return flush_id.decode(), {
+            self.parse_field(field): int(amount) for field, amount in fields.items()
+        }
+
+    def ack(self):
+        pipe = self._client.pipeline()
+        pipe.delete(self.processing_key, self.processing_id_key)
+        pipe.execute()
+
+    def restore(self, deltas):
+        # Ключ обработки не удаляется, данные будут применены при следующем сбросе
+        pass
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    """Возвращает буфер просмотров, выбранный в настройках"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                backend = getattr(settings, 'VIEW_COUNTER_BACKEND', 'local')
+                if backend == 'redis':
+                    _buffer = RedisViewBuffer(settings.VIEW_COUNTER_REDIS_URL)
+                else:
+                    _buffer = LocalViewBuffer()
+    return _buffer
+
+
+def reset_view_buffer():
+    """Сбрасывает выбранный буфер (используется в тестах)"""
+    global _buffer
+    _buffer = None
+
+
+def record_view(post_id, authenticated=False):
+    """Регистрирует просмотр поста без обращения к БД"""
+    buffer = get_view_buffer()
+    buffer.add(post_id, event=(current_hour(), bool(authenticated)))
+
+    interval = getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 10.0)
+    if buffer.flushes_inline and buffer.flush_due(interval):
+        # Сбрасываем после коммита запроса, а не внутри ATOMIC_REQUESTS
+        transaction.on_commit(flush_pending_views)
+
+
+def pending_views(post_id):
+    """Количество просмотров поста, еще не записанных в БД"""
+    return get_view_buffer().get_many([post_id])[post_id]
+
+
+def pending_views_many(post_ids):
+    """Несохраненные просмотры для нескольких постов: {post_id: count}"""
+    return get_view_buffer().get_many(post_ids)
+
+
+def flush_pending_views():
+    """
+    Записывает накопленные просмотры в БД.
+    Посты группируются по величине приращения, и для каждой группы
+    выполняется UPDATE ... SET views_count = views_count + N пачками;
+    события добавляются в почасовые корзины.
+    Возвращает количество записанных просмотров.
+    """
+    from .analytics import add_view_events
+    from .leaderboards import record_flushed_views
+    from .models import Post
+
+    buffer = get_view_buffer()
+    batch_size = getattr(settings, 'VIEW_COUNTER_BATCH_SIZE', 500)
+
+    with buffer.flush_lock() as acquired:
+        if not acquired:
+            return 0
+
+        flush_id, pending = buffer.drain()
+        if not pending:
+            return 0
+        deltas = {key: amount for key, amount in pending.items() if not isinstance(key, tuple)}
+        events = {key: amount for key, amount in pending.items() if isinstance(key, tuple)}
+
+        by_amount = defaultdict(list)
+        for post_id, amount in deltas.items():
+            if amount > 0:
+                by_amount[amount].append(post_id)
+
+        try:
+            with transaction.atomic():
+                applied = flush_id is None or _record_flush(flush_id)
+                if applied:
+                    for amount, post_ids in by_amount.items():
+                        for start in range(0, len(post_ids), batch_size):
+                            Post.objects.filter(
+                                id__in=post_ids[start:start + batch_size]
+                            ).update(views_count=F('views_count') + amount)
+                    add_view_events(events)
+        except Exception:
+            buffer.restore(pending)
+            raise
+
+        # Сразу после коммита: до ack() чтения учитывают пачку и в БД, и в буфере
+        buffer.ack()
+
+    if not applied:
+        logger.warning('View flush %s was already applied, dropped the repeated batch', flush_id)
+        return 0
+
+    try:
+        record_flushed_views(deltas)
+    except Exception:
+        # Лидерборды вторичны: ошибка не должна терять записанные просмотры
+        logger.exception('Failed to update post leaderboards')
+
+    return sum(deltas.values())
+
+
+def _record_flush(flush_id):
+    """Записывает id пачки; False, если она уже была применена"""
+    from .models import ViewFlush
+
+    ViewFlush.objects.filter(applied_at__lt=timezone.now() - FLUSH_ID_RETENTION).delete()
+    _, created = ViewFlush.objects.get_or_create(flush_id=flush_id)
+    return created
+
+
+def _flush_on_exit():
+    """Сбрасывает локальный буфер при завершении процесса"""
+    if _buffer is None or not _buffer.flushes_inline:
+        return
+    try:
+        flush_pending_views()
+    except Exception:
+        logger.exception('Failed to flush pending post views on exit')
+
+
+atexit.register(_flush_on_exit)
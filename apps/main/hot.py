@@ -0,0 +1,157 @@
+"""
+Рейтинг "горячих" постов с затуханием по возрасту.
+
+hot_score = (просмотры * HOT_VIEW_WEIGHT + комментарии * HOT_COMMENT_WEIGHT)
+            / (возраст в часах + 2) ** HOT_GRAVITY
+
+Периодическая задача пересчитывает оценку опубликованных постов за
+последние HOT_WINDOW_DAYS дней пачками по диапазонам id: пачка читается одним
+запросом (время публикации - в секундах эпохи), оценки всей пачки
+считаются NumPy и записываются одним UPDATE (в PostgreSQL). Записываются
+только оценки, изменившиеся больше чем на HOT_MIN_CHANGE (доля): оценки
+старых постов между запусками почти не меняются, а каждая запись
+обновляет индекс. У постов, вышедших из окна или снятых с публикации,
+оценка обнуляется.
+Эндпоинт hot/ читает посты по индексу (status, -hot_score).
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min, Q
+
+from .response_cache import invalidate_tags
+
+
+def hot_setting(name, default):
+    return getattr(settings, f'HOT_{name}', default)
+
+
+def hot_scores(views, comments, created, now):
+    """Оценки для массивов NumPy: просмотры, комментарии, время публикации (секунды)"""
+    import numpy as np
+
+    age_hours = np.maximum(now - created, 0) / 3600
+    points = views * hot_setting('VIEW_WEIGHT', 1.0) + comments * hot_setting('COMMENT_WEIGHT', 5.0)
+    return points / (age_hours + 2) ** hot_setting('GRAVITY', 1.8)
+
+
+class HotScoreBackend:
+    """Чтение пачки постов и запись оценок для SQLite и остальных СУБД"""
+
+    # Время читается строкой: NumPy разбирает ее быстрее, чем strftime() в SQLite
+    columns_sql = (
+        "id, views_count, comments_count, hot_score, "
+        "CASE WHEN status = 'published' THEN 1 ELSE 0 END, CAST(created_at AS TEXT)"
+    )
+
+    def fetch(self, cursor, table, after_id, last_id):
+        """
+        Массивы NumPy: id, просмотры, комментарии, текущая оценка, признак
+        публикации, время публикации (секунды); None, если постов нет.
+        """
+        # Только диапазон первичного ключа: статус и окно проверяются в NumPy,
+        # иначе планировщик выбирает индекс (status, created_at) и на каждой
+        # пачке просматривает все окно
+        cursor.execute(
+            f'SELECT {self.columns_sql} FROM {table} WHERE id > %s AND id <= %s',
+            (after_id, last_id),
+        )
+        rows = cursor.fetchall()
+        return self.to_arrays(rows) if rows else None
+
+    def to_arrays(self, rows):
+        import numpy as np
+
+        ids, views, comments, current, published, created = zip(*rows)
+        created = np.array(created, dtype='datetime64[us]').astype(np.int64) / 1e6
+        return (
+            np.array(ids, dtype=np.int64), np.array(views, dtype=np.float64),
+            np.array(comments, dtype=np.float64), np.array(current, dtype=np.float64),
+            np.array(published, dtype=bool), created,
+        )
+
+    def write(self, cursor, table, ids, scores):
+        cursor.executemany(
+            f'UPDATE {table} SET hot_score = %s WHERE id = %s', list(zip(scores, ids))
+        )
+
+
+class PostgresHotScores(HotScoreBackend):
+    """Время через EXTRACT(EPOCH ...), вся пачка - одним UPDATE ... FROM unnest()"""
+
+    columns_sql = (
+        "id, views_count, comments_count, hot_score, "
+        "CASE WHEN status = 'published' THEN 1 ELSE 0 END, EXTRACT(EPOCH FROM created_at)::float8"
+    )
+
+    def to_arrays(self, rows):
+        import numpy as np
+
+        data = np.asarray(rows, dtype=np.float64)
+        return (
+            data[:, 0].astype(np.int64), data[:, 1], data[:, 2], data[:, 3],
+            data[:, 4].astype(bool), data[:, 5],
+        )
+
+    def write(self, cursor, table, ids, scores):
+        cursor.execute(
+            f'UPDATE {table} SET hot_score = data.score '
+            'FROM unnest(%s::bigint[], %s::double precision[]) AS data(id, score) '
+            f'WHERE {table}.id = data.id',
+            (ids, scores),
+        )
+
+
+def get_hot_backend(using='default'):
+    if connections[using].vendor == 'postgresql':
+        return PostgresHotScores()
+    return HotScoreBackend()
+
+
+def refresh_hot_scores(batch_size=None, now=None, using='default'):
+    """Пересчитывает оценки постов в окне; возвращает число пересчитанных постов"""
+    import numpy as np
+    from .models import Post
+
+    batch_size = batch_size or hot_setting('BATCH_SIZE', 50000)
+    min_change = hot_setting('MIN_CHANGE', 0.01)
+    now = now or time.time()
+    since = datetime.fromtimestamp(now, tz=dt_timezone.utc) - timedelta(
+        days=hot_setting('WINDOW_DAYS', 30)
+    )
+    backend = get_hot_backend(using)
+    table = Post._meta.db_table
+
+    # Вне окна оценка не пересчитывается и обнуляется
+    Post.objects.using(using).filter(hot_score__gt=0).filter(
+        Q(created_at__lt=since) | ~Q(status='published')
+    ).update(hot_score=0)
+
+    bounds = Post.objects.using(using).filter(created_at__gte=since).aggregate(
+        first=Min('id'), last=Max('id')
+    )
+    total = 0
+    if bounds['first'] is not None:
+        # Пачки - диапазоны id по batch_size
+        for after_id in range(bounds['first'] - 1, bounds['last'], batch_size):
+            with transaction.atomic(using=using), connections[using].cursor() as cursor:
+                batch = backend.fetch(cursor, table, after_id, min(after_id + batch_size, bounds['last']))
+                if batch is None:
+                    continue
+                ids, views, comments, current, published, created = batch
+                active = published & (created >= since.timestamp())
+                scores = np.where(active, hot_scores(views, comments, created, now), 0)
+                # Оценки старых постов почти не меняются: их не переписываем
+                changed = np.abs(scores - current) > np.maximum(scores, current) * min_change
+                backend.write(cursor, table, ids[changed].tolist(), scores[changed].tolist())
+            total += int(active.sum())
+
+    invalidate_tags('hot')
+    return total
+
+
+def hot_posts(queryset, limit):
+    """Опубликованные посты с наибольшей оценкой"""
+    return queryset.filter(status='published', hot_score__gt=0).order_by('-hot_score', '-id')[:limit]
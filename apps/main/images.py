@@ -0,0 +1,182 @@
+"""
+Уменьшенные копии изображений (Post.image, User.avatar).
+
+После сохранения модели с новым файлом Celery-задача строит варианты
+thumb/card/full в WebP и JPEG. Файлы адресуются по sha256 оригинала,
+поэтому повторная загрузка того же изображения ничего не пересчитывает
+и не записывает. Сведения о вариантах хранятся в поле <field>_variants
+вместе с именем исходного файла: пока они не совпадают с текущим файлом,
+вместо вариантов отдается оригинал.
+"""
+import hashlib
+import io
+import logging
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Имя варианта: (ширина, высота, обрезать до точного размера)
+VARIANTS = {
+    'thumb': (160, 160, True),
+    'card': (640, 360, False),
+    'full': (1600, 1600, False),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'variants'
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def content_hash(field_file):
+    """sha256 содержимого файла"""
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def variant_path(digest, variant, fmt):
+    width, height, crop = VARIANTS[variant]
+    # Размеры в имени: при смене настроек варианты строятся заново
+    suffix = f'{width}x{height}' + ('c' if crop else '')
+    return f'{VARIANTS_DIR}/{digest[:2]}/{digest}/{variant}-{suffix}.{fmt}'
+
+
+def render_variant(image, variant):
+    from PIL import ImageOps
+
+    width, height, crop = VARIANTS[variant]
+    if crop:
+        return ImageOps.fit(image, (width, height))
+    resized = image.copy()
+    # thumbnail не увеличивает изображения меньше заданного размера
+    resized.thumbnail((width, height))
+    return resized
+
+
+def encode_image(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(field_file, storage=None):
+    """
+    Записывает недостающие варианты файла и возвращает их описание.
+    Уже существующие файлы (тот же sha256) не перезаписываются.
+    """
+    from PIL import Image, ImageOps
+
+    storage = storage or field_file.storage
+    digest = content_hash(field_file)
+    paths = {
+        (variant, fmt): variant_path(digest, variant, fmt)
+        for variant in VARIANTS for fmt in FORMATS
+    }
+    missing = [key for key, path in paths.items() if not storage.exists(path)]
+
+    if missing:
+        field_file.open('rb')
+        try:
+            with Image.open(field_file) as original:
+                original = ImageOps.exif_transpose(original)
+                rendered = {}
+                for variant, fmt in missing:
+                    if variant not in rendered:
+                        rendered[variant] = render_variant(original, variant)
+                    paths[(variant, fmt)] = storage.save(
+                        paths[(variant, fmt)],
+                        ContentFile(encode_image(rendered[variant], fmt)),
+                    )
+        finally:
+            field_file.close()
+
+    variants = {'source': field_file.name, 'sha256': digest}
+    for (variant, fmt), path in paths.items():
+        variants.setdefault(variant, {})[fmt] = path
+    return variants
+
+
+def is_current(instance, field_name):
+    """Построены ли варианты для текущего файла"""
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field(field_name)) or {}
+    return bool(field_file) and variants.get('source') == field_file.name
+
+
+def variant_urls(instance, field_name):
+    """
+    {вариант: {формат: url}}; пока варианты не готовы, все url указывают
+    на оригинал. None, если изображения нет.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+    if not is_current(instance, field_name):
+        url = field_file.url
+        return {variant: {fmt: url for fmt in FORMATS} for variant in VARIANTS}
+
+    variants = getattr(instance, variants_field(field_name))
+    return {
+        variant: {fmt: field_file.storage.url(variants[variant][fmt]) for fmt in FORMATS}
+        for variant in VARIANTS
+    }
+
+
+def variant_url(instance, field_name, variant, fmt='webp'):
+    """url одного варианта или оригинала; None, если изображения нет"""
+    urls = variant_urls(instance, field_name)
+    return urls[variant][fmt] if urls else None
+
+
+def generate_variants(model, pk, field_name):
+    """Строит варианты для сохраненного объекта (вызывается из Celery-задачи)"""
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None or not getattr(instance, field_name) or is_current(instance, field_name):
+        return None
+
+    field_file = getattr(instance, field_name)
+    variants = build_variants(field_file)
+    # Сохраняем, только если файл не заменили, пока строились варианты;
+    # update() не меняет updated_at и не вызывает сигналы
+    updated = model._default_manager.filter(
+        pk=pk, **{field_name: field_file.name}
+    ).update(**{variants_field(field_name): variants})
+    return variants if updated else None
+
+
+def schedule_variants(instance, field_name):
+    """Ставит построение вариантов в очередь после коммита, если файл новый"""
+    if not getattr(instance, field_name) or is_current(instance, field_name):
+        return
+    transaction.on_commit(partial(
+        _enqueue, instance._meta.label, instance.pk, field_name
+    ))
+
+
+def _enqueue(model_label, pk, field_name):
+    from .tasks import generate_image_variants
+
+    try:
+        # Без повторных попыток: недоступный брокер не должен задерживать ответ
+        generate_image_variants.apply_async((model_label, pk, field_name), retry=False)
+    except Exception:
+        # Без вариантов клиенты получают оригинал
+        logger.exception('Failed to enqueue image variants for %s %s', model_label, pk)
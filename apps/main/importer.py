@@ -0,0 +1,455 @@
+"""
+Пакетный импорт контента: пользователи, категории, посты, комментарии.
+
+Записи читаются потоком из JSONL или CSV (в том числе .gz) и вставляются
+через bulk_create пачками, без save(), сигналов и запросов на каждую строку.
+Уникальные slug выделяются в памяти по набору уже занятых, авторы,
+категории и посты ищутся по словарям в памяти. Ответы на комментарии из
+той же пачки вставляются без родителя, родитель проставляется одним
+bulk_update после вставки пачки.
+
+Контрольная точка (JSON-файл) позволяет продолжить прерванный импорт:
+перед коммитом пачки в нее записывается ожидающая пачка с первым pk,
+после коммита - новая позиция. При перезапуске ожидающая пачка
+подтверждается по наличию этого pk в БД, поэтому строки не дублируются.
+"""
+import csv
+import gzip
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from apps.comments.models import Comment
+from .models import Category, Post, post_text_stats
+from .leaderboards import rebuild_leaderboards
+from .response_cache import invalidate_tags
+
+User = get_user_model()
+
+ENTITIES = ('users', 'categories', 'posts', 'comments')
+
+
+class ContentImportError(Exception):
+    """Ошибка входных данных импорта"""
+
+
+def read_records(path):
+    """Потоково читает записи из .jsonl/.ndjson или .csv (опционально .gz)"""
+    name = path[:-3] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as handle:
+        if name.endswith('.csv'):
+            yield from csv.DictReader(handle)
+        elif name.endswith(('.jsonl', '.ndjson', '.json')):
+            for line in handle:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            raise ContentImportError(f'Unsupported file format: {path}')
+
+
+class SlugAllocator:
+    """Выделяет уникальные slug в памяти без запроса к БД на каждую запись"""
+
+    def __init__(self, existing, max_length):
+        self.taken = set(existing)
+        self.max_length = max_length
+        # Следующий свободный суффикс для каждой основы: одинаковые заголовки
+        # не перебирают уже выданные суффиксы заново
+        self.next_suffix = {}
+
+    def allocate(self, text, preferred=None):
+        base = slugify(preferred or text)[:self.max_length] or 'item'
+        slug = base
+        suffix = self.next_suffix.get(base, 2)
+        while slug in self.taken:
+            tail = f'-{suffix}'
+            slug = base[:self.max_length - len(tail)] + tail
+            suffix += 1
+        self.next_suffix[base] = suffix
+        self.taken.add(slug)
+        return slug
+
+
+class Checkpoint:
+    """
+    Позиции импорта и соответствия внешних id созданным pk.
+    Хранится в JSON-файле рядом с файлами соответствий <path>.<entity>.map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {'offsets': {}, 'pending': None}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                self.state = json.load(handle)
+
+    def offset(self, entity):
+        return self.state['offsets'].get(entity, 0)
+
+    def load_map(self, entity):
+        mapping = {}
+        map_path = f'{self.path}.{entity}.map'
+        if os.path.exists(map_path):
+            with open(map_path, encoding='utf-8') as handle:
+                for line in handle:
+                    external_id, pk = line.rstrip('\n').split('\t')
+                    mapping[external_id] = int(pk)
+        return mapping
+
+    def begin(self, entity, offset, first_pk, mapping):
+        """Записывает пачку как ожидающую (вызывается внутри транзакции)"""
+        self.state['pending'] = {
+            'entity': entity,
+            'offset': offset,
+            'first_pk': first_pk,
+            'map': mapping,
+        }
+        self._write()
+
+    def commit(self):
+        """Подтверждает ожидающую пачку после коммита транзакции"""
+        pending = self.state['pending']
+        if pending['map']:
+            with open(f'{self.path}.{pending["entity"]}.map', 'a', encoding='utf-8') as handle:
+                handle.writelines(f'{external_id}\t{pk}\n' for external_id, pk in pending['map'])
+        self.state['offsets'][pending['entity']] = pending['offset']
+        self.state['pending'] = None
+        self._write()
+
+    def recover(self, models):
+        """Завершает пачку, прерванную между коммитом и подтверждением"""
+        pending = self.state['pending']
+        if pending is None:
+            return
+        model = models[pending['entity']]
+        if pending['first_pk'] is not None and model.objects.filter(pk=pending['first_pk']).exists():
+            self.commit()
+        else:
+            self.state['pending'] = None
+            self._write()
+
+    def _write(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(self.state, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.path)
+
+
+@contextmanager
+def keep_timestamps(*models):
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из источника"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def increment_counters(model, field, deltas):
+    """UPDATE ... SET field = field + n, сгруппированный по величине приращения"""
+    by_amount = defaultdict(list)
+    for pk, amount in deltas.items():
+        if amount:
+            by_amount[amount].append(pk)
+    for amount, pks in by_amount.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + amount})
+
+
+def _as_bool(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def _as_int(value, default=0):
+    if value in (None, ''):
+        return default
+    return int(value)
+
+
+class ContentImporter:
+    """Импорт сущностей в порядке зависимостей с пакетной вставкой"""
+
+    models = {
+        'users': User,
+        'categories': Category,
+        'posts': Post,
+        'comments': Comment,
+    }
+
+    def __init__(self, batch_size=2000, checkpoint_path=None, log=None):
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.stats = {entity: {'created': 0, 'skipped': 0} for entity in ENTITIES}
+
+    def run(self, sources):
+        """sources: {entity: path}; сущности импортируются в порядке ENTITIES"""
+        if self.checkpoint:
+            self.checkpoint.recover(self.models)
+        self.load_maps()
+
+        with keep_timestamps(User, Category, Post, Comment):
+            for entity in ENTITIES:
+                if sources.get(entity):
+                    self.import_entity(entity, sources[entity])
+
+        invalidate_tags('posts', 'feed', 'pins')
+        if sources.get('posts'):
+            rebuild_leaderboards()
+        return self.stats
+
+    def load_maps(self):
+        """Загружает справочники для поиска связей в памяти"""
+        self.users = {}
+        self.users_by_email = {}
+        for pk, username, email in User.objects.values_list('pk', 'username', 'email').iterator():
+            self.users[username] = pk
+            self.users_by_email[email.lower()] = pk
+
+        self.categories = {}
+        for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug'):
+            self.categories[name] = pk
+            self.categories[slug] = pk
+        self.category_slugs = SlugAllocator(
+            Category.objects.values_list('slug', flat=True),
+            Category._meta.get_field('slug').max_length,
+        )
+        self.post_slugs = SlugAllocator(
+            Post.objects.values_list('slug', flat=True).iterator(),
+            Post._meta.get_field('slug').max_length,
+        )
+
+        self.posts = self.checkpoint.load_map('posts') if self.checkpoint else {}
+        self.comments = self.checkpoint.load_map('comments') if self.checkpoint else {}
+
+    def import_entity(self, entity, path):
+        build = getattr(self, f'build_{entity}')
+        offset = self.checkpoint.offset(entity) if self.checkpoint else 0
+        if offset:
+            self.log(f'{entity}: resuming after {offset} records')
+
+        batch = []
+        self.batch_keys = set()
+        self.batch_parents = []
+        self.flushed_position = position = offset
+        for position, record in enumerate(read_records(path), start=1):
+            if position <= offset:
+                continue
+            item = build(record)
+            if item is None:
+                self.stats[entity]['skipped'] += 1
+            else:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self.flush(entity, batch, position)
+                batch = []
+        # Позиция сохраняется и для пачки, где все записи пропущены
+        if position > self.flushed_position:
+            self.flush(entity, batch, position)
+
+    def flush(self, entity, batch, position):
+        """Вставляет пачку и обновляет счетчики в одной транзакции"""
+        model = self.models[entity]
+        objects = [obj for obj, _ in batch]
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects)
+            getattr(self, f'after_{entity}')(batch)
+            mapping = [
+                (str(external_id), obj.pk) for obj, external_id in batch
+                if external_id not in (None, '')
+            ]
+            if self.checkpoint:
+                self.checkpoint.begin(
+                    entity, position, created[0].pk if created else None, mapping
+                )
+        if self.checkpoint:
+            self.checkpoint.commit()
+
+        self.remember(entity, batch)
+        self.batch_keys = set()
+        self.batch_parents = []
+        self.flushed_position = position
+        self.stats[entity]['created'] += len(created)
+        if created:
+            self.log(f'{entity}: {self.stats[entity]["created"]} imported')
+
+    def remember(self, entity, batch):
+        if entity == 'users':
+            for user, _ in batch:
+                self.users[user.username] = user.pk
+                self.users_by_email[user.email.lower()] = user.pk
+        elif entity == 'categories':
+            for category, _ in batch:
+                self.categories[category.name] = category.pk
+                self.categories[category.slug] = category.pk
+        elif entity == 'posts':
+            self.posts.update((str(ext), post.pk) for post, ext in batch if ext not in (None, ''))
+        elif entity == 'comments':
+            self.comments.update((str(ext), comment.pk) for comment, ext in batch if ext not in (None, ''))
+
+    def resolve_user(self, value):
+        if value in (None, ''):
+            return None
+        value = str(value)
+        return self.users.get(value) or self.users_by_email.get(value.lower())
+
+    def timestamp(self, value):
+        if value in (None, ''):
+            return self.now
+        parsed = parse_datetime(value) if isinstance(value, str) else value
+        if parsed is None:
+            raise ContentImportError(f'Invalid datetime: {value}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+    # Построение объектов: (объект, внешний id) или None, если запись пропускается
+
+    def build_users(self, record):
+        username = record.get('username')
+        email = (record.get('email') or '').lower()
+        if not username or not email:
+            return None
+        if username in self.users or email in self.users_by_email \
+                or username in self.batch_keys or f'@{email}' in self.batch_keys:
+            return None
+        self.batch_keys.update((username, f'@{email}'))
+
+        created_at = self.timestamp(record.get('created_at') or record.get('date_joined'))
+        user = User(
+            username=username,
+            email=record['email'],
+            first_name=record.get('first_name') or '',
+            last_name=record.get('last_name') or '',
+            bio=record.get('bio') or '',
+            # Принимаются только готовые хэши: хэширование на строку слишком медленное
+            password=record.get('password') or make_password(None),
+            is_active=_as_bool(record.get('is_active'), True),
+            date_joined=created_at,
+            created_at=created_at,
+            updated_at=self.timestamp(record.get('updated_at') or created_at),
+        )
+        return user, record.get('id')
+
+    def build_categories(self, record):
+        name = record.get('name')
+        if not name or name in self.categories or name in self.batch_keys:
+            return None
+        self.batch_keys.add(name)
+
+        category = Category(
+            name=name,
+            slug=self.category_slugs.allocate(name, record.get('slug')),
+            description=record.get('description') or '',
+            created_at=self.timestamp(record.get('created_at')),
+        )
+        return category, record.get('id')
+
+    def build_posts(self, record):
+        author_id = self.resolve_user(record.get('author'))
+        title = record.get('title')
+        if author_id is None or not title:
+            return None
+
+        category = record.get('category')
+        created_at = self.timestamp(record.get('created_at'))
+        content = record.get('content') or ''
+        post = Post(
+            title=title,
+            slug=self.post_slugs.allocate(title, record.get('slug')),
+            content=content,
+            # save() не вызывается, поля анонса заполняются здесь
+            **post_text_stats(content),
+            author_id=author_id,
+            category_id=self.categories.get(category) if category else None,
+            status=record.get('status') or 'published',
+            views_count=_as_int(record.get('views_count')),
+            comments_count=0,
+            created_at=created_at,
+            updated_at=self.timestamp(record.get('updated_at') or created_at),
+        )
+        return post, record.get('id')
+
+    def build_comments(self, record):
+        post_id = self.posts.get(str(record.get('post')))
+        author_id = self.resolve_user(record.get('author'))
+        if post_id is None or author_id is None or not record.get('content'):
+            return None
+
+        parent_id = parent_key = None
+        if record.get('parent') not in (None, ''):
+            parent_key = str(record['parent'])
+            parent_id = self.comments.get(parent_key)
+            if parent_id is None and parent_key not in self.batch_keys:
+                return None
+        if record.get('id') not in (None, ''):
+            self.batch_keys.add(str(record['id']))
+
+        created_at = self.timestamp(record.get('created_at'))
+        comment = Comment(
+            post_id=post_id,
+            author_id=author_id,
+            parent_id=parent_id,
+            content=record['content'],
+            is_active=_as_bool(record.get('is_active'), True),
+            created_at=created_at,
+            updated_at=self.timestamp(record.get('updated_at') or created_at),
+        )
+        if parent_id is None and parent_key is not None:
+            # Родитель в текущей пачке: pk появится только после вставки
+            self.batch_parents.append((comment, parent_key))
+        return comment, record.get('id')
+
+    # Денормализованные счетчики (сигналы при bulk_create не вызываются)
+
+    def after_users(self, batch):
+        pass
+
+    def after_categories(self, batch):
+        pass
+
+    def after_posts(self, batch):
+        deltas = defaultdict(int)
+        for post, _ in batch:
+            if post.status == 'published' and post.category_id:
+                deltas[post.category_id] += 1
+        increment_counters(Category, 'posts_count', deltas)
+
+    def after_comments(self, batch):
+        if self.batch_parents:
+            created = {str(ext): comment.pk for comment, ext in batch if ext not in (None, '')}
+            for comment, parent_key in self.batch_parents:
+                comment.parent_id = created[parent_key]
+            Comment.objects.bulk_update(
+                [comment for comment, _ in self.batch_parents], ['parent'], batch_size=self.batch_size
+            )
+        deltas = defaultdict(int)
+        for comment, _ in batch:
+            if comment.is_active:
+                deltas[comment.post_id] += 1
+        increment_counters(Post, 'comments_count', deltas)
+        invalidate_tags(*{f'comments:{comment.post_id}' for comment, _ in batch})
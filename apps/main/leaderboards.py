@@ -0,0 +1,357 @@
+"""
+Лидерборды популярных постов.
+
+Для каждого окна (все время, 7 дней, 24 часа) хранится только top-N
+постов в отсортированной структуре (память процесса или ZSET в Redis).
+Данные поступают при сбросе буфера просмотров, поэтому чтение лидерборда
+не сортирует таблицу постов: БД нужна только для загрузки победивших постов.
+
+Окна 7 дней и 24 часа складываются из почасовых корзин приращений просмотров.
+Корзины обрезаются до LEADERBOARD_BUCKET_SIZE постов, поэтому для длинного
+хвоста малопросматриваемых постов окна приближенные.
+
+При пересборке (периодической задачей и при первом чтении) все окна
+заполняются из БД: общий счетчик - из posts.views_count, корзины - из
+post_view_hours. Хранилище local живет в памяти процесса, поэтому
+пересобирается через LEADERBOARD_LOCAL_TTL секунд и после перезапуска.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .counters import current_hour
+from .response_cache import invalidate_tags
+
+ALL_TIME = 'all'
+WEEK = 'week'
+DAY = 'day'
+
+# Длина окна в часах, None - за все время
+WINDOWS = {
+    ALL_TIME: None,
+    WEEK: 7 * 24,
+    DAY: 24,
+}
+MAX_WINDOW_HOURS = max(hours for hours in WINDOWS.values() if hours)
+
+
+def _rank_key(item):
+    # При равных просмотрах выше более новый пост
+    return item[1], item[0]
+
+
+def _top_bucket(bucket, size):
+    return Counter(dict(heapq.nlargest(size, bucket.items(), key=_rank_key)))
+
+
+class LocalLeaderboard:
+    """Лидерборды в памяти текущего процесса; через ttl секунд собираются заново"""
+
+    def __init__(self, size, bucket_size, ttl=None):
+        self.size = size
+        self.bucket_size = bucket_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._seeded_at = None
+        self._totals = {}
+        self._buckets = {}
+        self._windows = {}
+
+    def is_seeded(self):
+        if self._seeded_at is None:
+            return False
+        return self.ttl is None or time.monotonic() - self._seeded_at < self.ttl
+
+    def seed(self, totals, buckets):
+        """Заменяет общий счетчик и почасовые корзины {hour: {post_id: views}}"""
+        with self._lock:
+            self._totals = dict(heapq.nlargest(self.size, totals.items(), key=_rank_key))
+            self._buckets = {
+                hour: _top_bucket(bucket, self.bucket_size) for hour, bucket in buckets.items()
+            }
+            self._windows.clear()
+            self._seeded_at = time.monotonic()
+
+    def update_totals(self, totals):
+        """Обновляет общее число просмотров постов и обрезает до top-N"""
+        with self._lock:
+            self._totals.update(totals)
+            if len(self._totals) > self.size:
+                self._totals = dict(
+                    heapq.nlargest(self.size, self._totals.items(), key=_rank_key)
+                )
+
+    def add_views(self, deltas, hour):
+        """Добавляет приращения просмотров в корзину часа"""
+        with self._lock:
+            bucket = self._buckets.setdefault(hour, Counter())
+            bucket.update(deltas)
+            if len(bucket) > self.bucket_size:
+                self._buckets[hour] = Counter(dict(bucket.most_common(self.bucket_size)))
+            for old_hour in [h for h in self._buckets if h <= hour - MAX_WINDOW_HOURS]:
+                del self._buckets[old_hour]
+            self._windows.clear()
+
+    def remove(self, post_ids):
+        with self._lock:
+            for post_id in post_ids:
+                self._totals.pop(post_id, None)
+                for bucket in self._buckets.values():
+                    bucket.pop(post_id, None)
+            self._windows.clear()
+
+    def top(self, window, limit, hour):
+        with self._lock:
+            hours = WINDOWS[window]
+            if hours is None:
+                items = self._totals.items()
+            else:
+                # Сумма корзин окна пересчитывается только после новых просмотров
+                scores = self._windows.get((window, hour))
+                if scores is None:
+                    scores = Counter()
+                    for bucket_hour in range(hour - hours + 1, hour + 1):
+                        scores.update(self._buckets.get(bucket_hour, {}))
+                    scores = dict(heapq.nlargest(self.size, scores.items(), key=_rank_key))
+                    self._windows[(window, hour)] = scores
+                items = scores.items()
+            return [post_id for post_id, _ in heapq.nlargest(limit, items, key=_rank_key)]
+
+
+class RedisLeaderboard:
+    """Лидерборды в ZSET Redis, общие для всех процессов"""
+
+    totals_key = 'leaderboard:all'
+    seeded_key = 'leaderboard:seeded'
+    bucket_key = 'leaderboard:hour:{hour}'
+    window_key = 'leaderboard:window:{window}:{hour}'
+    # Сумма корзин окна кэшируется до следующих просмотров
+    window_ttl = 60
+
+    def __init__(self, url, size, bucket_size):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.size = size
+        self.bucket_size = bucket_size
+
+    def is_seeded(self):
+        return bool(self._client.exists(self.seeded_key))
+
+    def seed(self, totals, buckets):
+        hour = current_hour()
+        pipe = self._client.pipeline()
+        pipe.delete(self.totals_key)
+        if totals:
+            pipe.zadd(self.totals_key, totals)
+            pipe.zremrangebyrank(self.totals_key, 0, -(self.size + 1))
+        for bucket_hour in range(hour - MAX_WINDOW_HOURS + 1, hour + 1):
+            key = self.bucket_key.format(hour=bucket_hour)
+            pipe.delete(key)
+            if buckets.get(bucket_hour):
+                pipe.zadd(key, _top_bucket(buckets[bucket_hour], self.bucket_size))
+                pipe.expire(key, (MAX_WINDOW_HOURS + 1) * 3600)
+        for window, hours in WINDOWS.items():
+            if hours:
+                pipe.delete(self.window_key.format(window=window, hour=hour))
+        pipe.set(self.seeded_key, 1)
+        pipe.execute()
+
+    def update_totals(self, totals):
+        if not totals:
+            return
+        pipe = self._client.pipeline()
+        pipe.zadd(self.totals_key, totals)
+        pipe.zremrangebyrank(self.totals_key, 0, -(self.size + 1))
+        pipe.execute()
+
+    def add_views(self, deltas, hour):
+        key = self.bucket_key.format(hour=hour)
+        pipe = self._client.pipeline()
+        for post_id, amount in deltas.items():
+            pipe.zincrby(key, amount, post_id)
+        pipe.zremrangebyrank(key, 0, -(self.bucket_size + 1))
+        pipe.expire(key, (MAX_WINDOW_HOURS + 1) * 3600)
+        for window, hours in WINDOWS.items():
+            if hours:
+                pipe.delete(self.window_key.format(window=window, hour=hour))
+        pipe.execute()
+
+    def remove(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        hour = current_hour()
+        pipe = self._client.pipeline()
+        pipe.zrem(self.totals_key, *post_ids)
+        for bucket_hour in range(hour - MAX_WINDOW_HOURS + 1, hour + 1):
+            pipe.zrem(self.bucket_key.format(hour=bucket_hour), *post_ids)
+        for window, hours in WINDOWS.items():
+            if hours:
+                pipe.delete(self.window_key.format(window=window, hour=hour))
+        pipe.execute()
+
+    def top(self, window, limit, hour):
+        hours = WINDOWS[window]
+        if hours is None:
+            key = self.totals_key
+        else:
+            key = self.window_key.format(window=window, hour=hour)
+            if not self._client.exists(key):
+                buckets = [
+                    self.bucket_key.format(hour=bucket_hour)
+                    for bucket_hour in range(hour - hours + 1, hour + 1)
+                ]
+                pipe = self._client.pipeline()
+                pipe.zunionstore(key, buckets)
+                pipe.zremrangebyrank(key, 0, -(self.size + 1))
+                pipe.expire(key, self.window_ttl)
+                pipe.execute()
+        return [int(post_id) for post_id in self._client.zrevrange(key, 0, limit - 1)]
+
+
+_board = None
+_board_lock = threading.Lock()
+
+
+def get_leaderboard():
+    """Возвращает хранилище лидербордов, выбранное в настройках"""
+    global _board
+    if _board is None:
+        with _board_lock:
+            if _board is None:
+                size = getattr(settings, 'LEADERBOARD_SIZE', 100)
+                bucket_size = getattr(settings, 'LEADERBOARD_BUCKET_SIZE', 1000)
+                backend = getattr(settings, 'LEADERBOARD_BACKEND', 'local')
+                if backend == 'redis':
+                    _board = RedisLeaderboard(settings.VIEW_COUNTER_REDIS_URL, size, bucket_size)
+                else:
+                    ttl = getattr(settings, 'LEADERBOARD_LOCAL_TTL', 300)
+                    _board = LocalLeaderboard(size, bucket_size, ttl)
+    return _board
+
+
+def reset_leaderboard():
+    """Сбрасывает выбранное хранилище (используется в тестах)"""
+    global _board
+    _board = None
+
+
+def rebuild_leaderboards():
+    """
+    Заполняет лидерборды из БД: за все время - по views_count,
+    окна - по почасовым корзинам post_view_hours за последние 7 дней.
+    """
+    from .analytics import hour_start
+    from .models import Post, PostViewHour
+
+    board = get_leaderboard()
+    totals = dict(
+        Post.objects.published()
+        .order_by('-views_count', '-id')
+        .values_list('id', 'views_count')[:board.size]
+    )
+
+    buckets = {}
+    rows = PostViewHour.objects.filter(
+        hour__gte=hour_start(current_hour() - MAX_WINDOW_HOURS + 1),
+        post__status='published',
+    ).values_list('post_id', 'hour', 'views')
+    for post_id, hour, views in rows.iterator(chunk_size=2000):
+        bucket = buckets.setdefault(int(hour.timestamp() // 3600), Counter())
+        bucket[post_id] += views
+
+    board.seed(totals, buckets)
+    return len(totals)
+
+
+def record_flushed_views(deltas):
+    """
+    Обновляет лидерборды после записи просмотров в БД.
+    Вызывается из flush_pending_views с приращениями {post_id: views}.
+    """
+    from .models import Post
+
+    board = get_leaderboard()
+    if not board.is_seeded():
+        # Сид и корзины из post_view_hours уже содержат только что записанные просмотры
+        rebuild_leaderboards()
+    else:
+        batch_size = getattr(settings, 'VIEW_COUNTER_BATCH_SIZE', 500)
+        post_ids = list(deltas)
+        for start in range(0, len(post_ids), batch_size):
+            board.update_totals(dict(
+                Post.objects.published()
+                .filter(id__in=post_ids[start:start + batch_size])
+                .values_list('id', 'views_count')
+            ))
+        board.add_views(deltas, current_hour())
+    invalidate_tags('leaderboard')
+
+
+def remove_from_leaderboards(post_ids):
+    """Удаляет посты из лидербордов"""
+    get_leaderboard().remove(post_ids)
+
+
+def top_post_ids(window, limit):
+    """id самых просматриваемых постов окна без обращения к БД"""
+    board = get_leaderboard()
+    if not board.is_seeded():
+        rebuild_leaderboards()
+    return board.top(window, limit, current_hour())
+
+
+def top_posts(window, limit, queryset=None, exclude=()):
+    """
+    Загружает посты лидерборда в порядке рейтинга.
+    Неопубликованные и удаленные посты пропускаются; в БД
+    обычно запрашиваются только limit постов.
+    """
+    from .models import Post
+
+    if queryset is None:
+        queryset = Post.objects.all()
+    queryset = queryset.filter(status='published')
+    board = get_leaderboard()
+
+    candidates = [
+        post_id for post_id in top_post_ids(window, board.size)
+        if post_id not in exclude
+    ]
+    posts = []
+    start = 0
+    while len(posts) < limit and start < len(candidates):
+        chunk = candidates[start:start + limit - len(posts)]
+        start += len(chunk)
+        found = queryset.in_bulk(chunk)
+        posts.extend(found[post_id] for post_id in chunk if post_id in found)
+    return posts
+
+
+async def atop_posts(window, limit, queryset=None, exclude=()):
+    """top_posts() для асинхронных представлений"""
+    from .models import Post
+
+    if queryset is None:
+        queryset = Post.objects.all()
+    queryset = queryset.filter(status='published')
+    board = get_leaderboard()
+
+    # Лидерборд может быть в Redis, а при первом чтении собирается из БД
+    candidates = [
+        post_id for post_id in await sync_to_async(top_post_ids)(window, board.size)
+        if post_id not in exclude
+    ]
+    posts = []
+    start = 0
+    while len(posts) < limit and start < len(candidates):
+        chunk = candidates[start:start + limit - len(posts)]
+        start += len(chunk)
+        found = await queryset.ain_bulk(chunk)
+        posts.extend(found[post_id] for post_id in chunk if post_id in found)
+    return posts
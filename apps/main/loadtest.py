@@ -0,0 +1,419 @@
+"""
+Нагрузочный тест HTTP API (manage.py load_test).
+
+Клиент на asyncio держит concurrency соединений keep-alive и выполняет
+запросы к эндпоинтам в заданных долях (mix). Цели запросов (slug постов,
+посты с комментариями, пользователи для входа) выбираются из БД
+проекта, поэтому тест запускается против сервера с теми же данными,
+обычно созданными командой seed_bench.
+
+Первые warmup секунд запросы выполняются, но не учитываются. Отчет -
+JSON с числом запросов, ошибок, пропускной способностью и p50/p95/p99
+задержки по каждому эндпоинту и в целом: отчеты разных запусков можно
+сравнивать.
+
+Сравнение воркеров gunicorn (manage.py bench_workers) запускает сервер
+с config/gunicorn.py для каждого профиля (класс воркеров и их число) и
+каждой задержки запросов к БД (QUERY_DELAY_MS) и выполняет тот же тест.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max, Min
+
+from .benchdata import BENCH_EMAIL_DOMAIN, BENCH_PASSWORD
+from .models import Post
+
+User = get_user_model()
+
+# Каталог проекта: рабочий каталог gunicorn
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+
+# Эндпоинт: (метод, функция пути от целей)
+ENDPOINTS = {
+    'feed': ('GET', lambda targets, rng: '/api/v1/posts/'),
+    'detail': ('GET', lambda targets, rng: f'/api/v1/posts/{rng.choice(targets.slugs)}/'),
+    'comments': ('GET', lambda targets, rng: f'/api/v1/comments/post/{rng.choice(targets.discussed)}/'),
+    'pinned': ('GET', lambda targets, rng: '/api/v1/subscribe/pinned-posts/'),
+    'popular': ('GET', lambda targets, rng: '/api/v1/posts/popular/'),
+    'featured': ('GET', lambda targets, rng: '/api/v1/posts/featured/'),
+    'recent': ('GET', lambda targets, rng: '/api/v1/posts/recent/'),
+    'login': ('POST', lambda targets, rng: '/api/v1/auth/login/'),
+}
+DEFAULT_MIX = {'feed': 40, 'detail': 25, 'comments': 20, 'pinned': 10, 'login': 5}
+# Асинхронные эндпоинты чтения поровну: сравнение воркеров gunicorn
+READ_MIX = {'recent': 1, 'popular': 1, 'featured': 1, 'pinned': 1, 'detail': 1, 'comments': 1}
+MIXES = {'default': DEFAULT_MIX, 'reads': READ_MIX}
+# Класс воркеров gunicorn и приложение для него
+WORKER_CLASSES = {
+    'sync': ('sync', 'config.wsgi:application'),
+    'uvicorn': ('uvicorn_worker.UvicornWorker', 'config.asgi:application'),
+}
+
+
+class LoadTestError(Exception):
+    """Некорректные параметры нагрузочного теста"""
+
+
+def parse_mix(value):
+    """'feed=40,detail=25' -> {'feed': 40.0, 'detail': 25.0}; или имя из MIXES"""
+    if value.strip() in MIXES:
+        return {name: float(weight) for name, weight in MIXES[value.strip()].items()}
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise LoadTestError(f'Unknown endpoint "{name}". Available: {", ".join(ENDPOINTS)}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise LoadTestError(f'Invalid weight for "{name}": {weight!r}')
+        if mix[name] < 0:
+            raise LoadTestError(f'Weight for "{name}" must not be negative')
+    if not any(mix.values()):
+        raise LoadTestError('The endpoint mix is empty')
+    return mix
+
+
+def percentile(ordered, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, errors, duration):
+    """Сводка по задержкам успешных запросов (секунды) в миллисекундах"""
+    ordered = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        'requests': len(ordered) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / duration, 2) if duration else 0.0,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'max_ms': ms(ordered[-1]) if ordered else None,
+    }
+
+
+class Targets:
+    """Случайная выборка объектов из БД для путей и тел запросов"""
+
+    def __init__(self, slugs=(), discussed=(), emails=(), password=BENCH_PASSWORD):
+        self.slugs = list(slugs)
+        self.discussed = list(discussed)
+        self.emails = list(emails)
+        self.password = password
+
+    @classmethod
+    def sample(cls, size=1000, seed=None, password=BENCH_PASSWORD):
+        """Выборка по случайным pk: без ORDER BY random() по всей таблице"""
+        rng = random.Random(seed)
+        published = Post.objects.published()
+        posts = list(
+            published.filter(pk__in=cls.random_pks(published, size, rng))
+            .values_list('pk', 'slug', 'comments_count')[:size]
+        )
+        users = User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}', is_active=True)
+        return cls(
+            slugs=[slug for _, slug, _ in posts],
+            discussed=[pk for pk, _, comments in posts if comments] or [pk for pk, _, _ in posts],
+            emails=users.filter(pk__in=cls.random_pks(users, size, rng)).values_list('email', flat=True)[:size],
+            password=password,
+        )
+
+    @staticmethod
+    def random_pks(queryset, size, rng):
+        # С запасом: в диапазоне pk есть пропуски и строки, не подходящие под фильтр
+        bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return []
+        return [rng.randint(bounds['first'], bounds['last']) for _ in range(size * 2)]
+
+    def missing(self, mix):
+        """Эндпоинты из mix, для которых в БД нет целей"""
+        required = {'detail': self.slugs, 'comments': self.discussed, 'login': self.emails}
+        return [name for name, weight in mix.items() if weight and name in required and not required[name]]
+
+    def request(self, name, rng):
+        """Метод, путь и тело запроса к эндпоинту"""
+        method, path = ENDPOINTS[name]
+        body = None
+        if name == 'login':
+            body = {'email': rng.choice(self.emails), 'password': self.password}
+        return method, path(self, rng), body
+
+
+class HTTPConnection:
+    """Соединение HTTP/1.1 keep-alive: минимальный клиент без зависимостей"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.secure = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.secure else 80)
+        self.host_header = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Выполняет запрос и читает ответ целиком; возвращает код ответа"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=ssl.create_default_context() if self.secure else None
+            )
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = [
+            f'{method} {self.prefix}{path} HTTP/1.1',
+            f'Host: {self.host_header}',
+            'Accept: application/json',
+            'User-Agent: load-test',
+        ]
+        if body is not None:
+            head += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+        try:
+            self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + payload)
+            status, headers = await self.read_head()
+            await self.read_body(headers)
+        except BaseException:
+            self.close()
+            raise
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    async def read_head(self):
+        lines = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def read_body(self, headers):
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    return
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class LoadRunner:
+    """Выполняет запросы в concurrency соединениях и собирает задержки"""
+
+    def __init__(self, url, targets, mix=None, concurrency=50, duration=30.0, warmup=5.0,
+                 seed=None, timeout=30.0):
+        self.url = url
+        self.targets = targets
+        self.mix = dict(mix or DEFAULT_MIX)
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.timeout = timeout
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def run(self):
+        missing = self.targets.missing(self.mix)
+        if missing:
+            raise LoadTestError(
+                f'No targets in the database for: {", ".join(missing)}. '
+                'Run manage.py seed_bench or remove them from the mix.'
+            )
+        asyncio.run(self.load())
+        return self.report()
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        self.started = loop.time() + self.warmup
+        self.deadline = self.started + self.duration
+        workers = [asyncio.ensure_future(self.worker(index)) for index in range(self.concurrency)]
+        # Запросы, не завершившиеся к концу теста, не учитываются
+        await asyncio.wait(workers, timeout=self.warmup + self.duration + self.timeout)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def worker(self, index):
+        loop = asyncio.get_running_loop()
+        rng = random.Random(None if self.seed is None else f'{self.seed}:{index}')
+        names, weights = zip(*self.mix.items())
+        connection = HTTPConnection(self.url)
+        try:
+            while loop.time() < self.deadline:
+                name = rng.choices(names, weights)[0]
+                method, path, body = self.targets.request(name, rng)
+                started = loop.time()
+                try:
+                    status = await asyncio.wait_for(connection.request(method, path, body), self.timeout)
+                    failed = status >= 400
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ValueError, IndexError):
+                    failed = True
+                finished = loop.time()
+                if started < self.started or finished > self.deadline:
+                    continue
+                if failed:
+                    self.errors[name] += 1
+                else:
+                    self.latencies[name].append(finished - started)
+        finally:
+            connection.close()
+
+    def report(self):
+        endpoints = {
+            name: summarize(self.latencies[name], self.errors[name], self.duration)
+            for name in self.mix if self.mix[name]
+        }
+        return {
+            'url': self.url,
+            'concurrency': self.concurrency,
+            'duration': self.duration,
+            'warmup': self.warmup,
+            'mix': self.mix,
+            'total': summarize(
+                [latency for values in self.latencies.values() for latency in values],
+                sum(self.errors.values()),
+                self.duration,
+            ),
+            'endpoints': endpoints,
+        }
+
+
+def run_load_test(url, mix=None, concurrency=50, duration=30.0, warmup=5.0, seed=None,
+                  sample_size=1000, password=BENCH_PASSWORD):
+    """Выбирает цели из БД и выполняет нагрузочный тест; возвращает отчет"""
+    targets = Targets.sample(sample_size, seed, password)
+    runner = LoadRunner(url, targets, mix, concurrency, duration, warmup, seed)
+    return runner.run()
+
+
+def parse_profiles(value):
+    """'sync:3,uvicorn:1' -> [('sync', 3), ('uvicorn', 1)]"""
+    profiles = []
+    for part in value.split(','):
+        name, _, workers = part.strip().partition(':')
+        if name not in WORKER_CLASSES:
+            raise LoadTestError(f'Unknown worker class "{name}". Available: {", ".join(WORKER_CLASSES)}')
+        try:
+            workers = int(workers or 1)
+        except ValueError:
+            raise LoadTestError(f'Invalid number of workers for "{name}": {workers!r}')
+        if workers <= 0:
+            raise LoadTestError(f'Number of workers for "{name}" must be positive')
+        profiles.append((name, workers))
+    return profiles
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(worker_class, workers, delay_ms=0.0, start_timeout=60.0):
+    """Запускает gunicorn с config/gunicorn.py на свободном порту; возвращает URL"""
+    klass, application = WORKER_CLASSES[worker_class]
+    port = free_port()
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=klass,
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        QUERY_DELAY_MS=str(delay_ms),
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', application, '-c', os.path.join('config', 'gunicorn.py')],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + start_timeout
+        while True:
+            if server.poll() is not None:
+                raise LoadTestError(f'gunicorn ({worker_class} x{workers}) exited with code {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise LoadTestError(f'gunicorn ({worker_class} x{workers}) did not start')
+                time.sleep(0.2)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def run_worker_benchmark(profiles, delays, mix=None, concurrency=200, duration=15.0, warmup=5.0,
+                         seed=None, sample_size=1000, server=gunicorn_server, log=None):
+    """
+    Нагрузочный тест для каждой задержки БД и каждого профиля воркеров на
+    одних и тех же целях. Возвращает строки с пропускной способностью и p99.
+    """
+    log = log or (lambda message: None)
+    targets = Targets.sample(sample_size, seed)
+    results = []
+    for delay in delays:
+        for worker_class, workers in profiles:
+            log(f'{worker_class} x{workers}, {delay:g} ms per query')
+            with server(worker_class, workers, delay) as url:
+                report = LoadRunner(url, targets, mix or READ_MIX, concurrency, duration, warmup, seed).run()
+            results.append({
+                'profile': f'{worker_class} x{workers}',
+                'delay_ms': delay,
+                'throughput_rps': report['total']['throughput_rps'],
+                'p99_ms': report['total']['p99_ms'],
+                'errors': report['total']['errors'],
+                'report': report,
+            })
+    return results
+
+
+def format_benchmark(results):
+    """Таблица req/s: строки - задержка БД, столбцы - профили воркеров"""
+    profiles = list(dict.fromkeys(row['profile'] for row in results))
+    delays = list(dict.fromkeys(row['delay_ms'] for row in results))
+    cells = {(row['delay_ms'], row['profile']): row['throughput_rps'] for row in results}
+    lines = ['DB round trip'.ljust(16) + ''.join(profile.rjust(14) for profile in profiles)]
+    for delay in delays:
+        lines.append(f'{delay:g} ms'.ljust(16) + ''.join(
+            str(cells.get((delay, profile), '-')).rjust(14) for profile in profiles
+        ))
+    return '\n'.join(lines)
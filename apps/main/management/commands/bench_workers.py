@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.main.loadtest import (
+    ENDPOINTS, MIXES, LoadTestError, format_benchmark, parse_mix, parse_profiles, run_worker_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn with config/gunicorn.py for each worker profile and simulated '
+        'database round trip, run the same load test against it and print req/s per profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', default='sync:3,uvicorn:1,uvicorn:3',
+            help='Worker class and number of workers, e.g. sync:3,uvicorn:1 (default: sync:3,uvicorn:1,uvicorn:3)',
+        )
+        parser.add_argument(
+            '--delays', default='0,5,20',
+            help='Sleep before every database query in ms, simulating the network (default: 0,5,20)',
+        )
+        parser.add_argument(
+            '--mix', default='reads',
+            help=f'Endpoint weights or a preset ({", ".join(MIXES)}). Endpoints: {", ".join(ENDPOINTS)}',
+        )
+        parser.add_argument('--concurrency', type=int, default=200, help='Open connections (default: 200)')
+        parser.add_argument('--duration', type=float, default=15.0, help='Measured seconds per run (default: 15)')
+        parser.add_argument(
+            '--warmup', type=float, default=5.0,
+            help='Seconds of load before measuring starts (default: 5)',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for targets and request order')
+        parser.add_argument(
+            '--sample', type=int, default=1000,
+            help='Posts and users sampled from the database as targets (default: 1000)',
+        )
+        parser.add_argument('--output', help='Also write the full JSON reports to this file')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] <= 0 or options['duration'] <= 0 or options['sample'] <= 0:
+            raise CommandError('--concurrency, --duration and --sample must be positive')
+        if options['warmup'] < 0:
+            raise CommandError('--warmup must not be negative')
+        try:
+            delays = [float(delay) for delay in options['delays'].split(',')]
+        except ValueError:
+            raise CommandError(f'Invalid --delays: {options["delays"]!r}')
+        if any(delay < 0 for delay in delays):
+            raise CommandError('--delays must not be negative')
+
+        try:
+            results = run_worker_benchmark(
+                parse_profiles(options['profiles']),
+                delays,
+                mix=parse_mix(options['mix']),
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                sample_size=options['sample'],
+                log=lambda message: self.stdout.write(f'  {message}') if options['verbosity'] > 1 else None,
+            )
+        except LoadTestError as error:
+            raise CommandError(str(error))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(json.dumps(results, indent=2) + '\n')
+        self.stdout.write(format_benchmark(results))
+        errors = sum(row['errors'] for row in results)
+        if errors:
+            self.stdout.write(self.style.WARNING(f'{errors} requests failed; see the JSON reports'))
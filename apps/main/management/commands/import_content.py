@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.main.importer import ContentImporter, ContentImportError, ENTITIES
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users, categories, posts and comments from JSONL or CSV files'
+
+    def add_arguments(self, parser):
+        for entity in ENTITIES:
+            parser.add_argument(
+                f'--{entity}',
+                type=str,
+                help=f'Path to {entity} file (.jsonl, .ndjson or .csv, optionally .gz)',
+            )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of rows per bulk insert and transaction (default: 2000)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Checkpoint file used to resume an interrupted import',
+        )
+
+    def handle(self, *args, **options):
+        sources = {entity: options[entity] for entity in ENTITIES if options[entity]}
+        if not sources:
+            raise CommandError(
+                'Nothing to import. Usage example:'
+                '\n  python manage.py import_content --users users.jsonl --posts posts.csv.gz'
+                ' --comments comments.jsonl --checkpoint import.ckpt'
+            )
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        importer = ContentImporter(
+            batch_size=options['batch_size'],
+            checkpoint_path=options['checkpoint'],
+            log=lambda message: self.stdout.write(f'  {message}'),
+        )
+
+        started = time.monotonic()
+        try:
+            stats = importer.run(sources)
+        except (ContentImportError, ValueError, KeyError) as error:
+            raise CommandError(f'Import failed: {error}')
+
+        for entity in ENTITIES:
+            if entity in sources:
+                self.stdout.write(
+                    f'{entity}: {stats[entity]["created"]} created, '
+                    f'{stats[entity]["skipped"]} skipped'
+                )
+        self.stdout.write(
+            self.style.SUCCESS(f'Import finished in {time.monotonic() - started:.1f}s.')
+        )
@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.main.benchdata import BENCH_PASSWORD
+from apps.main.loadtest import DEFAULT_MIX, ENDPOINTS, LoadTestError, parse_mix, run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a weighted mix of API requests against a running server and report '
+        'p50/p95/p99 latency and throughput per endpoint as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='Base URL of the server under test (default: http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help=f'Endpoint weights, e.g. feed=40,detail=25. Endpoints: {", ".join(ENDPOINTS)}',
+        )
+        parser.add_argument('--concurrency', type=int, default=50, help='Open connections (default: 50)')
+        parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds (default: 30)')
+        parser.add_argument(
+            '--warmup', type=float, default=5.0,
+            help='Seconds of load before measuring starts (default: 5)',
+        )
+        parser.add_argument('--seed', type=int, help='Random seed for targets and request order')
+        parser.add_argument(
+            '--sample', type=int, default=1000,
+            help='Posts and users sampled from the database as targets (default: 1000)',
+        )
+        parser.add_argument(
+            '--password', default=BENCH_PASSWORD,
+            help='Password of the users logging in (default: the seed_bench password)',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] <= 0 or options['duration'] <= 0 or options['sample'] <= 0:
+            raise CommandError('--concurrency, --duration and --sample must be positive')
+        if options['warmup'] < 0:
+            raise CommandError('--warmup must not be negative')
+
+        try:
+            report = run_load_test(
+                options['url'],
+                mix=parse_mix(options['mix']),
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                sample_size=options['sample'],
+                password=options['password'],
+            )
+        except LoadTestError as error:
+            raise CommandError(str(error))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(output + '\n')
+            total = report['total']
+            self.stdout.write(self.style.SUCCESS(
+                f'{total["requests"]} requests, {total["errors"]} errors, '
+                f'{total["throughput_rps"]} req/s, p99 {total["p99_ms"]} ms. '
+                f'Report written to {options["output"]}.'
+            ))
+        else:
+            self.stdout.write(output)
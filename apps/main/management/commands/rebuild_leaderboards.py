@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the all-time popular posts leaderboard from the database'
+
+    def handle(self, *args, **options):
+        total = rebuild_leaderboards()
+        self.stdout.write(
+            self.style.SUCCESS(f'All-time leaderboard rebuilt with {total} posts.')
+        )
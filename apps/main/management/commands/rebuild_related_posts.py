@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the related posts table from TF-IDF similarity of published posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, help='Related posts stored per post')
+        parser.add_argument('--block-size', type=int, help='Rows per similarity matrix multiply')
+
+    def handle(self, *args, **options):
+        total = rebuild_related_posts(options['count'], options['block_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Related posts table rebuilt with {total} entries.')
+        )
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from apps.comments.models import Comment
+from apps.main.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recalculate Post.comments_count from active comments in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of posts to check per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted posts without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        checked = 0
+        fixed = 0
+        last_id = 0
+
+        while True:
+            with transaction.atomic():
+                # Блокируем пачку постов, чтобы параллельные комментарии
+                # не изменили счетчик между подсчетом и записью
+                posts = list(
+                    Post.objects.filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .select_for_update()
+                    .only('pk', 'comments_count')[:chunk_size]
+                )
+                if not posts:
+                    break
+                last_id = posts[-1].pk
+
+                actual = dict(
+                    Comment.objects.filter(
+                        post_id__in=[post.pk for post in posts],
+                        is_active=True
+                    ).order_by().values('post_id').annotate(
+                        total=Count('id')
+                    ).values_list('post_id', 'total')
+                )
+
+                drifted = []
+                for post in posts:
+                    expected = actual.get(post.pk, 0)
+                    if post.comments_count != expected:
+                        self.stdout.write(
+                            f'  Post {post.pk}: stored {post.comments_count}, actual {expected}'
+                        )
+                        post.comments_count = expected
+                        drifted.append(post)
+
+                if drifted and not dry_run:
+                    Post.objects.bulk_update(drifted, ['comments_count'])
+
+            checked += len(posts)
+            fixed += len(drifted)
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'Checked {checked} posts, {fixed} have drifted counters (dry run).')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Checked {checked} posts, fixed {fixed} counters.')
+            )
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.main.benchdata import BENCH_PASSWORD, BenchDataError, BenchDataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic dataset for load testing: users, categories, '
+        'posts, threaded comments, subscriptions and pins'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users (default: 1000)')
+        parser.add_argument('--categories', type=int, default=20, help='Number of categories (default: 20)')
+        parser.add_argument('--posts', type=int, default=10000, help='Number of posts (default: 10000)')
+        parser.add_argument(
+            '--comments', type=int, default=50000,
+            help='Number of comments, replies included (default: 50000)',
+        )
+        parser.add_argument(
+            '--subscribers', type=int,
+            help='Users with a subscription, most prolific authors first (default: 1%% of users)',
+        )
+        parser.add_argument(
+            '--reply-ratio', type=float, default=0.4,
+            help='Share of comments that are replies (default: 0.4)',
+        )
+        parser.add_argument('--days', type=int, default=365, help='Period covered by the data (default: 365)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Number of rows per bulk insert and transaction (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'categories', 'posts', 'comments', 'days'):
+            if options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} must not be negative')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        if not 0 <= options['reply_ratio'] <= 1:
+            raise CommandError('--reply-ratio must be between 0 and 1')
+
+        dataset = BenchDataset(
+            users=options['users'],
+            categories=options['categories'],
+            posts=options['posts'],
+            comments=options['comments'],
+            subscribers=options['subscribers'],
+            reply_ratio=options['reply_ratio'],
+            days=options['days'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=lambda message: self.stdout.write(f'  {message}') if options['verbosity'] > 1 else None,
+        )
+
+        started = time.monotonic()
+        try:
+            stats = dataset.run()
+        except BenchDataError as error:
+            raise CommandError(str(error))
+
+        for entity in ('users', 'categories', 'posts', 'comments', 'subscriptions', 'pins'):
+            self.stdout.write(f'{entity}: {stats.get(entity, 0)} created')
+        self.stdout.write(self.style.SUCCESS(
+            f'Benchmark data generated in {time.monotonic() - started:.1f}s. '
+            f'Users bench<N>@bench.example.com, password "{BENCH_PASSWORD}".'
+        ))
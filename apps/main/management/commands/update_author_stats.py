@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.main.author_stats import update_author_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-author daily statistics (yesterday and today by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to recompute, YYYY-MM-DD (for backfills)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+
+        total = update_author_stats(since)
+        self.stdout.write(
+            self.style.SUCCESS(f'Author statistics updated: {total} daily rows written.')
+        )
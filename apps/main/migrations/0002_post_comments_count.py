@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_comments_count(apps, schema_editor):
+    Post = apps.get_model('main', 'Post')
+    counts = (
+        Post.objects.annotate(active=Count('comments', filter=Q(comments__is_active=True)))
+        .filter(active__gt=0)
+        .values_list('pk', 'active')
+        .iterator(chunk_size=2000)
+    )
+    for post_id, active in counts:
+        Post.objects.filter(pk=post_id).update(comments_count=active)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comments_count, migrations.RunPython.noop),
+    ]
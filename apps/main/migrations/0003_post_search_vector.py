@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-17 12:40
+
+from django.db import migrations
+
+
+# Колонка search_vector не объявлена в модели: она нужна только поиску
+# и не должна загружаться обычными запросами к постам.
+POSTGRES_FORWARD = [
+    'ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    """
+    CREATE OR REPLACE FUNCTION posts_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.content, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS posts_search_vector_trigger ON posts',
+    """
+    CREATE TRIGGER posts_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON posts
+    FOR EACH ROW EXECUTE FUNCTION posts_search_vector_update()
+    """,
+    """
+    UPDATE posts SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    """,
+    'CREATE INDEX IF NOT EXISTS posts_search_vector_gin ON posts USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS posts_search_vector_gin',
+    'DROP TRIGGER IF EXISTS posts_search_vector_trigger ON posts',
+    'DROP FUNCTION IF EXISTS posts_search_vector_update()',
+    'ALTER TABLE posts DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in POSTGRES_FORWARD:
+        schema_editor.execute(statement)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in POSTGRES_BACKWARD:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 13:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_posts_count(apps, schema_editor):
+    Category = apps.get_model('main', 'Category')
+    counts = (
+        Category.objects.annotate(published=Count('posts', filter=Q(posts__status='published')))
+        .filter(published__gt=0)
+        .values_list('pk', 'published')
+    )
+    for category_id, published in counts:
+        Category.objects.filter(pk=category_id).update(posts_count=published)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_posts_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:17
+
+import math
+
+from django.db import migrations, models, transaction
+
+BACKFILL_CHUNK_SIZE = 1000
+# Копия правил из apps.main.models на момент миграции: их изменение
+# не должно менять то, что делает уже примененная миграция
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+
+def post_text_stats(content):
+    content = content or ''
+    if len(content) > EXCERPT_LENGTH:
+        excerpt = content[:EXCERPT_LENGTH] + '...'
+    else:
+        excerpt = content
+    word_count = len(content.split())
+    return {
+        'excerpt': excerpt,
+        'word_count': word_count,
+        'reading_time': math.ceil(word_count / WORDS_PER_MINUTE),
+    }
+
+
+def backfill_text_stats(apps, schema_editor):
+    # Пачками по pk, каждая в своей транзакции: таблица не блокируется целиком
+    Post = apps.get_model('main', 'Post')
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .only('pk', 'content')[:BACKFILL_CHUNK_SIZE]
+        )
+        if not posts:
+            break
+        last_id = posts[-1].pk
+        for post in posts:
+            for name, value in post_text_stats(post.content).items():
+                setattr(post, name, value)
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, ['excerpt', 'word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('main', '0005_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=203),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_text_stats, migrations.RunPython.noop),
+    ]
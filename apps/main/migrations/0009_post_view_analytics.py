@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_post_hot_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('anonymous_views', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_view_days', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'Post views per day',
+                'verbose_name_plural': 'Post views per day',
+                'db_table': 'post_view_days',
+                'indexes': [models.Index(fields=['author', 'day'], name='post_view_d_author__ecce69_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='unique_post_view_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostViewHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('anonymous_views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_hours', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'Post views per hour',
+                'verbose_name_plural': 'Post views per hour',
+                'db_table': 'post_view_hours',
+                'indexes': [models.Index(fields=['hour'], name='post_view_h_hour_8dc783_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'hour'), name='unique_post_view_hour')],
+            },
+        ),
+    ]
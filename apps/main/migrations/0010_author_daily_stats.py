@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_post_view_analytics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('anonymous_views', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('posts_published', models.PositiveIntegerField(default=0)),
+                ('new_followers', models.PositiveIntegerField(default=0)),
+                ('followers', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Author daily stats',
+                'verbose_name_plural': 'Author daily stats',
+                'db_table': 'author_daily_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-views_count'], name='posts_author__e41958_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postviewday',
+            index=models.Index(fields=['day'], name='post_view_d_day_d0cf6a_idx'),
+        ),
+        migrations.AddField(
+            model_name='authordailystats',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='authordailystats',
+            constraint=models.UniqueConstraint(fields=('author', 'day'), name='unique_author_daily_stats'),
+        ),
+    ]
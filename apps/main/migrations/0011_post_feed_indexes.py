@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_author_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_created_2e2442_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_status_ecf387_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_categor_4138d2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_author__f2f966_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_created_0c572f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='posts_status_6e2c72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='posts_categor_bc6092_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='posts_author__ff7d8c_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_post_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flush_id', models.CharField(max_length=32, unique=True)),
+                ('applied_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'View flush',
+                'verbose_name_plural': 'View flushes',
+                'db_table': 'post_view_flushes',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 08:00
+
+from django.db import migrations, models
+
+
+def clear_missing_snapshots(apps, schema_editor):
+    # Раньше 0 записывался и для дней без снимка: такие строки не отличить от настоящего 0
+    AuthorDailyStats = apps.get_model('main', 'AuthorDailyStats')
+    AuthorDailyStats.objects.filter(followers=0).update(followers=None)
+
+
+def restore_zero_snapshots(apps, schema_editor):
+    AuthorDailyStats = apps.get_model('main', 'AuthorDailyStats')
+    AuthorDailyStats.objects.filter(followers__isnull=True).update(followers=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_view_flush'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='authordailystats',
+            name='followers',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(clear_missing_snapshots, restore_zero_snapshots),
+    ]
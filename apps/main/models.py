@@ -1,17 +1,43 @@
+import itertools
+import math
+
 from django.db import models
 from django.conf import settings
 from django.utils.text import slugify
 from django.urls import reverse
+from django.db.models.functions import Greatest, Now
+
+from .counters import record_view, pending_views
+
+
+class CategoryManager(models.Manager):
+    """Менеджер для модели Category"""
+
+    def adjust_posts_count(self, category_id, delta):
+        """Атомарно изменяет счетчик опубликованных постов категории на delta"""
+        if delta > 0:
+            value = models.F('posts_count') + delta
+        elif delta < 0:
+            value = Greatest(models.F('posts_count') - (-delta), 0)
+        else:
+            return 0
+        return self.filter(pk=category_id).update(posts_count=value)
 
 
 class Category(models.Model):
     """
     Модель категории для постов блога.
     """
+    COUNTER_FIELDS = ('posts_count',)
+
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Количество опубликованных постов, поддерживается сигналами apps.main
+    posts_count = models.PositiveIntegerField(default=0)
+
+    objects = CategoryManager()
 
     class Meta:
         db_table = 'categories'
@@ -25,35 +51,146 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
         
         
-class PostManager(models.Manager):
-    """Менеджер для модели Post с дополнительными методами"""
+# Условие активного закрепления: подписка автора закрепления действует
+ACTIVE_PIN = models.Q(
+    pin_info__user__subscription__status='active',
+    pin_info__user__subscription__end_date__gt=Now(),
+)
+
+# Длина анонса в списках и скорость чтения для reading_time
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+# Поля, вычисляемые из content при сохранении
+TEXT_STATS_FIELDS = ('excerpt', 'word_count', 'reading_time')
+
+
+def post_text_stats(content):
+    """Анонс, число слов и время чтения в минутах для текста поста"""
+    content = content or ''
+    if len(content) > EXCERPT_LENGTH:
+        excerpt = content[:EXCERPT_LENGTH] + '...'
+    else:
+        excerpt = content
+    word_count = len(content.split())
+    return {
+        'excerpt': excerpt,
+        'word_count': word_count,
+        'reading_time': math.ceil(word_count / WORDS_PER_MINUTE),
+    }
+
+
+# Связи, которые нужны сериализаторам ленты (автор, категория, закрепление)
+FEED_RELATED = (
+    'author', 'category',
+    'pin_info', 'pin_info__user', 'pin_info__user__subscription',
+)
+
+
+class Feed:
+    """
+    Лента из двух частей, каждая читается своим запросом по индексу:
+    активные закрепления (их немного) и остальные посты по (created_at, id).
+    Сортировка всей выборки по вычисляемому полю не нужна.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @property
+    def pinned(self):
+        """Активные закрепления в порядке закрепления"""
+        # Выборка идет от таблицы закреплений, а не перебором всех постов
+        pins = self.queryset.model._meta.get_field('pin_info').related_model.objects.filter(
+            user__subscription__status='active',
+            user__subscription__end_date__gt=Now(),
+        ).values('post_id')
+        return self.queryset.filter(pk__in=pins).annotate(
+            feed_pinned_at=models.F('pin_info__pinned_at')
+        ).order_by('feed_pinned_at', '-created_at', '-id')
+
+    @property
+    def regular(self):
+        """Остальные посты от новых к старым"""
+        return self.queryset.exclude(ACTIVE_PIN).annotate(
+            feed_pinned_at=models.Value(None, output_field=models.DateTimeField())
+        ).order_by('-created_at', '-id')
+
+    def apply(self, func):
+        """Лента по queryset, измененному func (фильтры, only())"""
+        return Feed(func(self.queryset))
 
-    def pusblished(self):
+    def count(self):
+        return self.queryset.count()
+
+    def iterator(self, chunk_size=None):
+        yield from self.pinned.iterator(chunk_size=chunk_size)
+        yield from self.regular.iterator(chunk_size=chunk_size)
+
+    def __iter__(self):
+        return itertools.chain(self.pinned, self.regular)
+
+
+class PostQuerySet(models.QuerySet):
+    """QuerySet постов с поддержкой ленты"""
+
+    def published(self):
         return self.filter(status='published')
-    
+
+    def for_list(self):
+        """Без полного текста: спискам достаточно excerpt"""
+        return self.defer('content')
+
+    def feed(self, category=None, author=None):
+        """
+        Лента: активные закрепленные посты в порядке закрепления,
+        затем остальные посты от новых к старым (см. Feed).
+        Закрепление, автор и категория загружаются тем же запросом.
+        """
+        queryset = self
+        if category is not None:
+            queryset = queryset.filter(category=category)
+        if author is not None:
+            queryset = queryset.filter(author=author)
+        return Feed(queryset.select_related(*FEED_RELATED))
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    """Менеджер для модели Post с дополнительными методами"""
+
     def pinned_posts(self):
         """Возвращает закрепленные посты в порядке закрепления"""
         return self.filter(
+            ACTIVE_PIN,
             pin_info__isnull=False,
-            pin_info__user__subscription__status='active',
-            pin_info__user__subscription__end_date__gt=models.functions.Now(),
             status='published'
-        ).select_related(
-            'pin_info', 'pin_info__user', 'pin_info__user__subcription'
-        ).order_by('pin_info__pinned_at')
+        ).select_related(*FEED_RELATED).order_by('pin_info__pinned_at')
     
     def regular_posts(self):
         """Возвращает обычные (незакрепленные) посты"""
         return self.filter(pin_info__isnull=True, status='published')
     
     def with_subscription_info(self):
-        """Добавляет информацию о подписке автора"""
-        return self.select_related(
-            'author', 'author__subscription', 'category'
-        ).prefetch_related('pin_info')
+        """Добавляет информацию о подписке автора и о закреплении (тем же запросом)"""
+        # pinned_info читает pin_info.user.subscription: без JOIN это запросы на каждую строку
+        return self.select_related('author__subscription', *FEED_RELATED)
+
+    def adjust_comments_count(self, post_id, delta):
+        """Атомарно изменяет счетчик комментариев поста на delta"""
+        if delta > 0:
+            value = models.F('comments_count') + delta
+        elif delta < 0:
+            value = Greatest(models.F('comments_count') - (-delta), 0)
+        else:
+            return 0
+        return self.filter(pk=post_id).update(comments_count=value)
 
 
 
@@ -65,11 +202,18 @@ class Post(models.Model):
         ('draft', 'Draft'),
         ('published', 'Published'),
     ]
+    COUNTER_FIELDS = ('views_count', 'comments_count', 'hot_score')
 
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     content = models.TextField()
+    # Вычисляются из content при сохранении (см. post_text_stats)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH + 3, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Уменьшенные копии изображения (см. images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(
         Category,
         on_delete=models.SET_NULL,
@@ -90,6 +234,10 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.PositiveIntegerField(default=0)
+    # Количество активных комментариев, поддерживается сигналами apps.comments
+    comments_count = models.PositiveIntegerField(default=0)
+    # Оценка с затуханием по возрасту, пересчитывается периодически (см. hot.py)
+    hot_score = models.FloatField(default=0, editable=False)
 
     objects = PostManager()
 
@@ -99,10 +247,13 @@ class Post(models.Model):
         verbose_name_plural = 'Posts'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['-created_at']),
-            models.Index(fields=['status', '-created_at']),
-            models.Index(fields=['category', '-created_at']),
-            models.Index(fields=['author', '-created_at']),
+            # id - второй ключ сортировки лент и курсора, без него нужна досортировка
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['category', '-created_at', '-id']),
+            models.Index(fields=['author', '-created_at', '-id']),
+            models.Index(fields=['status', '-hot_score']),
+            models.Index(fields=['author', '-views_count']),
         ]
 
     def __str__(self):
@@ -111,16 +262,35 @@ class Post(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get('update_fields')
+        # Пост, загруженный без content (списки), сохраняется без пересчета
+        content_loaded = 'content' in self.__dict__
+        if content_loaded and (update_fields is None or 'content' in update_fields):
+            for name, value in post_text_stats(self.content).items():
+                setattr(self, name, value)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(TEXT_STATS_FIELDS)
+        if not self._state.adding and update_fields is None:
+            # Счетчики и hot_score меняются только запросами update(),
+            # поэтому полное сохранение не должно их перезаписывать;
+            # отложенные поля не перезаписываются и не загружаются
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
         super().save(*args, **kwargs)
 
+    @classmethod
+    def get_posts_for_feed(cls, category=None, author=None):
+        """Посты для ленты: сначала закрепленные, затем по дате"""
+        return cls.objects.feed(category=category, author=author)
+
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'slug': self.slug})
 
-    @property
-    def comments_count(self):
-        """Количество комментариев к посту"""
-        return self.comments.filter(is_active=True).count()
-    
     @property
     def is_pinned(self):
         """Проверяет, закреплен ли пост"""
@@ -157,10 +327,13 @@ class Post(models.Model):
         
         return True
 
-    def increment_views(self):
-        """Увеличивает счетчик просмотров"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+    def increment_views(self, user=None):
+        """Регистрирует просмотр в буфере, запись в БД выполняется пакетно"""
+        record_view(self.pk, authenticated=bool(user and user.is_authenticated))
+
+    def get_views_count(self):
+        """Сохраненные просмотры плюс еще не записанные в БД"""
+        return self.views_count + pending_views(self.pk)
 
     def get_pinned_info(self):
         """Возвращает информацию о закреплении поста"""
@@ -174,4 +347,120 @@ class Post(models.Model):
                     'has_active_subscription': self.pin_info.user.subscription.is_active
                 }
             }
-        return {'is_pinned': False}
\ No newline at end of file
+        return {'is_pinned': False}
+
+class RelatedPost(models.Model):
+    """
+    Похожий пост: сосед по косинусной близости TF-IDF (см. related.py).
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_posts')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'related_posts'
+        verbose_name = 'Related post'
+        verbose_name_plural = 'Related posts'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='unique_related_post'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.3f})'
+
+
+class PostViewHour(models.Model):
+    """
+    Просмотры поста за час (заполняется при сбросе буфера просмотров).
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_hours')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    # Из них - без авторизации
+    anonymous_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'post_view_hours'
+        verbose_name = 'Post views per hour'
+        verbose_name_plural = 'Post views per hour'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'hour'], name='unique_post_view_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+
+class ViewFlush(models.Model):
+    """
+    Записанная в БД пачка просмотров из Redis (см. counters.py).
+    Создается в транзакции сброса: пачка с тем же id повторно не применяется.
+    """
+    flush_id = models.CharField(max_length=32, unique=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'post_view_flushes'
+        verbose_name = 'View flush'
+        verbose_name_plural = 'View flushes'
+
+    def __str__(self):
+        return self.flush_id
+
+
+class PostViewDay(models.Model):
+    """
+    Просмотры поста за день (собираются из почасовых корзин, см. analytics.py).
+    Автор хранится в строке, чтобы ряд автора читался одним диапазоном индекса.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_days')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='post_view_days'
+    )
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    anonymous_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'post_view_days'
+        verbose_name = 'Post views per day'
+        verbose_name_plural = 'Post views per day'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='unique_post_view_day'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'day']),
+            models.Index(fields=['day']),
+        ]
+
+
+class AuthorDailyStats(models.Model):
+    """
+    Статистика автора за день (см. author_stats.py).
+    """
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    anonymous_views = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    posts_published = models.PositiveIntegerField(default=0)
+    new_followers = models.PositiveIntegerField(default=0)
+    # Число подписчиков на конец дня; NULL - снимка за день нет
+    followers = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'author_daily_stats'
+        verbose_name = 'Author daily stats'
+        verbose_name_plural = 'Author daily stats'
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'day'], name='unique_author_daily_stats'),
+        ]
+
+    def __str__(self):
+        return f'{self.author_id} {self.day}'
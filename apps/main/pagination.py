@@ -0,0 +1,268 @@
+"""
+Keyset (cursor) пагинация по (created_at, id).
+
+Следующая страница выбирается условием WHERE по позиции последней
+записи, а не через OFFSET, поэтому глубокие страницы не замедляются.
+Общее количество записей считается только по запросу клиента (?count=true).
+Лента (Feed) выдается по частям: закрепленные посты, затем остальные;
+курсор хранит позицию в общей последовательности.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Feed
+
+
+SortKey = namedtuple('SortKey', ['field', 'descending'])
+
+RECENT_FIRST = (
+    SortKey('created_at', True),
+    SortKey('id', True),
+)
+OLDEST_FIRST = (
+    SortKey('created_at', False),
+    SortKey('id', False),
+)
+# Закрепленные посты ленты: по времени закрепления, затем по дате
+PINNED_FIRST = (SortKey('feed_pinned_at', False),) + RECENT_FIRST
+# Позиция в ленте: у незакрепленных постов feed_pinned_at равен None
+FEED = PINNED_FIRST
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по (created_at, id) с сохранением порядка ленты.
+    Для сортировок, которые нельзя выразить ключом (например ?ordering=title),
+    используется обычная постраничная пагинация.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        segments = self.get_segments(queryset)
+        if segments is None:
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.segments = segments
+        self.keys = FEED if isinstance(queryset, Feed) else segments[0][1]
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [self._get_field(segments[0][0], key.field) for key in self.keys]
+        page_size = self.get_page_size(request)
+
+        self.count = None
+        if self.wants_count(request):
+            self.count = queryset.count()
+
+        position, reverse = self.decode_cursor(request)
+        results = self.fetch(position, reverse, page_size + 1)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = None
+        self.previous_position = None
+        if results:
+            if has_next:
+                self.next_position = self._position_of(results[-1])
+            if has_previous:
+                self.previous_position = self._position_of(results[0])
+        elif position is not None:
+            # Пустая страница: возвращаемся к позиции курсора
+            if reverse:
+                self.next_position = position
+            else:
+                self.previous_position = position
+
+        return results
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def wants_count(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def get_segments(self, queryset):
+        """
+        Части выдачи по порядку: (queryset, ключ сортировки).
+        У ленты две части, каждая читается по своему индексу.
+        """
+        if isinstance(queryset, Feed):
+            return [(queryset.pinned, PINNED_FIRST), (queryset.regular, RECENT_FIRST)]
+        keys = self.get_sort_keys(queryset)
+        if keys is None:
+            return None
+        return [(queryset, keys)]
+
+    def fetch(self, position, reverse, limit):
+        """
+        До limit строк после позиции в порядке выдачи (обратном для reverse).
+        Следующая часть читается, только если предыдущей не хватило.
+        """
+        order = list(range(len(self.segments)))
+        if reverse:
+            order.reverse()
+        if position is not None:
+            order = order[order.index(self.segment):]
+
+        results = []
+        for number, index in enumerate(order):
+            queryset, keys = self.segments[index]
+            queryset = queryset.order_by(*self._ordering(keys, reverse))
+            if position is not None and number == 0:
+                values = dict(zip((key.field for key in self.keys), position))
+                queryset = queryset.filter(
+                    self._after_position(keys, [values[key.field] for key in keys], reverse)
+                )
+            results.extend(queryset[:limit - len(results)])
+            if len(results) >= limit:
+                break
+        return results
+
+    def get_sort_keys(self, queryset):
+        """Определяет ключ пагинации по сортировке queryset"""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not ordering:
+            return None
+
+        names = [self._ordering_name(item) for item in ordering]
+        if names[0] == '-created_at' and names[1:] in ([], ['-id'], ['-pk']):
+            return RECENT_FIRST
+        if names[0] == 'created_at' and names[1:] in ([], ['id'], ['pk']):
+            return OLDEST_FIRST
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            data = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            values = data['p']
+            if len(values) != len(self.keys):
+                raise ValueError('Cursor does not match ordering')
+            position = [
+                None if value is None else field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+            self.segment = self._segment_of(position)
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, bool(data.get('r'))
+
+    def encode_cursor(self, position, reverse):
+        data = {'p': [self._encode_value(value) for value in position]}
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode('ascii')
+        ).decode('ascii').rstrip('=')
+        url = remove_query_param(self.base_url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def _position_of(self, instance):
+        return [getattr(instance, key.field) for key in self.keys]
+
+    def _segment_of(self, position):
+        """Часть выдачи, к которой относится позиция: все ее ключи заданы"""
+        values = dict(zip((key.field for key in self.keys), position))
+        for index, (_, keys) in enumerate(self.segments):
+            if all(values[key.field] is not None for key in keys):
+                return index
+        raise ValueError('Cursor does not match ordering')
+
+    @staticmethod
+    def _ordering(keys, reverse):
+        ordering = []
+        for key in keys:
+            expression = F(key.field)
+            ordering.append(expression.desc() if key.descending != reverse else expression.asc())
+        return ordering
+
+    @staticmethod
+    def _after_position(keys, position, reverse):
+        """Условие: строки строго после позиции в порядке выдачи"""
+        condition = None
+        for key, value in reversed(list(zip(keys, position))):
+            lookup = 'lt' if key.descending != reverse else 'gt'
+            after = Q(**{f'{key.field}__{lookup}': value})
+            if condition is None:
+                condition = after
+            else:
+                condition = after | (Q(**{key.field: value}) & condition)
+        return condition
+
+    @staticmethod
+    def _ordering_name(item):
+        if isinstance(item, str):
+            return item
+        if isinstance(item, OrderBy) and hasattr(item.expression, 'name'):
+            return ('-' if item.descending else '') + item.expression.name
+        return None
+
+    @staticmethod
+    def _get_field(queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def _encode_value(value):
+        if hasattr(value, 'isoformat'):
+            # Полная точность до микросекунд, иначе курсор пропустит записи
+            return value.isoformat()
+        return value
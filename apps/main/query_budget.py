@@ -0,0 +1,151 @@
+"""
+Бюджет SQL-запросов на HTTP-запрос.
+
+QueryBudgetMiddleware считает запросы к БД и их время за HTTP-запрос
+(все соединения, включая потоки sync_to_async: счетчик лежит в contextvar)
+и добавляет к ответу заголовки Server-Timing и X-DB-Queries.
+
+Бюджет объявляется атрибутом query_budget класса представления или
+декоратором @query_budget(...) над @api_view: число для всех методов или
+словарь {метод: число}, например {'GET': 4} - запись с сигналами обычно
+дороже чтения. Запрос сверх бюджета пишется в лог; при
+QUERY_BUDGET_STRICT (в тестах) выбрасывается QueryBudgetExceeded,
+и N+1 в представлении роняет тест.
+
+QUERY_DELAY_MS добавляет задержку перед каждым запросом: так бенчмарк
+с локальной БД (manage.py bench_workers) воспроизводит сетевую задержку.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше запросов, чем объявлено в бюджете"""
+
+
+class QueryStats:
+    """Число и время запросов к БД за HTTP-запрос"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, duration):
+        # Части одного запроса могут выполняться параллельно (run_concurrently)
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+
+
+_stats = ContextVar('query_stats', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(time.perf_counter() - start)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает счетчик к соединению"""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _delay_query(execute, sql, params, many, context):
+    time.sleep(settings.QUERY_DELAY_MS / 1000)
+    return execute(sql, params, many, context)
+
+
+def install_query_delay(sender, connection, **kwargs):
+    """Обработчик connection_created: задержка QUERY_DELAY_MS перед каждым запросом"""
+    if _delay_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_delay_query)
+
+
+def query_budget(budget):
+    """Декоратор функции-представления (над @api_view): бюджет запросов"""
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def view_budget(view, method):
+    """Бюджет представления для метода или QUERY_BUDGET_DEFAULT"""
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view, 'view_class', None), 'query_budget', None)
+    if isinstance(budget, dict):
+        budget = budget.get(method)
+    if budget is None:
+        budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """Считает запросы к БД и проверяет бюджет представления (WSGI и ASGI)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def finish(self, request, response, stats, total):
+        if getattr(settings, 'QUERY_TIMING_HEADERS', False):
+            response['X-DB-Queries'] = str(stats.count)
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                f'total;dur={total * 1000:.1f}'
+            )
+
+        match = getattr(request, 'resolver_match', None)
+        budget = view_budget(match.func, request.method) if match is not None else None
+        if budget is not None and stats.count > budget:
+            message = (
+                f'{request.method} {request.path} ({match.view_name}): '
+                f'{stats.count} queries, budget {budget}, db {stats.duration * 1000:.1f} ms'
+            )
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning('Query budget exceeded: %s', message)
+        return response
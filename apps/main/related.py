@@ -0,0 +1,387 @@
+"""
+Похожие посты по косинусной близости TF-IDF.
+
+Заголовок и текст опубликованных постов превращаются в разреженную
+матрицу TF-IDF (SciPy, строки нормированы), близость считается
+умножением блока строк на транспонированную матрицу: в памяти держится
+только блок RELATED_POSTS_BLOCK_SIZE x число постов. Для каждого поста
+в таблицу related_posts сохраняется до RELATED_POSTS_COUNT соседей.
+
+Полная пересборка выполняется периодической задачей и командой
+rebuild_related_posts и сохраняет индекс (словарь, idf, матрицу и id
+постов) в кэше вместе с номером сборки. Каждый процесс держит копию
+индекса в памяти и загружает ее из кэша только при смене номера сборки.
+При публикации и изменении поста векторизуется только он по словарю и idf
+копии, его строка заменяется в копии (в кэш индекс не записывается), и
+пересчитываются его соседи и его место в списках других постов. Строки,
+измененные в других процессах, новые слова и сдвиг idf учитываются при
+следующей полной пересборке.
+"""
+import logging
+import re
+import threading
+import uuid
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from .response_cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w{2,}')
+# Заголовок весит как несколько повторений в тексте
+TITLE_WEIGHT = 3
+STOP_WORDS = frozenset("""
+    about after again all also an and any are as at be because been before
+    being between both but by can could did do does doing down during each
+    few for from further had has have having he her here hers him his how if
+    in into is it its itself just me more most my no nor not now of off on
+    once only or other our ours out over own same she should so some such
+    than that the their theirs them then there these they this those through
+    to too under until up very was we were what when where which while who
+    whom why will with would you your yours
+""".split())
+# Размер пачки при записи таблицы и чтении статистики соседей
+WRITE_BATCH_SIZE = 5000
+STATS_BATCH_SIZE = 1000
+INDEX_CACHE_KEY = 'related_posts:index'
+INDEX_VERSION_KEY = 'related_posts:index_version'
+
+
+def related_count():
+    return getattr(settings, 'RELATED_POSTS_COUNT', 10)
+
+
+def block_size():
+    return getattr(settings, 'RELATED_POSTS_BLOCK_SIZE', 256)
+
+
+def min_score():
+    return getattr(settings, 'RELATED_POSTS_MIN_SCORE', 0.05)
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS and not token.isdigit()
+    ]
+
+
+def term_counts(title, content):
+    counts = Counter(tokenize(content))
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+def _weighted(matrix, idf):
+    """Логарифмическая частота терма x idf, строки нормированы по L2"""
+    import numpy as np
+    from scipy import sparse
+
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices].astype(np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms).astype(np.float32) @ matrix).tocsr()
+
+
+def fit_tfidf(documents):
+    """Матрица TF-IDF документов (title, content), словарь {терм: столбец} и idf"""
+    import numpy as np
+    from scipy import sparse
+
+    vocabulary = {}
+    indptr, indices, data = [0], [], []
+    for title, content in documents:
+        for token, count in term_counts(title, content).items():
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            data.append(count)
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), indptr),
+        shape=(len(indptr) - 1, len(vocabulary)),
+    )
+    documents_count = matrix.shape[0]
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + documents_count) / (1 + document_frequency)) + 1
+    return _weighted(matrix, idf), vocabulary, idf
+
+
+def tfidf_matrix(documents):
+    """
+    CSR-матрица TF-IDF для документов (title, content): логарифмическая
+    частота терма, сглаженный idf, строки нормированы по L2.
+    """
+    return fit_tfidf(documents)[0]
+
+
+def vectorize(title, content, vocabulary, idf):
+    """Строка TF-IDF одного документа по готовым словарю и idf; новые термы пропускаются"""
+    import numpy as np
+    from scipy import sparse
+
+    counts = sorted(
+        (vocabulary[token], count)
+        for token, count in term_counts(title, content).items() if token in vocabulary
+    )
+    matrix = sparse.csr_matrix(
+        (
+            np.asarray([count for _, count in counts], dtype=np.float32),
+            np.asarray([column for column, _ in counts], dtype=np.int32),
+            [0, len(counts)],
+        ),
+        shape=(1, len(vocabulary)),
+    )
+    return _weighted(matrix, idf)
+
+
+def top_neighbours(ids, scores, k, exclude):
+    """До k пар (индекс, близость) с наибольшей близостью, кроме exclude"""
+    import numpy as np
+
+    keep = (ids != exclude) & (scores >= min_score())
+    ids, scores = ids[keep], scores[keep]
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[top], scores[top]
+    # По убыванию близости, при равенстве - по индексу
+    order = np.lexsort((ids, -scores))
+    return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+
+def nearest_neighbours(matrix, k=None, rows_per_block=None):
+    """Соседи каждой строки матрицы: пары (строка, [(строка, близость), ...])"""
+    k = k or related_count()
+    rows_per_block = rows_per_block or block_size()
+    # CSR x CSR: транспонированная матрица преобразуется один раз, а не в каждом блоке
+    transposed = matrix.T.tocsr()
+    for start in range(0, matrix.shape[0], rows_per_block):
+        similarities = (matrix[start:start + rows_per_block] @ transposed).tocsr()
+        for offset in range(similarities.shape[0]):
+            low, high = similarities.indptr[offset], similarities.indptr[offset + 1]
+            yield start + offset, top_neighbours(
+                similarities.indices[low:high], similarities.data[low:high], k, start + offset
+            )
+
+
+class RelatedIndex:
+    """Индекс TF-IDF опубликованных постов: id по возрастанию, строки матрицы, словарь и idf"""
+
+    def __init__(self, post_ids, matrix, vocabulary, idf):
+        self.post_ids = post_ids
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.idf = idf
+
+    def row_of(self, post_id):
+        """Номер строки поста или None"""
+        import numpy as np
+
+        row = int(np.searchsorted(self.post_ids, post_id))
+        if row < len(self.post_ids) and self.post_ids[row] == post_id:
+            return row
+        return None
+
+    def replace(self, post_id, vector):
+        """Заменяет, добавляет (vector) или удаляет (None) строку поста; возвращает ее номер"""
+        import numpy as np
+        from scipy import sparse
+
+        row = int(np.searchsorted(self.post_ids, post_id))
+        present = self.row_of(post_id) is not None
+        blocks = [self.matrix[:row]]
+        if vector is not None:
+            blocks.append(vector)
+        blocks.append(self.matrix[row + 1 if present else row:])
+        self.matrix = sparse.vstack(blocks, format='csr')
+        if present:
+            self.post_ids = self.post_ids[:row] + self.post_ids[row + 1:]
+        if vector is not None:
+            self.post_ids = self.post_ids[:row] + [post_id] + self.post_ids[row:]
+            return row
+        return None
+
+
+def build_index():
+    """Индекс TF-IDF всех опубликованных постов (читает и токенизирует весь корпус)"""
+    from .models import Post
+
+    post_ids, documents = [], []
+    rows = (
+        Post.objects.filter(status='published').order_by('id')
+        .values_list('id', 'title', 'content').iterator(chunk_size=2000)
+    )
+    for post_id, title, content in rows:
+        post_ids.append(post_id)
+        documents.append((title, content))
+    return RelatedIndex(post_ids, *fit_tfidf(documents))
+
+
+# Копия индекса в памяти процесса и номер сборки, из которой она загружена
+_index = None
+_index_version = None
+_index_lock = threading.RLock()
+
+
+def save_index(index):
+    """Сохраняет индекс новой сборки в кэше и делает его копией процесса"""
+    global _index, _index_version
+    version = uuid.uuid4().hex
+    # Одной записью: номер сборки не расходится с сохраненным индексом
+    cache.set_many({INDEX_CACHE_KEY: (version, index), INDEX_VERSION_KEY: version}, timeout=None)
+    with _index_lock:
+        _index, _index_version = index, version
+
+
+def get_index():
+    """
+    Копия индекса процесса. Из кэша читается только номер сборки; индекс
+    загружается при его смене, а без сохраненного индекса строится заново.
+    """
+    global _index, _index_version
+    version = cache.get(INDEX_VERSION_KEY)
+    with _index_lock:
+        if _index is not None and version is not None and version == _index_version:
+            return _index
+        snapshot = cache.get(INDEX_CACHE_KEY)
+        if snapshot is not None:
+            _index_version, _index = snapshot
+            return _index
+    save_index(build_index())
+    return _index
+
+
+def reset_index():
+    """Сбрасывает копию индекса процесса (используется в тестах)"""
+    global _index, _index_version
+    with _index_lock:
+        _index = _index_version = None
+
+
+def rebuild_related_posts(k=None, rows_per_block=None):
+    """Пересобирает таблицу похожих постов целиком; возвращает число записей"""
+    from .models import RelatedPost
+
+    index = build_index()
+    post_ids, matrix = index.post_ids, index.matrix
+    total = 0
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        batch = []
+        for row, neighbours in nearest_neighbours(matrix, k, rows_per_block):
+            batch.extend(
+                RelatedPost(post_id=post_ids[row], related_id=post_ids[column], score=score)
+                for column, score in neighbours
+            )
+            if len(batch) >= WRITE_BATCH_SIZE:
+                RelatedPost.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        RelatedPost.objects.bulk_create(batch)
+        total += len(batch)
+    save_index(index)
+    invalidate_tags('related')
+    return total
+
+
+def _neighbour_stats(post_ids):
+    """{post_id: (число соседей, наименьшая близость)} для списка постов"""
+    from .models import RelatedPost
+
+    stats = {}
+    for start in range(0, len(post_ids), STATS_BATCH_SIZE):
+        rows = (
+            RelatedPost.objects.filter(post_id__in=post_ids[start:start + STATS_BATCH_SIZE])
+            .values('post_id').annotate(count=Count('id'), lowest=Min('score'))
+        )
+        stats.update((row['post_id'], (row['count'], row['lowest'])) for row in rows)
+    return stats
+
+
+def update_related_posts(post_id, k=None):
+    """
+    Обновляет соседей одного поста и его место в списках других постов.
+    Неопубликованный пост убирается из таблицы. Возвращает id постов,
+    списки которых изменились.
+    """
+    import numpy as np
+    from .models import Post, RelatedPost
+
+    k = k or related_count()
+    document = Post.objects.filter(pk=post_id, status='published').values_list('title', 'content').first()
+    entries, others = [], {}
+    # Векторизуется только этот пост, корпус берется из копии индекса процесса
+    with _index_lock:
+        index = get_index()
+        vector = None if document is None else vectorize(*document, index.vocabulary, index.idf)
+        row = index.replace(post_id, vector)
+        if row is not None:
+            scores = (index.matrix @ vector.T).toarray().ravel()
+            candidates = np.arange(len(index.post_ids))
+            entries = [
+                RelatedPost(post_id=post_id, related_id=index.post_ids[column], score=score)
+                for column, score in top_neighbours(candidates, scores, k, row)
+            ]
+            keep = (scores >= min_score()) & (candidates != row)
+            others = {index.post_ids[column]: float(scores[column]) for column in np.flatnonzero(keep)}
+
+    # В транзакции только замена строк этого поста
+    with transaction.atomic():
+        changed = {post_id} | set(
+            RelatedPost.objects.filter(related_id=post_id).values_list('post_id', flat=True)
+        )
+        RelatedPost.objects.filter(Q(post_id=post_id) | Q(related_id=post_id)).delete()
+
+        # Пост попадает в список другого поста, если там есть место
+        # или он ближе наименее похожего соседа, который вытесняется
+        stats = _neighbour_stats(list(others))
+        displaced = []
+        for other_id, score in others.items():
+            count, lowest = stats.get(other_id, (0, None))
+            if count < k or score > lowest:
+                entries.append(RelatedPost(post_id=other_id, related_id=post_id, score=score))
+                changed.add(other_id)
+                if count >= k:
+                    displaced.append(other_id)
+        if displaced:
+            lowest_ids = {}
+            for entry_id, other_id, score in RelatedPost.objects.filter(
+                post_id__in=displaced
+            ).values_list('id', 'post_id', 'score'):
+                if other_id not in lowest_ids or score < lowest_ids[other_id][1]:
+                    lowest_ids[other_id] = (entry_id, score)
+            RelatedPost.objects.filter(
+                id__in=[entry_id for entry_id, _ in lowest_ids.values()]
+            ).delete()
+        RelatedPost.objects.bulk_create(entries)
+
+    invalidate_tags(*[f'related:{changed_id}' for changed_id in sorted(changed)])
+    return changed
+
+
+def related_posts_for(post_id, queryset):
+    """Опубликованные похожие посты одним запросом, от более похожих"""
+    return queryset.filter(
+        neighbour_of__post_id=post_id, status='published'
+    ).order_by('-neighbour_of__score', 'id')
+
+
+def schedule_related_update(post):
+    """Ставит пересчет похожих постов в очередь после коммита"""
+    transaction.on_commit(partial(_enqueue_related_update, post.pk))
+
+
+def _enqueue_related_update(post_id):
+    from .tasks import update_post_related
+
+    try:
+        update_post_related.apply_async((post_id,), retry=False)
+    except Exception:
+        # Таблица будет исправлена периодической пересборкой
+        logger.exception('Failed to enqueue related posts update for post %s', post_id)
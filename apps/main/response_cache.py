@@ -0,0 +1,268 @@
+"""
+Кэш ответов публичных GET-эндпоинтов с инвалидацией по тегам.
+
+Кэшируются только ответы анонимным клиентам: они одинаковы для всех.
+Каждый ответ помечается тегами ("post:<id>", "category:<id>", "pins",
+"plans", ...). У тега есть версия в кэше; запись хранит версии своих тегов
+на момент сохранения и считается устаревшей, если хотя бы одна версия
+изменилась. Инвалидация тега - одна запись новой версии, без поиска ключей.
+Версия содержит время изменения, поэтому по ней строится и Last-Modified.
+
+Теги ответа известны только после выполнения представления, поэтому
+ответ не сохраняется, если какой-то его тег изменился после начала
+выполнения: данные могли быть прочитаны до изменения. Внутри транзакции
+теги меняются дважды - сразу и после коммита: ответ, построенный между
+ними по еще не закоммиченным данным, иначе остался бы под новой версией.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'response_cache'
+
+# Имена закэшированных эндпоинтов для статистики попаданий
+_endpoints = set()
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _stats_key(name, kind):
+    return f'{KEY_PREFIX}:stats:{name}:{kind}'
+
+
+def post_tags(items):
+    """Теги постов из сериализованного списка"""
+    return [f'post:{item["id"]}' for item in items]
+
+
+def new_version():
+    """Уникальная версия тега: время изменения в наносекундах и случайный суффикс"""
+    return f'{time.time_ns():x}.{uuid.uuid4().hex[:8]}'
+
+
+def _version_ns(version):
+    return int(version.split('.')[0], 16)
+
+
+def version_timestamp(version):
+    """Время изменения, записанное в версии тега"""
+    return datetime.fromtimestamp(_version_ns(version) / 1e9, tz=timezone.utc)
+
+
+def _changed_since(versions, since):
+    return since is not None and any(_version_ns(version) >= since for version in versions)
+
+
+def get_tag_versions(tags, changed_since=None):
+    """
+    Текущие версии тегов; отсутствующим тегам назначается новая версия.
+    С changed_since (time.time_ns()) возвращает None, если какой-то тег
+    был изменен начиная с этого момента.
+    """
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    # Назначенные здесь версии - не изменения данных
+    existing = list(found.values())
+    missing = {key: new_version() for key in keys if key not in found}
+    if missing:
+        # Версия тега не истекает: иначе устаревшая запись снова стала бы актуальной
+        for key, version in missing.items():
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+                existing.append(version)
+            found[key] = version
+    if _changed_since(existing, changed_since):
+        return None
+    return {keys[key]: version for key, version in found.items()}
+
+
+async def aget_tag_versions(tags, changed_since=None):
+    """get_tag_versions() для асинхронных представлений"""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = await cache.aget_many(list(keys))
+    existing = list(found.values())
+    missing = {key: new_version() for key in keys if key not in found}
+    for key, version in missing.items():
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+            existing.append(version)
+        found[key] = version
+    if _changed_since(existing, changed_since):
+        return None
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _bump_tags(tags):
+    try:
+        cache.set_many({_tag_key(tag): new_version() for tag in tags}, timeout=None)
+    except Exception:
+        logger.exception('Failed to invalidate response cache tags %s', tags)
+
+
+def invalidate_tags(*tags):
+    """Делает устаревшими все ответы с указанными тегами"""
+    if not tags:
+        return
+    _bump_tags(tags)
+    if transaction.get_connection().in_atomic_block:
+        # До коммита читатели видят старые строки и могут сохранить их под новой версией
+        transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def _count(name, kind):
+    key = _stats_key(name, kind)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def _acount(name, kind):
+    key = _stats_key(name, kind)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def get_cache_stats():
+    """Счетчики попаданий и промахов по эндпоинтам"""
+    names = sorted(_endpoints)
+    keys = [_stats_key(name, kind) for name in names for kind in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    stats = {}
+    for name in names:
+        hits = values.get(_stats_key(name, 'hits'), 0)
+        misses = values.get(_stats_key(name, 'misses'), 0)
+        total = hits + misses
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many([
+        _stats_key(name, kind) for name in _endpoints for kind in ('hits', 'misses')
+    ])
+
+
+def _is_cacheable(request):
+    if not getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+        return False
+    return request.method == 'GET' and not request.user.is_authenticated
+
+
+def _response_key(name, request):
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(
+        f'{request.path}?{params}'.encode('utf-8'), usedforsecurity=False
+    ).hexdigest()
+    return f'{KEY_PREFIX}:view:{name}:{digest}'
+
+
+def _cached_response(entry):
+    response = Response(entry['data'], status=entry['status'])
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def _is_storable(response):
+    return response.status_code == 200 and not response.streaming and hasattr(response, 'data')
+
+
+def _timeout(timeout):
+    return timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def cache_response(name, tags, timeout=None):
+    """
+    Декоратор DRF-представления (функции или метода через method_decorator).
+    tags - список тегов или функция (request, response, *args, **kwargs),
+    возвращающая теги по готовому ответу. Для async-представлений кэш
+    читается и пишется асинхронно.
+    """
+    _endpoints.add(name)
+
+    def response_tags(request, response, *args, **kwargs):
+        return tags(request, response, *args, **kwargs) if callable(tags) else tags
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _is_cacheable(request):
+                    return await view_func(request, *args, **kwargs)
+
+                key = _response_key(name, request)
+                entry = await cache.aget(key)
+                if entry is not None and await aget_tag_versions(entry['tags']) == entry['tags']:
+                    await _acount(name, 'hits')
+                    return _cached_response(entry)
+
+                await _acount(name, 'misses')
+                started = time.time_ns()
+                response = await view_func(request, *args, **kwargs)
+                if _is_storable(response):
+                    versions = await aget_tag_versions(
+                        response_tags(request, response, *args, **kwargs), changed_since=started
+                    )
+                    if versions is not None:
+                        await cache.aset(key, {
+                            'data': response.data,
+                            'status': response.status_code,
+                            'tags': versions,
+                        }, _timeout(timeout))
+                    response['X-Cache'] = 'MISS'
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            key = _response_key(name, request)
+            entry = cache.get(key)
+            if entry is not None and get_tag_versions(entry['tags']) == entry['tags']:
+                _count(name, 'hits')
+                return _cached_response(entry)
+
+            _count(name, 'misses')
+            # Ответ, теги которого изменились во время его построения, не сохраняется
+            started = time.time_ns()
+            response = view_func(request, *args, **kwargs)
+            if _is_storable(response):
+                versions = get_tag_versions(
+                    response_tags(request, response, *args, **kwargs), changed_since=started
+                )
+                if versions is not None:
+                    cache.set(key, {
+                        'data': response.data,
+                        'status': response.status_code,
+                        'tags': versions,
+                    }, _timeout(timeout))
+                response['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
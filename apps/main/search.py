@@ -0,0 +1,175 @@
+"""
+Полнотекстовый поиск по постам.
+
+PostgreSQL: колонка posts.search_vector (tsvector, заголовок с весом A,
+текст с весом B) поддерживается триггером и индексом GIN (миграция 0003).
+SQLite: внешняя FTS5-таблица posts_fts с триггерами, создается после migrate,
+чтобы поиск можно было тестировать без PostgreSQL.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+
+SEARCH_CONFIG = 'english'
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2'
+
+SQLITE_FTS_TRIGGERS = ('posts_fts_ai', 'posts_fts_ad', 'posts_fts_au')
+SQLITE_FTS_SQL = [
+    "DROP TABLE IF EXISTS posts_fts",
+    "CREATE VIRTUAL TABLE posts_fts USING fts5("
+    "title, content, content='posts', content_rowid='id')",
+    "DROP TRIGGER IF EXISTS posts_fts_ai",
+    "CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "DROP TRIGGER IF EXISTS posts_fts_ad",
+    "CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "END",
+    "DROP TRIGGER IF EXISTS posts_fts_au",
+    "CREATE TRIGGER posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')",
+]
+
+
+class PostgresPostSearch:
+    """Поиск по tsvector-колонке с ранжированием и подсветкой"""
+
+    def search(self, queryset, query, order_by_rank=True):
+        table = queryset.model._meta.db_table
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        queryset = queryset.filter(
+            RawSQL(
+                f'"{table}"."search_vector" @@ {tsquery}',
+                (query,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank_cd("{table}"."search_vector", {tsquery})',
+                (query,),
+                output_field=FloatField(),
+            ),
+            search_snippet=RawSQL(
+                f'ts_headline(\'{SEARCH_CONFIG}\', "{table}"."content", {tsquery}, %s)',
+                (query, HEADLINE_OPTIONS),
+                output_field=TextField(),
+            ),
+        )
+        if order_by_rank:
+            queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+        return queryset
+
+
+class SQLitePostSearch:
+    """Поиск через FTS5 для разработки и тестов"""
+
+    def search(self, queryset, query, order_by_rank=True):
+        match = self.to_match_expression(query)
+        if not match:
+            return queryset.none()
+
+        table = queryset.model._meta.db_table
+        lookup = f'FROM posts_fts WHERE posts_fts MATCH %s AND posts_fts.rowid = "{table}"."id"'
+        queryset = queryset.filter(
+            RawSQL(
+                f'"{table}"."id" IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH %s)',
+                (match,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            # bm25 возвращает меньшие значения для лучших совпадений
+            search_rank=RawSQL(
+                f'(SELECT -bm25(posts_fts, 10.0, 1.0) {lookup})',
+                (match,),
+                output_field=FloatField(),
+            ),
+            search_snippet=RawSQL(
+                f"(SELECT snippet(posts_fts, 1, '<mark>', '</mark>', '...', 24) {lookup})",
+                (match,),
+                output_field=TextField(),
+            ),
+        )
+        if order_by_rank:
+            queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+        return queryset
+
+    @staticmethod
+    def to_match_expression(query):
+        """Превращает пользовательский ввод в безопасный запрос FTS5 (AND по словам)"""
+        words = re.findall(r'\w+', query)
+        return ' '.join(f'"{word}"' for word in words)
+
+
+class FallbackPostSearch:
+    """Поиск через icontains для остальных СУБД"""
+
+    def search(self, queryset, query, order_by_rank=True):
+        return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
+
+
+def get_search_backend(using='default'):
+    vendor = connections[using].vendor
+    if vendor == 'postgresql':
+        return PostgresPostSearch()
+    if vendor == 'sqlite':
+        return SQLitePostSearch()
+    return FallbackPostSearch()
+
+
+def search_posts(queryset, query, order_by_rank=True):
+    """Фильтрует посты по запросу, по умолчанию сортируя по релевантности"""
+    return get_search_backend(queryset.db).search(queryset, query, order_by_rank)
+
+
+def install_sqlite_fts(using='default'):
+    """Создает FTS5-индекс постов в SQLite, если его еще нет"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'posts'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing.issuperset(SQLITE_FTS_TRIGGERS):
+            return False
+        # Пересоздание таблицы при миграциях SQLite удаляет триггеры
+        for statement in SQLITE_FTS_SQL:
+            cursor.execute(statement)
+    return True
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Фильтр полнотекстового поиска по постам: ?q=<запрос>.
+    Параметр ?search= поддерживается для совместимости.
+    Должен стоять после OrderingFilter: явный ?ordering= сохраняется,
+    иначе результаты сортируются по релевантности.
+    """
+    search_params = ('q', 'search')
+
+    def get_search_query(self, request):
+        for param in self.search_params:
+            value = request.query_params.get(param, '').strip()
+            if value:
+                return value
+        return ''
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query:
+            return queryset
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        return search_posts(queryset, query, order_by_rank=not ordering)
@@ -1,68 +1,91 @@
 from rest_framework import serializers
 from django.utils.text import slugify
+from .images import variant_url, variant_urls
+from .sparse import SparseFieldsetSerializerMixin
 from .models import Category, Post
 
 
 class CategorySerializer(serializers.ModelSerializer):
     """Сериализатор для категорий"""
-    posts_count = serializers.SerializerMethodField()
+    posts_count = serializers.ReadOnlyField()
 
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'posts_count', 'created_at']
         read_only_fields = ['slug', 'created_at']
-
-    def get_posts_count(self, obj):
-        return obj.posts.filter(status='published').count()
     
     def create(self, validated_data):
         validated_data['slug'] = slugify(validated_data['name'])
         return super().create(validated_data)
     
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для списка постов"""
     author = serializers.StringRelatedField()
     category = serializers.StringRelatedField()
+    # Анонс вместо полного текста: списки загружаются без content
+    content = serializers.CharField(source='excerpt', read_only=True)
     comments_count = serializers.ReadOnlyField()
     is_pinned = serializers.ReadOnlyField()
     pinned_info = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'slug', 'content', 'image', 'category',
-            'author', 'status', 'created_at', 'updated_at',
+            'id', 'title', 'slug', 'content', 'image', 'image_variants', 'category',
+            'author', 'status', 'created_at', 'updated_at', 'word_count', 'reading_time',
             'views_count', 'comments_count', 'is_pinned', 'pinned_info'
         ]
         read_only_fields = ['slug', 'author', 'views_count']
+        # Колонки и связи полей для ?fields= (см. sparse.py)
+        field_sources = {
+            'content': ('excerpt',),
+            'image_variants': ('image', 'image_variants'),
+            'category': ('category__name',),
+            'author': ('author__email',),
+            'is_pinned': ('pin_info__pinned_at',),
+            'pinned_info': (
+                'pin_info__pinned_at', 'pin_info__user__username',
+                'pin_info__user__subscription__status',
+                'pin_info__user__subscription__end_date',
+            ),
+        }
 
     def get_pinned_info(self, obj):
         """Возвращает информацию о закреплении"""
         return obj.get_pinned_info()
 
+    def get_image_variants(self, obj):
+        """Уменьшенные копии изображения (оригинал, пока они не готовы)"""
+        return variant_urls(obj, 'image')
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        # Обрезаем контент для списка
-        if len(data['content']) > 200:
-            data['content'] = data['content'][:200] + '...'
+        # Релевантность и фрагмент с подсветкой для результатов поиска
+        if hasattr(instance, 'search_rank'):
+            data['rank'] = instance.search_rank
+            data['highlight'] = instance.search_snippet
         return data
     
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для детального просмотра поста"""
     author_info = serializers.SerializerMethodField()
     category_info = serializers.SerializerMethodField()
+    views_count = serializers.IntegerField(source='get_views_count', read_only=True)
     comments_count = serializers.ReadOnlyField()
     is_pinned = serializers.ReadOnlyField()
     pinned_info = serializers.SerializerMethodField()
     can_pin = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'slug', 'content', 'image', 'category',
+            'id', 'title', 'slug', 'content', 'image', 'image_variants', 'category',
             'category_info', 'author', 'author_info', 'status',
-            'created_at', 'updated_at', 'views_count', 'comments_count',
+            'created_at', 'updated_at', 'word_count', 'reading_time',
+            'views_count', 'comments_count',
             'is_pinned', 'pinned_info', 'can_pin'
         ]
         read_only_fields = ['slug', 'author', 'views_count']
@@ -73,8 +96,11 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'id': author.id,
             'username': author.username,
             'full_name': author.full_name,
-            'avatar': author.avatar.url if author.avatar else None
+            'avatar': variant_url(author, 'avatar', 'thumb')
         }
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj, 'image')
     
     def get_category_info(self, obj):
         if obj.category:
@@ -0,0 +1,96 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .images import schedule_variants
+from .related import schedule_related_update
+from .timelines import schedule_fan_out
+from .leaderboards import remove_from_leaderboards
+from .models import Category, Post
+from .response_cache import invalidate_tags
+
+
+def _counted_category(category_id, status):
+    """Категория, в счетчике которой учитывается пост (только опубликованные)"""
+    if status != 'published':
+        return None
+    return category_id
+
+
+def _remember_state(instance):
+    """Запоминает сохраненные в БД категорию, статус и текст поста"""
+    if instance.pk is None:
+        instance._saved_category_id = None
+        instance._saved_published = False
+        instance._saved_text = (None, None)
+    else:
+        # Читаем через __dict__, чтобы не загружать отложенные поля
+        instance._saved_category_id = _counted_category(
+            instance.__dict__.get('category_id'),
+            instance.__dict__.get('status'),
+        )
+        instance._saved_published = instance.__dict__.get('status') == 'published'
+        instance._saved_text = (instance.__dict__.get('title'), instance.__dict__.get('content'))
+
+
+def _text_changed(instance):
+    """Изменились ли заголовок или загруженный текст поста"""
+    title, content = instance._saved_text
+    if instance.__dict__.get('title') != title:
+        return True
+    return 'content' in instance.__dict__ and instance.__dict__['content'] != content
+
+
+@receiver(post_init, sender=Post)
+def post_post_init(sender, instance, **kwargs):
+    """Обработчик загрузки поста"""
+    _remember_state(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_post_save(sender, instance, created, **kwargs):
+    """Поддерживает Category.posts_count при создании и изменении поста"""
+    old_category_id = None if created else instance._saved_category_id
+    new_category_id = _counted_category(instance.category_id, instance.status)
+
+    tags = [f'post:{instance.pk}', 'feed']
+    if created or old_category_id != new_category_id:
+        # Пост появился, исчез или переместился в публичных списках
+        tags.append('posts')
+    if old_category_id != new_category_id:
+        if old_category_id is not None:
+            Category.objects.adjust_posts_count(old_category_id, -1)
+            tags.append(f'category:{old_category_id}')
+        if new_category_id is not None:
+            Category.objects.adjust_posts_count(new_category_id, 1)
+            tags.append(f'category:{new_category_id}')
+    invalidate_tags(*tags)
+    schedule_variants(instance, 'image')
+    if instance.status == 'published' and (created or not instance._saved_published):
+        # Пост опубликован: раскладываем по лентам подписчиков
+        schedule_fan_out(instance)
+    if instance.status == 'published':
+        if created or not instance._saved_published or _text_changed(instance):
+            schedule_related_update(instance)
+    elif instance._saved_published:
+        # Снятый с публикации пост убирается из похожих
+        schedule_related_update(instance)
+
+    _remember_state(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_post_delete(sender, instance, **kwargs):
+    """Уменьшает счетчик категории и убирает пост из лидербордов и кэша"""
+    tags = [f'post:{instance.pk}', 'posts', 'feed']
+    if instance._saved_category_id is not None:
+        Category.objects.adjust_posts_count(instance._saved_category_id, -1)
+        tags.append(f'category:{instance._saved_category_id}')
+    remove_from_leaderboards([instance.pk])
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """Сбрасывает кэш ответов с данными категории"""
+    invalidate_tags(f'category:{instance.pk}', 'feed')
@@ -0,0 +1,117 @@
+"""
+Выборочные поля ответа: ?fields=id,title,slug или ?exclude=content.
+
+SparseFieldsetSerializerMixin убирает из сериализатора поля, которые клиент
+не запросил (в том числе SerializerMethodField, которые иначе выполняли бы
+запросы). SparseFieldsetViewMixin сужает queryset списка через only() и
+select_related() до колонок и связей оставшихся полей.
+
+Колонки полей берутся из Meta.field_sources сериализатора
+({поле: (lookup, ...)}); для полей модели без записи используется имя поля.
+Неизвестные имена полей игнорируются.
+"""
+from django.core.exceptions import FieldDoesNotExist
+
+from .models import Feed
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def parse_field_list(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def selected_field_names(request, available):
+    """Имена полей, оставшиеся после ?fields= и ?exclude=; None - все поля"""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    fields = parse_field_list(params.get(FIELDS_PARAM))
+    exclude = parse_field_list(params.get(EXCLUDE_PARAM))
+    if not fields and not exclude:
+        return None
+
+    names = [name for name in available if name in fields] if fields else list(available)
+    return [name for name in names if name not in exclude]
+
+
+class SparseFieldsetSerializerMixin:
+    """Оставляет в сериализаторе только поля, запрошенные клиентом"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Только для корневого сериализатора ответа (или элемента many=True)
+        root = self.root
+        if root is not self and root is not self.parent:
+            return fields
+        names = selected_field_names(self.context.get('request'), fields)
+        if names is None:
+            return fields
+        return {name: fields[name] for name in names}
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _ordering_names(queryset):
+    """Поля модели, по которым сортируется queryset (нужны пагинации)"""
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    names = []
+    for item in ordering:
+        if isinstance(item, str):
+            name = item.lstrip('-')
+            if _model_field(queryset.model, name) is not None:
+                names.append(name)
+    return names
+
+
+def sparse_queryset(queryset, serializer_class, names):
+    """
+    Сужает queryset до колонок полей names сериализатора.
+    select_related и prefetch_related заменяются связями из lookups.
+    """
+    model = queryset.model
+    sources = getattr(serializer_class.Meta, 'field_sources', {})
+    lookups = {model._meta.pk.name}
+    lookups.update(_ordering_names(queryset))
+    for name in names:
+        if name in sources:
+            lookups.update(sources[name])
+        else:
+            field = _model_field(model, name)
+            if field is not None and field.concrete:
+                lookups.add(name)
+
+    relations = set()
+    for lookup in lookups:
+        parts = lookup.split('__')
+        for depth in range(1, len(parts)):
+            relations.add('__'.join(parts[:depth]))
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if relations:
+        queryset = queryset.select_related(*sorted(relations))
+    return queryset.only(*sorted(lookups))
+
+
+class SparseFieldsetViewMixin:
+    """Сужает queryset списка до запрошенных полей сериализатора"""
+
+    def paginate_queryset(self, queryset):
+        # После filter_queryset: порядок ленты и фильтры уже применены
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            names = selected_field_names(
+                self.request, serializer_class(context=self.get_serializer_context()).fields
+            )
+            if names is not None:
+                if isinstance(queryset, Feed):
+                    queryset = queryset.apply(lambda part: sparse_queryset(part, serializer_class, names))
+                else:
+                    queryset = sparse_queryset(queryset, serializer_class, names)
+        return super().paginate_queryset(queryset)
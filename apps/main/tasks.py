@@ -0,0 +1,93 @@
+import logging
+
+from celery import shared_task
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+from django.apps import apps
+
+from config.db_router import read_only
+
+from .analytics import rollup_daily_views
+from .author_stats import update_author_stats
+from .counters import flush_pending_views
+from .hot import refresh_hot_scores
+from .images import generate_variants
+from .leaderboards import rebuild_leaderboards
+from .related import rebuild_related_posts, update_related_posts
+from .response_cache import invalidate_tags
+from .timelines import fan_out_batch, get_timeline_store
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_post_views():
+    """Периодическая задача для записи накопленных просмотров в БД"""
+    return {'flushed_views': flush_pending_views()}
+
+
+@shared_task
+def rollup_post_views():
+    """
+    Сворачивает почасовые корзины просмотров в дневные агрегаты
+    и обновляет по ним статистику авторов за те же дни.
+    """
+    return {'daily_rows': rollup_daily_views(), 'author_rows': update_author_stats()}
+
+
+@shared_task
+@read_only
+def rebuild_post_leaderboards():
+    """Пересобирает лидерборды всех окон из БД (читает с реплики)"""
+    return {'leaderboard_posts': rebuild_leaderboards()}
+
+
+@shared_task
+def refresh_post_hot_scores():
+    """Пересчитывает оценки "горячих" постов"""
+    return {'hot_posts': refresh_hot_scores()}
+
+
+@shared_task
+def rebuild_post_related():
+    """Пересобирает таблицу похожих постов"""
+    return {'related_posts': rebuild_related_posts()}
+
+
+@shared_task
+def update_post_related(post_id):
+    """Пересчитывает похожие посты после публикации или изменения поста"""
+    return {'changed_posts': len(update_related_posts(post_id))}
+
+
+@shared_task
+def generate_image_variants(model_label, pk, field_name):
+    """Строит уменьшенные копии изображения после загрузки"""
+    model = apps.get_model(model_label)
+    variants = generate_variants(model, pk, field_name)
+    if variants and model_label == 'main.Post':
+        invalidate_tags(f'post:{pk}', 'feed')
+    return {'generated': bool(variants)}
+
+
+@shared_task
+def fan_out_post(post_id, after_follower_id=0):
+    """
+    Раскладывает пост по лентам подписчиков автора.
+    Одна задача обрабатывает одну пачку и ставит в очередь следующую.
+    """
+    if not get_timeline_store().shared:
+        # Ленты local в памяти воркера никто не читает: раскладка идет в веб-процессе
+        logger.warning('Skipping fan-out of post %s: the local timeline store is not shared', post_id)
+        return {'last_follower_id': None, 'skipped': True}
+    last_follower_id = fan_out_batch(post_id, after_follower_id)
+    if last_follower_id is not None:
+        fan_out_post.apply_async((post_id, last_follower_id))
+    return {'last_follower_id': last_follower_id}
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def flush_post_views_on_shutdown(**kwargs):
+    """Сбрасывает буфер просмотров при остановке воркера"""
+    flush_pending_views()
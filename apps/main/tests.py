@@ -7,13 +7,71 @@ Copy and paste these commands into your terminal to test the API.
 Base URL: http://127.0.0.1:8000/api/v1/posts/
 """
 
-from django.test import TestCase
+import csv
+import gzip
+import http.server
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.db.models import Count, F, Q
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.contrib import admin
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Category, Post
+from .models import AuthorDailyStats, Category, Post, PostViewDay, PostViewHour, RelatedPost, ViewFlush
+from .serializers import CategorySerializer
+from .counters import LocalViewBuffer, flush_pending_views, pending_views, reset_view_buffer
+from .leaderboards import get_leaderboard, rebuild_leaderboards, reset_leaderboard, top_post_ids
+from .hot import refresh_hot_scores
+from .analytics import add_view_events, hour_start, rollup_daily_views
+from .asyncapi import run_concurrently
+from .benchdata import BENCH_PASSWORD, BenchDataset
+from .loadtest import (
+    LoadRunner, LoadTestError, Targets, format_benchmark, parse_mix, parse_profiles, run_worker_benchmark,
+    summarize,
+)
+from .query_budget import QueryBudgetExceeded, install_query_delay, view_budget
+from .author_stats import build_author_stats, update_author_stats
+from .importer import Checkpoint, ContentImporter
+from .serializers import PostListSerializer
+from .views import PostDetailView, PostListCreateView, recent_posts
+from .tasks import fan_out_post, generate_image_variants, update_post_related
+from .related import (
+    INDEX_VERSION_KEY, nearest_neighbours, rebuild_related_posts, reset_index, tfidf_matrix,
+    update_related_posts,
+)
+from .timelines import (
+    LocalTimelineStore, fan_out_batch, get_timeline_store, post_score, reset_timeline_store,
+)
+from apps.subscribe.models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
+from apps.comments.models import Comment
+from apps.accounts.models import Follow
+from config.db_router import (
+    PRIMARY_COOKIE, ReplicaMiddleware, measure_lag, read_only, replica_reads, reset_replica_lags,
+)
 
 User = get_user_model()
 
@@ -69,9 +127,2662 @@ class MainModelTests(TestCase):
 
     def test_post_increment_views(self):
         """Test post views increment"""
+        reset_view_buffer()
         initial_views = self.post.views_count
         self.post.increment_views()
-        self.assertEqual(self.post.views_count, initial_views + 1)
+        self.assertEqual(self.post.get_views_count(), initial_views + 1)
+
+
+class ReplayingViewBuffer(LocalViewBuffer):
+    """Buffer that keeps its batch and id until ack(), like the Redis buffer"""
+
+    def __init__(self):
+        super().__init__()
+        self.batch = None
+        self.lose_ack = True
+
+    def drain(self):
+        if self.batch is None:
+            self.batch = (uuid.uuid4().hex, super().drain()[1])
+        return self.batch
+
+    def ack(self):
+        if self.lose_ack:
+            # The process dies after the commit, before the batch is removed
+            self.lose_ack = False
+            raise ConnectionError('Redis went away')
+        self.batch = None
+
+
+class ViewCounterTests(TestCase):
+    """
+    Tests for the buffered (write-behind) post view counter
+    """
+
+    def setUp(self):
+        reset_view_buffer()
+        reset_leaderboard()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Viral Post',
+            content='Everybody reads this.',
+            author=self.user,
+            status='published'
+        )
+        self.other_post = Post.objects.create(
+            title='Quiet Post',
+            content='Nobody reads this.',
+            author=self.user,
+            status='published'
+        )
+
+    def tearDown(self):
+        reset_view_buffer()
+
+    def test_views_are_buffered_until_flush(self):
+        """Test views are not written to the posts row on every hit"""
+        for _ in range(3):
+            self.post.increment_views()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 0)
+        self.assertEqual(pending_views(self.post.id), 3)
+        self.assertEqual(self.post.get_views_count(), 3)
+
+    def test_flush_writes_batched_increments(self):
+        """Test flush applies buffered increments to every post"""
+        for _ in range(5):
+            self.post.increment_views()
+        self.other_post.increment_views()
+
+        with CaptureQueriesContext(connection) as queries:
+            flushed = flush_pending_views()
+
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(flushed, 6)
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 5)
+        self.assertEqual(self.other_post.views_count, 1)
+        self.assertEqual(pending_views(self.post.id), 0)
+        self.assertEqual(flush_pending_views(), 0)
+
+    def test_equal_increments_share_one_update(self):
+        """Test posts with the same pending amount are updated in one statement"""
+        self.post.increment_views()
+        self.other_post.increment_views()
+
+        with CaptureQueriesContext(connection) as queries:
+            flush_pending_views()
+
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    def test_views_count_stays_monotonic_across_flush(self):
+        """Test stored + pending count does not change when flushed"""
+        self.post.increment_views()
+        self.post.increment_views()
+        before = self.post.get_views_count()
+
+        flush_pending_views()
+        self.post.refresh_from_db()
+
+        self.assertEqual(self.post.get_views_count(), before)
+
+    def test_failed_flush_keeps_pending_views(self):
+        """Test increments are restored to the buffer if the UPDATE fails"""
+        self.post.increment_views()
+
+        with mock.patch.object(Post.objects, 'filter', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                flush_pending_views()
+
+        self.assertEqual(pending_views(self.post.id), 1)
+        flush_pending_views()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+
+    def test_batch_replayed_after_commit_is_not_applied_twice(self):
+        """Test a batch committed before a lost ack() is dropped, not re-applied"""
+        buffer = ReplayingViewBuffer()
+        with mock.patch('apps.main.counters._buffer', buffer):
+            for _ in range(3):
+                self.post.increment_views()
+            with self.assertRaises(ConnectionError):
+                flush_pending_views()
+
+            self.assertEqual(flush_pending_views(), 0)
+            self.assertIsNone(buffer.batch)
+            self.post.increment_views()
+            self.assertEqual(flush_pending_views(), 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 4)
+        self.assertEqual(PostViewHour.objects.get(post=self.post).views, 4)
+        self.assertEqual(ViewFlush.objects.count(), 2)
+
+    def test_post_detail_reports_pending_views(self):
+        """Test post detail returns stored + pending views without a row update"""
+        url = f'/api/v1/posts/{self.post.slug}/'
+        self.client.get(url)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['views_count'], 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 0)
+
+
+class CategoryPostsCountTests(TestCase):
+    """
+    Tests for the maintained Category.posts_count counter
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='writer',
+            email='writer@example.com',
+            password='testpass123'
+        )
+        self.tech = Category.objects.create(name='Tech')
+        self.science = Category.objects.create(name='Science')
+
+    def create_post(self, title, category, status='published'):
+        return Post.objects.create(
+            title=title,
+            content='Content',
+            author=self.user,
+            category=category,
+            status=status
+        )
+
+    def assertCounts(self, tech, science):
+        self.tech.refresh_from_db()
+        self.science.refresh_from_db()
+        self.assertEqual((self.tech.posts_count, self.science.posts_count), (tech, science))
+
+    def test_counts_published_posts_only(self):
+        """Test creating published and draft posts"""
+        self.create_post('Published', self.tech)
+        self.create_post('Draft', self.tech, status='draft')
+        self.assertCounts(1, 0)
+
+    def test_status_toggle_and_category_change(self):
+        """Test publishing, unpublishing and moving a post"""
+        post = self.create_post('Draft', self.tech, status='draft')
+
+        post.status = 'published'
+        post.save()
+        self.assertCounts(1, 0)
+
+        post.category = self.science
+        post.save()
+        self.assertCounts(0, 1)
+
+        post.status = 'draft'
+        post.save()
+        self.assertCounts(0, 0)
+
+    def test_delete_decrements(self):
+        """Test deleting posts, also through author cascade"""
+        post = self.create_post('One', self.tech)
+        self.create_post('Two', self.tech)
+        post.delete()
+        self.assertCounts(1, 0)
+
+        self.user.delete()
+        self.assertCounts(0, 0)
+
+    def test_category_save_keeps_counter(self):
+        """Test saving a stale category instance does not reset the counter"""
+        stale = Category.objects.get(pk=self.tech.pk)
+        self.create_post('Post', self.tech)
+
+        stale.description = 'Updated'
+        stale.save()
+        self.assertCounts(1, 0)
+
+    def test_category_list_query_count_is_constant(self):
+        """Benchmark: listing 500 categories costs the same queries as 5"""
+        Category.objects.bulk_create(
+            Category(name=f'Category {i}', slug=f'category-{i}') for i in range(3)
+        )
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/v1/posts/categories/')
+
+        Category.objects.bulk_create(
+            Category(name=f'Bulk {i}', slug=f'bulk-{i}') for i in range(495)
+        )
+        self.assertEqual(Category.objects.count(), 500)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/v1/posts/categories/')
+
+        self.assertEqual(response.data['count'], 500)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+        with self.assertNumQueries(1):
+            data = CategorySerializer(Category.objects.all(), many=True).data
+        self.assertEqual(len(data), 500)
+
+
+class ImportContentTests(TestCase):
+    """
+    Tests for the import_content bulk import command
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.write('users.jsonl', [
+            {'username': 'alice', 'email': 'alice@example.com'},
+            {'username': 'bob', 'email': 'bob@example.com'},
+        ])
+        self.write('categories.jsonl', [{'name': 'Tech'}])
+        self.write('posts.jsonl', [
+            {'id': f'p{i}', 'title': 'Same title', 'author': 'alice', 'category': 'Tech',
+             'content': 'Body', 'created_at': '2020-01-0%dT10:00:00' % (i + 1)}
+            for i in range(5)
+        ] + [{'id': 'draft', 'title': 'Draft', 'author': 'bob', 'category': 'Tech', 'status': 'draft'}])
+        self.write('comments.jsonl', [
+            {'id': 'c1', 'post': 'p0', 'author': 'bob', 'content': 'First'},
+            {'id': 'c2', 'post': 'p0', 'author': 'alice', 'content': 'Reply', 'parent': 'c1'},
+            {'id': 'c3', 'post': 'p1', 'author': 'bob', 'content': 'Other'},
+            {'id': 'c4', 'post': 'missing', 'author': 'bob', 'content': 'Orphan'},
+        ])
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def write(self, name, rows):
+        with open(self.path(name), 'w', encoding='utf-8') as handle:
+            for row in rows:
+                handle.write(json.dumps(row) + '\n')
+
+    def import_all(self, **options):
+        call_command(
+            'import_content',
+            users=self.path('users.jsonl'),
+            categories=self.path('categories.jsonl'),
+            posts=self.path('posts.jsonl'),
+            comments=self.path('comments.jsonl'),
+            stdout=open(os.devnull, 'w'),
+            **{'batch_size': 2, **options}
+        )
+
+    def test_import_preserves_timestamps_and_counters(self):
+        """Test imported rows, unique slugs, timestamps and denormalized counters"""
+        self.import_all()
+
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 6)
+        slugs = set(Post.objects.filter(title='Same title').values_list('slug', flat=True))
+        self.assertEqual(len(slugs), 5)
+
+        first = Post.objects.get(slug='same-title')
+        self.assertEqual(first.created_at.year, 2020)
+        self.assertEqual(first.comments_count, 2)
+        self.assertEqual(Category.objects.get(name='Tech').posts_count, 5)
+
+        reply = Comment.objects.get(content='Reply')
+        self.assertEqual(reply.parent.content, 'First')
+        self.assertFalse(Comment.objects.filter(content='Orphan').exists())
+
+    def test_resume_after_interrupted_batch(self):
+        """Test that a rerun with a checkpoint does not duplicate rows"""
+        checkpoint = self.path('import.ckpt')
+        original_commit = Checkpoint.commit
+        calls = []
+
+        def crash_on_second_batch(instance):
+            # Fail after the second posts batch is committed to the database
+            if instance.state['pending']['entity'] == 'posts':
+                calls.append(1)
+                if len(calls) == 2:
+                    raise KeyError('interrupted')
+            original_commit(instance)
+
+        with mock.patch.object(Checkpoint, 'commit', autospec=True, side_effect=crash_on_second_batch):
+            with self.assertRaises(CommandError):
+                self.import_all(checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 4)
+
+        self.import_all(checkpoint=checkpoint)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(Category.objects.get(name='Tech').posts_count, 5)
+
+        self.import_all(checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 6)
+
+    def test_deep_thread_is_inserted_in_one_batch(self):
+        """Test replies to comments of the same batch do not split it"""
+        self.write('comments.jsonl', [{'id': 't0', 'post': 'p0', 'author': 'bob', 'content': 'Reply 0'}] + [
+            {'id': f't{i}', 'post': 'p0', 'author': 'bob', 'content': f'Reply {i}', 'parent': f't{i - 1}'}
+            for i in range(1, 10)
+        ])
+        original_flush = ContentImporter.flush
+        flushed = []
+
+        def record_flush(importer, entity, batch, position):
+            if entity == 'comments':
+                flushed.append(len(batch))
+            original_flush(importer, entity, batch, position)
+
+        with mock.patch.object(ContentImporter, 'flush', autospec=True, side_effect=record_flush):
+            self.import_all(batch_size=100)
+
+        self.assertEqual(flushed, [10])
+        for i in range(1, 10):
+            reply = Comment.objects.get(content=f'Reply {i}')
+            self.assertEqual(reply.parent.content, f'Reply {i - 1}')
+        self.assertEqual(Post.objects.get(slug='same-title').comments_count, 10)
+
+    def test_requires_source_file(self):
+        """Test running the command without input files"""
+        with self.assertRaises(CommandError):
+            call_command('import_content')
+
+
+class ExportContentTests(TestCase):
+    """
+    Tests for the export_content command and the staff export endpoint
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.category = Category.objects.create(name='Tech')
+        self.old = Post.objects.create(
+            title='Old post', content='Old', author=self.author, category=self.category, status='published'
+        )
+        Post.objects.filter(pk=self.old.pk).update(updated_at=timezone.now() - timedelta(days=10))
+        self.new = Post.objects.create(
+            title='New post', content='Новый', author=self.author, category=self.category, status='published'
+        )
+        Comment.objects.create(post=self.new, author=self.staff, content='Nice')
+
+    def export(self, *args, **options):
+        path = os.path.join(self.tmp.name, options.pop('filename', 'export.ndjson'))
+        call_command('export_content', *args, output=path, stderr=io.StringIO(), **options)
+        return path
+
+    def test_ndjson_export_with_since(self):
+        """Test NDJSON export and incremental --since filtering"""
+        with open(self.export('posts')) as handle:
+            rows = [json.loads(line) for line in handle]
+        self.assertEqual([row['title'] for row in rows], ['Old post', 'New post'])
+        self.assertEqual(rows[1]['author'], 'author')
+        self.assertEqual(rows[1]['category'], 'tech')
+        self.assertEqual(rows[1]['content'], 'Новый')
+
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        with open(self.export('posts', since=since)) as handle:
+            rows = [json.loads(line) for line in handle]
+        self.assertEqual([row['title'] for row in rows], ['New post'])
+
+    def test_gzip_csv_export_is_one_query(self):
+        """Test gzip CSV output and that rows are streamed from a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            path = self.export('comments', format='csv', filename='comments.csv.gz')
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['post'], str(self.new.pk))
+        self.assertEqual(rows[0]['author'], 'staff')
+        self.assertEqual(rows[0]['parent'], '')
+
+    def test_invalid_arguments(self):
+        """Test unknown entity and malformed --since"""
+        with self.assertRaises(CommandError):
+            self.export('passwords')
+        with self.assertRaises(CommandError):
+            self.export('posts', since='yesterday')
+
+    def test_export_endpoint_requires_staff(self):
+        """Test that only staff can download exports"""
+        url = '/api/v1/posts/export/posts/'
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_export_endpoint_streams_gzip(self):
+        """Test streaming gzip CSV download and unknown entities"""
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/v1/posts/export/users/', {'output': 'csv', 'gzip': 'true'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('users.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual({row['username'] for row in rows}, {'author', 'staff'})
+        self.assertNotIn('password', rows[0])
+
+        response = self.client.get('/api/v1/posts/export/passwords/')
+        self.assertEqual(response.status_code, 400)
+
+
+def run_task_now(args, **options):
+    """Run a Celery task synchronously instead of sending it to the broker"""
+    return generate_image_variants(*args)
+
+
+class ImageVariantsTests(TestCase):
+    """
+    Tests for resized image variants of Post.image and User.avatar
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Timeline fan-out and related posts are not under test here
+        for target in ('apps.main.timelines._enqueue_fan_out', 'apps.main.related._enqueue_related_update'):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            username='photographer', email='photo@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='Photo')
+
+    def image_file(self, name='photo.png', size=(1200, 800), color='red'):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_post(self, title, image):
+        with mock.patch.object(generate_image_variants, 'apply_async', side_effect=run_task_now) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(
+                    title=title, content='Content', author=self.user,
+                    category=self.category, status='published', image=image
+                )
+        post.refresh_from_db()
+        return post, delay
+
+    def variant_files(self):
+        root = os.path.join(self.media_root, 'variants')
+        return sorted(
+            os.path.join(path, name) for path, _, names in os.walk(root) for name in names
+        )
+
+    def test_variants_are_generated_after_upload(self):
+        """Test that WebP/JPEG variants are built with the configured sizes"""
+        from PIL import Image
+
+        post, delay = self.create_post('Photo', self.image_file())
+        delay.assert_called_once_with(('main.Post', post.pk, 'image'), retry=False)
+
+        self.assertEqual(post.image_variants['source'], post.image.name)
+        self.assertEqual(len(self.variant_files()), 6)
+        with Image.open(os.path.join(self.media_root, post.image_variants['thumb']['webp'])) as thumb:
+            self.assertEqual((thumb.format, thumb.size), ('WEBP', (160, 160)))
+        with Image.open(os.path.join(self.media_root, post.image_variants['card']['jpeg'])) as card:
+            self.assertEqual((card.format, card.size), ('JPEG', (540, 360)))
+
+        data = PostListSerializer(post).data
+        self.assertTrue(data['image_variants']['card']['webp'].endswith('.webp'))
+        self.assertNotEqual(data['image_variants']['card']['webp'], post.image.url)
+
+    def test_duplicate_upload_reuses_files(self):
+        """Test that identical uploads are stored only once"""
+        first, _ = self.create_post('First', self.image_file('a.png'))
+        files = self.variant_files()
+        second, _ = self.create_post('Second', self.image_file('b.png'))
+
+        self.assertEqual(self.variant_files(), files)
+        self.assertEqual(second.image_variants['full'], first.image_variants['full'])
+
+    def test_original_is_served_until_variants_exist(self):
+        """Test fallback to the original file for new or replaced images"""
+        post, _ = self.create_post('Photo', self.image_file())
+
+        post.image = self.image_file('other.png', color='blue')
+        with mock.patch.object(generate_image_variants, 'apply_async') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save()
+        delay.assert_called_once_with(('main.Post', post.pk, 'image'), retry=False)
+
+        data = PostListSerializer(post).data
+        self.assertEqual(data['image_variants']['thumb']['webp'], post.image.url)
+        self.assertEqual(data['image_variants']['full']['jpeg'], post.image.url)
+
+    def test_avatar_thumb_in_comment_author_info(self):
+        """Test that comments link to the avatar thumbnail"""
+        from apps.comments.serializers import CommentSerializer
+
+        post, _ = self.create_post('No image', None)
+        self.user.avatar = self.image_file('avatar.png', size=(400, 400))
+        with mock.patch.object(generate_image_variants, 'apply_async', side_effect=run_task_now):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+        self.user.refresh_from_db()
+
+        comment = Comment.objects.create(post=post, author=self.user, content='Nice')
+        avatar = CommentSerializer(comment).data['author_info']['avatar']
+        self.assertTrue(avatar.endswith('thumb-160x160c.webp'))
+
+
+class PostTextStatsTests(TestCase):
+    """
+    Tests for the stored excerpt, word_count and reading_time columns
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='writer', email='writer@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='Longreads')
+        self.post = Post.objects.create(
+            title='Long read', content='word ' * 450, author=self.user,
+            category=self.category, status='published'
+        )
+
+    def test_stats_computed_on_save(self):
+        """Test excerpt, word count and reading time on create and edit"""
+        self.assertEqual(self.post.excerpt, ('word ' * 40) + '...')
+        self.assertEqual((self.post.word_count, self.post.reading_time), (450, 3))
+
+        self.post.content = 'Short text'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.excerpt, self.post.word_count, self.post.reading_time),
+            ('Short text', 2, 1)
+        )
+
+    def test_saving_deferred_post_keeps_content(self):
+        """Test that saving a post loaded without content does not load or reset it"""
+        post = Post.objects.for_list().get(pk=self.post.pk)
+        post.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse(any('"content"' in query['sql'] for query in queries.captured_queries))
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.word_count), ('Renamed', 450))
+        self.assertEqual(post.content, 'word ' * 450)
+
+    def test_list_endpoints_do_not_select_content(self):
+        """Test that list endpoints read the excerpt instead of the post body"""
+        for url in ['/api/v1/posts/', '/api/v1/posts/recent/',
+                    f'/api/v1/posts/categories/{self.category.slug}/posts/']:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            post_queries = [q['sql'] for q in queries.captured_queries if 'FROM "posts"' in q['sql']]
+            self.assertTrue(post_queries, url)
+            self.assertFalse(any('"posts"."content"' in sql for sql in post_queries), url)
+
+        data = response.json()['posts'][0]
+        self.assertEqual(data['content'], self.post.excerpt)
+        self.assertEqual(data['reading_time'], 3)
+
+
+@override_settings(RELATED_POSTS_COUNT=2, RELATED_POSTS_MIN_SCORE=0.01)
+class RelatedPostsTests(APITestCase):
+    """
+    Tests for the precomputed related posts table
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_index()
+        # Timeline fan-out is not under test here
+        fan_out = mock.patch('apps.main.timelines._enqueue_fan_out')
+        fan_out.start()
+        self.addCleanup(fan_out.stop)
+        self.user = User.objects.create_user(
+            username='writer', email='writer@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='Science')
+        self.posts = {
+            'python': self.create_post('Python tips', 'Python generators and python decorators explained'),
+            'django': self.create_post('Django with Python', 'Python web framework django models and views'),
+            'flask': self.create_post('Flask web apps', 'Minimal python web framework for small apps'),
+            'baking': self.create_post('Baking bread', 'Flour water yeast and a hot oven make bread'),
+            'pastry': self.create_post('Pastry basics', 'Butter flour and a cold kitchen for pastry'),
+        }
+
+    def create_post(self, title, content, status='published'):
+        with mock.patch('apps.main.related._enqueue_related_update'):
+            return Post.objects.create(
+                title=title, content=content, author=self.user,
+                category=self.category, status=status
+            )
+
+    def related_ids(self, key):
+        return list(
+            RelatedPost.objects.filter(post=self.posts[key])
+            .order_by('-score').values_list('related_id', flat=True)
+        )
+
+    def test_blocked_multiply_matches_full_multiply(self):
+        """Test that block size does not change the neighbours"""
+        documents = [(post.title, post.content) for post in self.posts.values()]
+        matrix = tfidf_matrix(documents)
+        self.assertEqual(
+            list(nearest_neighbours(matrix, 2, rows_per_block=1)),
+            list(nearest_neighbours(matrix, 2, rows_per_block=100)),
+        )
+
+    def test_rebuild_finds_similar_posts(self):
+        """Test that posts sharing vocabulary are neighbours"""
+        self.assertGreater(rebuild_related_posts(), 0)
+        self.assertEqual(self.related_ids('django')[0], self.posts['python'].pk)
+        self.assertEqual(self.related_ids('baking'), [self.posts['pastry'].pk])
+        self.assertNotIn(self.posts['baking'].pk, self.related_ids('python'))
+
+    def test_related_endpoint(self):
+        """Test serving related posts from the table in few queries"""
+        rebuild_related_posts()
+        url = f'/api/v1/posts/{self.posts["baking"].slug}/related/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['title'] for post in response.data['results']], ['Pastry basics'])
+        post_queries = [q for q in queries.captured_queries if 'FROM "posts"' in q['sql']]
+        self.assertEqual(len(post_queries), 2)
+
+        self.assertEqual(self.client.get('/api/v1/posts/missing/related/').status_code, 404)
+
+    def test_incremental_update_on_publish_and_unpublish(self):
+        """Test that publishing and unpublishing update neighbour lists"""
+        rebuild_related_posts()
+        draft = self.create_post('Sourdough bread', 'Sourdough bread needs flour water and yeast', 'draft')
+        self.posts['sourdough'] = draft
+
+        draft.status = 'published'
+        with mock.patch.object(update_post_related, 'apply_async') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                draft.save()
+        enqueue.assert_called_once_with((draft.pk,), retry=False)
+
+        changed = update_related_posts(draft.pk)
+        self.assertIn(self.posts['baking'].pk, changed)
+        self.assertEqual(self.related_ids('sourdough')[0], self.posts['baking'].pk)
+        self.assertEqual(self.related_ids('baking')[0], draft.pk)
+        # The neighbour lists stay capped at RELATED_POSTS_COUNT
+        self.assertLessEqual(len(self.related_ids('baking')), 2)
+
+        Post.objects.filter(pk=draft.pk).update(status='draft')
+        update_related_posts(draft.pk)
+        self.assertFalse(RelatedPost.objects.filter(related=draft).exists())
+        self.assertEqual(self.related_ids('sourdough'), [])
+
+    def test_update_vectorizes_only_the_changed_post(self):
+        """Test an edit reuses the stored index instead of reading the whole corpus"""
+        rebuild_related_posts()
+        post = self.posts['python']
+        Post.objects.filter(pk=post.pk).update(
+            title='Bread for pastry', content='Flour butter yeast and a hot oven'
+        )
+
+        with mock.patch('apps.main.related.build_index', side_effect=AssertionError('full rebuild')):
+            with CaptureQueriesContext(connection) as queries:
+                changed = update_related_posts(post.pk)
+
+        post_queries = [q for q in queries.captured_queries if 'FROM "posts"' in q['sql']]
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn(self.posts['baking'].pk, changed)
+        self.assertEqual(set(self.related_ids('python')), {self.posts['baking'].pk, self.posts['pastry'].pk})
+        self.assertNotIn(post.pk, self.related_ids('django'))
+
+    def test_update_keeps_the_index_in_process(self):
+        """Test edits read only the build number from the cache and never write the index back"""
+        rebuild_related_posts()
+        with mock.patch('apps.main.related.cache', wraps=cache) as shared:
+            update_related_posts(self.posts['python'].pk)
+            update_related_posts(self.posts['baking'].pk)
+        keys = [call.args[0] for call in shared.method_calls]
+        self.assertEqual(keys, [INDEX_VERSION_KEY, INDEX_VERSION_KEY])
+
+        # A rebuild in another process is picked up by its build number
+        reset_index()
+        rebuild_related_posts()
+        version = cache.get(INDEX_VERSION_KEY)
+        reset_index()
+        with mock.patch('apps.main.related.build_index', side_effect=AssertionError('full rebuild')):
+            update_related_posts(self.posts['python'].pk)
+        self.assertEqual(cache.get(INDEX_VERSION_KEY), version)
+
+    def test_unchanged_text_does_not_schedule_update(self):
+        """Test that saving without text changes skips the update"""
+        post = Post.objects.get(pk=self.posts['python'].pk)
+        with mock.patch('apps.main.related._enqueue_related_update') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save()
+                post.title = 'Python tricks'
+                post.save()
+        self.assertEqual(enqueue.call_count, 1)
+
+    def test_rebuild_command(self):
+        """Test the rebuild_related_posts management command"""
+        out = io.StringIO()
+        call_command('rebuild_related_posts', '--count', '1', stdout=out)
+        self.assertIn('rebuilt with', out.getvalue())
+        self.assertEqual(len(self.related_ids('django')), 1)
+
+
+@override_settings(
+    HOT_VIEW_WEIGHT=1.0, HOT_COMMENT_WEIGHT=5.0, HOT_GRAVITY=1.8,
+    HOT_WINDOW_DAYS=30, HOT_MIN_CHANGE=0.01,
+)
+class HotPostsTests(APITestCase):
+    """
+    Tests for the time-decayed hot ranking
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='writer', email='writer@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='News')
+        self.now = timezone.now()
+
+    def create_post(self, title, hours_ago, views=0, comments=0, status='published'):
+        post = Post.objects.create(
+            title=title, content='Content', author=self.user,
+            category=self.category, status=status
+        )
+        Post.objects.filter(pk=post.pk).update(
+            created_at=self.now - timedelta(hours=hours_ago),
+            views_count=views, comments_count=comments,
+        )
+        return post
+
+    def scores(self):
+        return dict(Post.objects.values_list('title', 'hot_score'))
+
+    def test_fresh_posts_outrank_old_popular_posts(self):
+        """Test that age decay beats lifetime views"""
+        self.create_post('Old classic', 24 * 20, views=5000)
+        self.create_post('Fresh', 1, views=40)
+        self.create_post('Discussed', 3, views=10, comments=20)
+
+        self.assertEqual(refresh_hot_scores(now=self.now.timestamp()), 3)
+        scores = self.scores()
+        self.assertAlmostEqual(scores['Fresh'], 40 / 3 ** 1.8, places=2)
+        self.assertAlmostEqual(scores['Discussed'], 110 / 5 ** 1.8, places=2)
+
+        response = self.client.get('/api/v1/posts/hot/')
+        self.assertEqual(
+            [post['title'] for post in response.data], ['Discussed', 'Fresh', 'Old classic']
+        )
+
+    def test_posts_leaving_window_are_reset(self):
+        """Test that old and unpublished posts drop out of the ranking"""
+        old = self.create_post('Aging', 24)
+        draft = self.create_post('Withdrawn', 2, views=100)
+        Post.objects.filter(pk=old.pk).update(views_count=100)
+        refresh_hot_scores(now=self.now.timestamp())
+        self.assertTrue(all(score > 0 for score in self.scores().values()))
+
+        Post.objects.filter(pk=draft.pk).update(status='draft')
+        later = self.now + timedelta(days=30)
+        self.assertEqual(refresh_hot_scores(now=later.timestamp()), 0)
+        self.assertEqual(set(self.scores().values()), {0})
+        self.assertEqual(self.client.get('/api/v1/posts/hot/').data, [])
+
+    def test_batches_and_full_save(self):
+        """Test that batch size does not change scores and saves keep them"""
+        for index in range(5):
+            self.create_post(f'Post {index}', 48 * index + 1, views=10 * index)
+        refresh_hot_scores(now=self.now.timestamp())
+        expected = self.scores()
+
+        Post.objects.update(hot_score=0)
+        self.assertEqual(refresh_hot_scores(batch_size=2, now=self.now.timestamp()), 5)
+        self.assertEqual(self.scores(), expected)
+
+        # Half an hour later the week-old post decayed by less than 1%
+        refresh_hot_scores(now=self.now.timestamp() + 1800)
+        scores = self.scores()
+        self.assertLess(scores['Post 1'], expected['Post 1'])
+        self.assertEqual(scores['Post 4'], expected['Post 4'])
+
+        # A stale instance must not overwrite the computed score
+        post = Post.objects.get(title='Post 4')
+        Post.objects.filter(pk=post.pk).update(hot_score=123)
+        post.title = 'Renamed'
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).hot_score, 123)
+
+
+class PostAnalyticsTests(TestCase):
+    """
+    Tests for hourly view buckets, daily rollups and analytics series
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        reset_view_buffer()
+        self.addCleanup(reset_view_buffer)
+        self.author = User.objects.create_user(
+            username='analyst', email='analyst@example.com', password='testpass123'
+        )
+        self.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Measured', content='Content', author=self.author, status='published'
+        )
+        self.other_post = Post.objects.create(
+            title='Also measured', content='Content', author=self.author, status='published'
+        )
+        self.today = timezone.localdate()
+
+    def add_hour(self, post, days_ago, views, anonymous=0):
+        hour = timezone.make_aware(
+            datetime.combine(self.today - timedelta(days=days_ago), datetime.min.time())
+        ) + timedelta(hours=12)
+        return PostViewHour.objects.create(post=post, hour=hour, views=views, anonymous_views=anonymous)
+
+    def test_flush_writes_hourly_buckets(self):
+        """Test that buffered views land in hourly buckets with the anonymous split"""
+        url = f'/api/v1/posts/{self.post.slug}/'
+        self.client.get(url)
+        self.client.get(url)
+        self.client.force_authenticate(self.reader)
+        self.client.get(url)
+
+        self.assertEqual(flush_pending_views(), 3)
+        bucket = PostViewHour.objects.get(post=self.post)
+        self.assertEqual((bucket.views, bucket.anonymous_views), (3, 2))
+        self.assertEqual(bucket.hour.minute, 0)
+
+        # Later flushes add to the same bucket
+        self.post.increment_views()
+        flush_pending_views()
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.views, bucket.anonymous_views), (4, 3))
+
+    def test_events_for_deleted_posts_are_skipped(self):
+        """Test that a deleted post does not break bucket writes"""
+        hour = int(timezone.now().timestamp() // 3600)
+        deleted_id = self.other_post.pk
+        self.other_post.delete()
+        written = add_view_events({(self.post.pk, hour, True): 2, (deleted_id, hour, False): 1})
+        self.assertEqual(written, 1)
+        self.assertEqual(PostViewHour.objects.get().views, 2)
+
+    @override_settings(ANALYTICS_HOURLY_RETENTION_DAYS=14)
+    def test_rollup_is_idempotent_and_prunes_old_buckets(self):
+        """Test that daily rows are recomputed, not summed, and old buckets removed"""
+        self.add_hour(self.post, 1, 5, 1)
+        self.add_hour(self.post, 0, 2, 2)
+        self.add_hour(self.post, 30, 9)
+
+        since = self.today - timedelta(days=1)
+        self.assertEqual(rollup_daily_views(since), 2)
+        self.assertEqual(rollup_daily_views(since), 2)
+        rows = PostViewDay.objects.order_by('day').values_list('day', 'views', 'anonymous_views', 'author')
+        self.assertEqual(list(rows), [
+            (since, 5, 1, self.author.pk),
+            (self.today, 2, 2, self.author.pk),
+        ])
+        self.assertEqual(PostViewHour.objects.count(), 2)
+
+    def test_series_endpoints(self):
+        """Test post and author series read only the daily table"""
+        self.add_hour(self.post, 2, 4, 1)
+        self.add_hour(self.other_post, 2, 3)
+        self.add_hour(self.post, 0, 1)
+        rollup_daily_views(self.today - timedelta(days=5))
+
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/posts/{self.post.slug}/analytics/', {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['series']), 7)
+        self.assertEqual(response.data['total_views'], 5)
+        self.assertEqual(response.data['series'][4], {
+            'date': (self.today - timedelta(days=2)).isoformat(), 'views': 4, 'anonymous_views': 1,
+        })
+        sql = [q['sql'] for q in queries.captured_queries]
+        self.assertEqual(len([q for q in sql if 'post_view_days' in q]), 1)
+        self.assertFalse([q for q in sql if 'post_view_hours' in q])
+
+        response = self.client.get('/api/v1/posts/my-analytics/')
+        self.assertEqual(len(response.data['series']), 90)
+        self.assertEqual(response.data['total_views'], 8)
+        self.assertEqual(response.data['series'][-3]['views'], 7)
+
+        self.assertEqual(self.client.get('/api/v1/posts/my-analytics/', {'days': 0}).status_code, 400)
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(
+            self.client.get(f'/api/v1/posts/{self.post.slug}/analytics/').status_code, 403
+        )
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'], READ_YOUR_WRITES_SECONDS=30)
+class ReplicaRoutingTests(TestCase):
+    """Tests for routing reads to replicas and read-your-writes stickiness"""
+
+    def setUp(self):
+        cache.clear()
+        reset_replica_lags()
+        self.lags = {'replica1': 0.0, 'replica2': 0.0}
+        patcher = mock.patch('config.db_router.measure_lag', side_effect=lambda alias: self.lags[alias])
+        self.measure_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pass12345')
+
+    def read_alias(self, request):
+        """Run the middleware and return the alias chosen for a read inside the view"""
+        aliases = []
+
+        def view(request):
+            aliases.append(Post.objects.all().db)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return aliases[0], response
+
+    def test_reads_use_primary_outside_replica_context(self):
+        """Test that shell, command and task code reads from the primary by default"""
+        self.assertEqual(Post.objects.all().db, 'default')
+        self.measure_lag.assert_not_called()
+
+    def test_lagging_replicas_are_skipped(self):
+        """Test that only replicas within the allowed lag receive reads"""
+        self.lags['replica1'] = 60.0
+        with replica_reads():
+            self.assertEqual({Post.objects.all().db for _ in range(10)}, {'replica2'})
+
+        reset_replica_lags()
+        self.lags['replica2'] = math.inf
+        with replica_reads():
+            self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_lag_is_checked_once_per_interval(self):
+        """Test that replica lag is cached between checks"""
+        with replica_reads():
+            for _ in range(5):
+                Post.objects.all().db
+        self.assertEqual(self.measure_lag.call_count, 2)
+
+    def test_reads_after_write_use_primary(self):
+        """Test that a write pins the rest of the context to the primary"""
+        with replica_reads():
+            self.assertIn(Post.objects.all().db, {'replica1', 'replica2'})
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_migrations_skip_replicas(self):
+        """Test that migrations are only applied to the primary"""
+        self.assertFalse(router.allow_migrate('replica1', 'main'))
+        self.assertTrue(router.allow_migrate('default', 'main'))
+
+    def test_unavailable_replica_is_skipped(self):
+        """Test that an unknown replica alias is treated as unavailable"""
+        with self.assertLogs('config.db_router', 'WARNING'):
+            self.assertEqual(measure_lag('missing'), math.inf)
+
+    def test_safe_requests_read_from_replica(self):
+        """Test that GET requests read from a replica and do not pin the client"""
+        alias, response = self.read_alias(self.factory.get('/api/v1/posts/'))
+        self.assertIn(alias, {'replica1', 'replica2'})
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_cookie_pins_reads_after_write(self):
+        """Test that a client reads from the primary for the window after a write"""
+        alias, response = self.read_alias(self.factory.post('/api/v1/posts/'))
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], 30)
+
+        request = self.factory.get('/api/v1/posts/')
+        request.COOKIES[PRIMARY_COOKIE] = cookie.value
+        self.assertEqual(self.read_alias(request)[0], 'default')
+
+        # Expired cookie
+        request.COOKIES[PRIMARY_COOKIE] = str(time.time() - 1)
+        self.assertIn(self.read_alias(request)[0], {'replica1', 'replica2'})
+
+    def test_jwt_user_pins_reads_after_write(self):
+        """Test that API clients without cookies are pinned by the token's user id"""
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.read_alias(self.factory.post('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+        request = self.factory.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.read_alias(request)[0], 'default')
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass12345')
+        other_token = str(RefreshToken.for_user(other).access_token)
+        request = self.factory.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {other_token}')
+        self.assertIn(self.read_alias(request)[0], {'replica1', 'replica2'})
+
+    def test_async_middleware_routes_reads_in_threads(self):
+        """Test that under ASGI the replica context reaches sync_to_async threads"""
+        aliases = []
+
+        async def view(request):
+            aliases.append(await sync_to_async(lambda: Post.objects.all().db)())
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(self.factory.get('/api/v1/posts/'))
+        response = async_to_sync(middleware)(self.factory.post('/api/v1/posts/'))
+        self.assertIn(aliases[0], {'replica1', 'replica2'})
+        self.assertEqual(aliases[1], 'default')
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_read_only_tasks_read_from_replica(self):
+        """Test that tasks marked read-only route their reads to replicas"""
+        @read_only
+        def task():
+            return Post.objects.all().db
+
+        self.assertIn(task(), {'replica1', 'replica2'})
+
+
+class QueryBudgetTests(TestCase):
+    """Tests for per-request query counting and view query budgets"""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='budget', email='budget@example.com', password='pass12345')
+        category = Category.objects.create(name='Budget', slug='budget')
+        for i in range(3):
+            Post.objects.create(title=f'Budget post {i}', content='Text', author=author, category=category)
+
+    @override_settings(QUERY_TIMING_HEADERS=True)
+    def test_headers_report_query_count_and_time(self):
+        """Test that X-DB-Queries and Server-Timing describe the queries of the request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['X-DB-Queries']), len(queries))
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{len(queries)} queries", total;dur=[\d.]+$',
+        )
+
+    @override_settings(QUERY_TIMING_HEADERS=False)
+    def test_headers_can_be_disabled(self):
+        """Test that timing headers are omitted when QUERY_TIMING_HEADERS is off"""
+        response = self.client.get('/api/v1/posts/')
+        self.assertNotIn('X-DB-Queries', response)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(QUERY_TIMING_HEADERS=True)
+    def test_async_view_queries_are_counted(self):
+        """Test that queries run in sync_to_async threads count towards the request"""
+        response = self.client.get('/api/v1/posts/recent/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises_over_budget(self):
+        """Test that a view over its budget fails the request in strict mode"""
+        with mock.patch.object(PostListCreateView, 'query_budget', {'GET': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/v1/posts/')
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_over_budget_is_logged(self):
+        """Test that a view over its budget is logged when not strict"""
+        with mock.patch.object(PostListCreateView, 'query_budget', {'GET': 1}):
+            with self.assertLogs('apps.main.query_budget', 'WARNING') as logs:
+                response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('post-list', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_DEFAULT=3)
+    def test_budget_lookup(self):
+        """Test that budgets come from the view, per method, or from the default"""
+        list_view = resolve('/api/v1/posts/').func
+        self.assertEqual(view_budget(list_view, 'GET'), 6)
+        self.assertEqual(view_budget(list_view, 'POST'), 3)
+        self.assertEqual(view_budget(recent_posts, 'GET'), 5)
+        self.assertEqual(view_budget(resolve('/api/v1/posts/my-analytics/').func, 'GET'), 3)
+
+
+class SeedBenchTests(TestCase):
+    """Tests for the synthetic benchmark dataset generator"""
+
+    def dataset(self, **kwargs):
+        options = dict(
+            users=20, categories=3, posts=60, comments=150, subscribers=5,
+            seed=7, batch_size=16, now=timezone.now(),
+        )
+        options.update(kwargs)
+        return BenchDataset(**options)
+
+    def test_generates_consistent_data(self):
+        """Test that generated rows keep counters and relations consistent"""
+        stats = self.dataset().run()
+
+        self.assertEqual(stats['users'], 20)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 150)
+        self.assertEqual(Comment.objects.filter(parent__isnull=False).count(), 60)
+        self.assertEqual(Subscription.objects.count(), 5)
+        self.assertFalse(
+            Post.objects.annotate(active=Count('comments', filter=Q(comments__is_active=True)))
+            .exclude(active=F('comments_count')).exists()
+        )
+        self.assertFalse(
+            Category.objects.annotate(published=Count('posts', filter=Q(posts__status='published')))
+            .exclude(published=F('posts_count')).exists()
+        )
+        self.assertFalse(Comment.objects.filter(parent__isnull=False).exclude(post=F('parent__post')).exists())
+        self.assertFalse(Comment.objects.filter(created_at__lt=F('post__created_at')).exists())
+        for pin in PinnedPost.objects.select_related('post', 'user__subscription'):
+            self.assertEqual(pin.post.author_id, pin.user_id)
+            self.assertTrue(pin.user.subscription.is_active)
+        post = Post.objects.first()
+        self.assertEqual(post.word_count, len(post.content.split()))
+
+        user = User.objects.get(username='bench0')
+        self.assertTrue(user.check_password(BENCH_PASSWORD))
+
+    def test_same_seed_generates_same_rows(self):
+        """Test that generation is deterministic for a seed, regardless of batch size"""
+        first, second, other = self.dataset(), self.dataset(batch_size=5), self.dataset(seed=8)
+        for dataset in (first, second, other):
+            dataset.user_ids = list(range(1, 21))
+            dataset.category_ids = [1, 2, 3]
+
+        def rows(dataset):
+            return [(post.title, post.content, post.author_id, post.status) for post, _ in dataset.build_posts()]
+
+        self.assertEqual(rows(first), rows(second))
+        self.assertNotEqual(rows(first), rows(other))
+
+    def test_command_refuses_to_seed_twice(self):
+        """Test that seed_bench does not mix its data with an existing dataset"""
+        out = io.StringIO()
+        call_command('seed_bench', users=5, posts=10, comments=20, stdout=out)
+        self.assertIn('posts: 10 created', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('seed_bench', users=5, stdout=io.StringIO())
+
+
+class LoadTestTests(TestCase):
+    """Tests for the HTTP load runner"""
+
+    def serve(self):
+        """Start a local HTTP server: chunked detail pages, failing comments"""
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if self.path.startswith('/api/v1/comments/'):
+                    self.reply(500, b'{}')
+                elif self.path.startswith('/api/v1/posts/bench-'):
+                    self.send_response(200)
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    self.wfile.write(b'2\r\n{}\r\n0\r\n\r\n')
+                else:
+                    self.reply(200, b'[]')
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                self.reply(200 if body['password'] == BENCH_PASSWORD else 400, b'{}')
+
+            def reply(self, status, body):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    def test_parse_mix(self):
+        """Test that the endpoint mix is parsed and validated"""
+        self.assertEqual(parse_mix('feed=3, login=1'), {'feed': 3.0, 'login': 1.0})
+        for value in ('unknown=1', 'feed=x', 'feed=-1', 'feed=0'):
+            with self.assertRaises(LoadTestError):
+                parse_mix(value)
+        self.assertEqual(set(parse_mix('reads')), {'recent', 'popular', 'featured', 'pinned', 'detail', 'comments'})
+
+    def test_parse_profiles(self):
+        """Test that gunicorn worker profiles are parsed and validated"""
+        self.assertEqual(parse_profiles('sync:3, uvicorn'), [('sync', 3), ('uvicorn', 1)])
+        for value in ('gevent:2', 'sync:x', 'sync:0'):
+            with self.assertRaises(LoadTestError):
+                parse_profiles(value)
+
+    def test_worker_benchmark_runs_each_profile_and_delay(self):
+        """Test that every profile is started for every delay and reported as a table"""
+        url = self.serve()
+        started = []
+
+        @contextmanager
+        def server(worker_class, workers, delay):
+            started.append((worker_class, workers, delay))
+            yield url
+
+        results = run_worker_benchmark(
+            [('sync', 3), ('uvicorn', 1)], [0.0, 5.0], mix={'feed': 1},
+            concurrency=2, duration=0.3, warmup=0, seed=1, server=server,
+        )
+        self.assertEqual(started, [('sync', 3, 0.0), ('uvicorn', 1, 0.0), ('sync', 3, 5.0), ('uvicorn', 1, 5.0)])
+        self.assertTrue(all(row['throughput_rps'] > 0 for row in results))
+        table = format_benchmark(results).splitlines()
+        self.assertEqual(table[0].split()[-4:], ['sync', 'x3', 'uvicorn', 'x1'])
+        self.assertEqual([line.split()[0] for line in table[1:]], ['0', '5'])
+        json.dumps(results)
+
+    def test_query_delay_sleeps_before_each_query(self):
+        """Test the QUERY_DELAY_MS wrapper used to simulate a remote database"""
+        install_query_delay(None, connection)
+        self.addCleanup(connection.execute_wrappers.remove, connection.execute_wrappers[-1])
+        with override_settings(QUERY_DELAY_MS=5), mock.patch('apps.main.query_budget.time.sleep') as sleep:
+            User.objects.count()
+        sleep.assert_called_once_with(0.005)
+
+    def test_summary_percentiles(self):
+        """Test nearest-rank percentiles and throughput of a summary"""
+        summary = summarize([i / 1000 for i in range(100, 0, -1)], errors=2, duration=10)
+        self.assertEqual(summary['requests'], 102)
+        self.assertEqual(summary['throughput_rps'], 10.0)
+        self.assertEqual((summary['p50_ms'], summary['p95_ms'], summary['p99_ms']), (50.0, 95.0, 99.0))
+
+    def test_runner_reports_each_endpoint(self):
+        """Test that the runner replays the mix and reports latency and errors per endpoint"""
+        targets = Targets(slugs=['bench-post-1'], discussed=[1], emails=['bench0@bench.example.com'])
+        mix = {'feed': 1, 'detail': 1, 'comments': 1, 'login': 1}
+        report = LoadRunner(self.serve(), targets, mix, concurrency=2, duration=0.5, warmup=0.1, seed=1).run()
+
+        self.assertEqual(set(report['endpoints']), set(mix))
+        for name in ('feed', 'detail', 'login'):
+            self.assertGreater(report['endpoints'][name]['requests'], 0)
+            self.assertEqual(report['endpoints'][name]['errors'], 0)
+            self.assertIsNotNone(report['endpoints'][name]['p99_ms'])
+        comments = report['endpoints']['comments']
+        self.assertEqual(comments['errors'], comments['requests'])
+        self.assertEqual(report['total']['errors'], comments['errors'])
+        json.dumps(report)
+
+    def test_missing_targets(self):
+        """Test that endpoints without targets in the database are rejected"""
+        with self.assertRaises(LoadTestError):
+            LoadRunner('http://127.0.0.1:1', Targets.sample(10), {'detail': 1}).run()
+
+
+class FeedDataMixin:
+    """
+    Helpers to build feeds with regular and pinned posts
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(
+            name='Premium',
+            price=Decimal('9.99'),
+            stripe_price_id='price_feed'
+        )
+        self.category = Category.objects.create(name='Technology')
+        self.other_category = Category.objects.create(name='Science')
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='testpass123'
+        )
+        self.now = timezone.now()
+
+    def create_post(self, title, days_ago, author=None, category=None, status='published'):
+        post = Post.objects.create(
+            title=title,
+            content=f'{title} content',
+            author=author or self.author,
+            category=category or self.category,
+            status=status
+        )
+        Post.objects.filter(pk=post.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return post
+
+    def pin(self, post, days_ago=0, active=True):
+        Subscription.objects.update_or_create(
+            user=post.author,
+            defaults={
+                'plan': self.plan,
+                'status': 'active',
+                'start_date': self.now - timedelta(days=30),
+                'end_date': self.now + timedelta(days=30),
+            }
+        )
+        pin = PinnedPost.objects.create(user=post.author, post=post)
+        PinnedPost.objects.filter(pk=pin.pk).update(pinned_at=self.now - timedelta(days=days_ago))
+        if not active:
+            Subscription.objects.filter(user=post.author).update(end_date=self.now - timedelta(days=1))
+        return pin
+
+    def create_pinning_author(self, name):
+        return User.objects.create_user(
+            username=name,
+            email=f'{name}@example.com',
+            password='testpass123'
+        )
+
+
+class LeaderboardTests(FeedDataMixin, TestCase):
+    """
+    Tests for popular/featured leaderboards fed by view flushes
+    """
+
+    def setUp(self):
+        super().setUp()
+        reset_view_buffer()
+        reset_leaderboard()
+        self.hour = 500000
+
+    def view(self, post, times, hour=None):
+        with mock.patch('apps.main.counters.current_hour', return_value=hour or self.hour):
+            for _ in range(times):
+                post.increment_views()
+        with mock.patch('apps.main.leaderboards.current_hour', return_value=hour or self.hour):
+            flush_pending_views()
+
+    def get(self, url, hour=None):
+        with mock.patch('apps.main.leaderboards.current_hour', return_value=hour or self.hour):
+            return self.client.get(url)
+
+    def test_all_time_seeded_from_database(self):
+        """Test the all-time board seeds once and then follows flushes"""
+        old = self.create_post('Old hit', days_ago=10)
+        new = self.create_post('New post', days_ago=1)
+        Post.objects.filter(pk=old.pk).update(views_count=50)
+
+        response = self.get('/api/v1/posts/popular/')
+        self.assertEqual([post['id'] for post in response.data], [old.id, new.id])
+
+        self.view(new, 60)
+        response = self.get('/api/v1/posts/popular/')
+        self.assertEqual([post['id'] for post in response.data], [new.id, old.id])
+
+    def test_popular_hydrates_only_winners(self):
+        """Test serving the leaderboard does not sort the posts table"""
+        for i in range(12):
+            self.view(self.create_post(f'Post {i}', days_ago=i), i + 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/api/v1/posts/popular/')
+
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(response.data[0]['title'], 'Post 11')
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('"views_count" DESC', sql)
+
+    def test_windows_expire_old_views(self):
+        """Test day and week windows only count views in their range"""
+        weekly = self.create_post('Weekly', days_ago=5)
+        daily = self.create_post('Daily', days_ago=1)
+        self.view(weekly, 10, hour=self.hour - 48)
+        self.view(daily, 3)
+
+        with mock.patch('apps.main.leaderboards.current_hour', return_value=self.hour):
+            self.assertEqual(top_post_ids('week', 5), [weekly.id, daily.id])
+            self.assertEqual(top_post_ids('day', 5), [daily.id])
+        with mock.patch('apps.main.leaderboards.current_hour', return_value=self.hour + 24 * 6):
+            self.assertEqual(top_post_ids('week', 5), [daily.id])
+
+    def test_windows_survive_restart(self):
+        """Test a cold start and the periodic rebuild refill day and week windows from hourly views"""
+        weekly = self.create_post('Weekly', days_ago=5)
+        daily = self.create_post('Daily', days_ago=1)
+        self.view(weekly, 10, hour=self.hour - 48)
+        self.view(daily, 3)
+        PostViewHour.objects.create(post=weekly, hour=hour_start(self.hour - 24 * 8), views=100)
+
+        for restart in (reset_leaderboard, rebuild_leaderboards):
+            restart()
+            with mock.patch('apps.main.leaderboards.current_hour', return_value=self.hour):
+                self.assertEqual(top_post_ids('week', 5), [weekly.id, daily.id])
+                self.assertEqual(top_post_ids('day', 5), [daily.id])
+                response = self.get('/api/v1/posts/featured/')
+            self.assertEqual(
+                [post['id'] for post in response.data['popular_posts']], [weekly.id, daily.id]
+            )
+
+    def test_local_board_is_rebuilt_after_ttl(self):
+        """Test a process-local board picks up views flushed by other processes"""
+        post = self.create_post('Elsewhere', days_ago=1)
+        with mock.patch('apps.main.leaderboards.current_hour', return_value=self.hour):
+            self.assertEqual(top_post_ids('day', 5), [])
+            PostViewHour.objects.create(post=post, hour=hour_start(self.hour), views=4)
+            self.assertEqual(top_post_ids('day', 5), [])
+            get_leaderboard()._seeded_at -= get_leaderboard().ttl
+            self.assertEqual(top_post_ids('day', 5), [post.id])
+
+    def test_drafts_and_deleted_posts_skipped(self):
+        """Test unpublished and deleted posts are dropped at hydration"""
+        first = self.create_post('First', days_ago=1)
+        second = self.create_post('Second', days_ago=1)
+        third = self.create_post('Third', days_ago=1)
+        for times, post in enumerate([third, second, first], start=1):
+            self.view(post, times)
+
+        Post.objects.filter(pk=first.pk).update(status='draft')
+        second.delete()
+
+        response = self.get('/api/v1/posts/featured/')
+        self.assertEqual([post['id'] for post in response.data['popular_posts']], [third.id])
+
+    def test_featured_excludes_pinned(self):
+        """Test featured popular posts skip pinned ones and count pins once"""
+        pinned = self.create_post('Pinned', days_ago=1, author=self.create_pinning_author('p1'))
+        self.pin(pinned)
+        regular = self.create_post('Regular', days_ago=1)
+        self.view(pinned, 5)
+        self.view(regular, 2)
+
+        response = self.get('/api/v1/posts/featured/')
+
+        self.assertEqual([post['id'] for post in response.data['pinned_posts']], [pinned.id])
+        self.assertEqual([post['id'] for post in response.data['popular_posts']], [regular.id])
+        self.assertEqual(response.data['total_pinned'], 1)
+
+
+class ResponseCacheTests(FeedDataMixin, TestCase):
+    """
+    Tests for the tag-invalidated response cache on public endpoints
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        reset_leaderboard()
+        self.post = self.create_post('Cached', days_ago=1)
+        self.category_url = f'/api/v1/posts/categories/{self.category.slug}/posts/'
+
+    def test_second_request_is_served_from_cache(self):
+        """Test a repeated anonymous request runs no queries"""
+        first = self.client.get('/api/v1/posts/recent/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/v1/posts/recent/')
+
+        # Only the ATOMIC_REQUESTS savepoints are left
+        self.assertFalse([q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']])
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_params_are_part_of_key(self):
+        """Test different query strings are cached separately"""
+        self.client.get(f'{self.category_url}?page_size=1')
+        response = self.client.get(f'{self.category_url}?page_size=2')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_post_change_invalidates_lists(self):
+        """Test editing a listed post invalidates the cached lists"""
+        self.client.get('/api/v1/posts/recent/')
+        self.client.get(self.category_url)
+
+        self.post.title = 'Renamed'
+        self.post.save()
+
+        response = self.client.get('/api/v1/posts/recent/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['title'], 'Renamed')
+        self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'MISS')
+
+    def test_change_during_view_is_not_cached(self):
+        """Test a response built while its tags changed is not stored"""
+        def edit_during_view(*args, **kwargs):
+            self.post.title = 'Edited meanwhile'
+            self.post.save()
+            return CategorySerializer(*args, **kwargs)
+
+        with mock.patch('apps.main.views.CategorySerializer', side_effect=edit_during_view):
+            self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'MISS')
+
+        self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'HIT')
+
+    def test_response_cached_before_commit_is_invalidated(self):
+        """Test a response stored between a write and its commit is not served after it"""
+        self.client.get(self.category_url)
+
+        # Related posts are not under test here; enqueueing would wait for the broker
+        with mock.patch('apps.main.related._enqueue_related_update'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed'
+            self.post.save()
+            # A reader in another transaction would still see the old row here
+            self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'HIT')
+
+        self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'MISS')
+
+    def test_new_post_invalidates_its_category_only(self):
+        """Test creating a post invalidates its category but not others"""
+        other_url = f'/api/v1/posts/categories/{self.other_category.slug}/posts/'
+        self.client.get(self.category_url)
+        self.client.get(other_url)
+
+        self.create_post('Fresh', days_ago=0)
+
+        self.assertEqual(self.client.get(self.category_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'HIT')
+
+    def test_pins_and_plans_invalidate(self):
+        """Test pinning and plan changes invalidate their endpoints"""
+        self.client.get('/api/v1/posts/pinned/')
+        self.client.get('/api/v1/subscribe/plans/')
+
+        pinned = self.create_post('Pinned', days_ago=2, author=self.create_pinning_author('p1'))
+        self.pin(pinned)
+        self.plan.price = Decimal('19.99')
+        self.plan.save()
+
+        response = self.client.get('/api/v1/posts/pinned/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(self.client.get('/api/v1/subscribe/plans/')['X-Cache'], 'MISS')
+
+    def test_authenticated_requests_bypass_cache(self):
+        """Test responses for logged-in users are neither stored nor served"""
+        self.client.get('/api/v1/posts/recent/')
+        self.client.force_authenticate(self.author)
+
+        response = self.client.get('/api/v1/posts/recent/')
+        self.assertNotIn('X-Cache', response)
+
+    def test_hit_and_miss_counters(self):
+        """Test hit/miss counters are exposed to admins"""
+        self.client.get('/api/v1/posts/recent/')
+        self.client.get('/api/v1/posts/recent/')
+        self.client.get('/api/v1/posts/recent/')
+
+        self.assertEqual(self.client.get('/api/v1/posts/cache-stats/').status_code, 401)
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/api/v1/posts/cache-stats/').data
+
+        self.assertEqual(stats['recent_posts'], {'hits': 2, 'misses': 1, 'hit_ratio': 0.6667})
+
+
+class ConditionalGetTests(FeedDataMixin, TestCase):
+    """
+    Tests for ETag / Last-Modified support on post endpoints
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        reset_view_buffer()
+        self.post = self.create_post('Conditional', days_ago=1)
+        self.detail_url = f'/api/v1/posts/{self.post.slug}/'
+
+    def test_detail_returns_304_and_counts_view(self):
+        """Test a matching If-None-Match returns 304 and still records the view"""
+        first = self.client.get(self.detail_url)
+        etag = first['ETag']
+        self.assertIn('Last-Modified', first)
+
+        with mock.patch('apps.main.views.PostDetailSerializer') as serializer:
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        serializer.assert_not_called()
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.post.get_views_count(), 2)
+
+    def test_validators_issued_before_commit_do_not_match_after_it(self):
+        """Test an ETag fetched between a write and its commit is not revalidated after it"""
+        with mock.patch('apps.main.related._enqueue_related_update'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Edited'
+            self.post.save()
+            # A reader in another transaction would get the old body with these validators
+            first = self.client.get(self.detail_url)
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_detail_etag_changes_on_write(self):
+        """Test editing the post or its comments changes the ETag"""
+        etag = self.client.get(self.detail_url)['ETag']
+
+        self.post.title = 'Edited'
+        self.post.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Comment.objects.create(post=self.post, author=self.author, content='New')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['comments_count'], 1)
+
+    def test_detail_etag_depends_on_user(self):
+        """Test per-user fields give each user their own ETag"""
+        anonymous = self.client.get(self.detail_url)['ETag']
+        self.client.force_authenticate(self.author)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_304_until_a_post_changes(self):
+        """Test the feed is revalidated with the feed version"""
+        first = self.client.get('/api/v1/posts/')
+
+        response = self.client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            '/api/v1/posts/?page_size=1', HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.create_post('Another', days_ago=0)
+        response = self.client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        """Test Last-Modified is honoured when no ETag is sent"""
+        first = self.client.get(self.detail_url)
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class FeedQueryTests(FeedDataMixin, TestCase):
+    """
+    Tests for the two-part feed engine (PostQuerySet.feed)
+    """
+
+    def test_pinned_posts_come_first_in_pin_order(self):
+        """Test active pins lead the feed, then posts by recency"""
+        old = self.create_post('Old', days_ago=10)
+        new = self.create_post('New', days_ago=1)
+        pinned_late = self.create_post('Pinned late', days_ago=5, author=self.create_pinning_author('a1'))
+        pinned_early = self.create_post('Pinned early', days_ago=3, author=self.create_pinning_author('a2'))
+        self.pin(pinned_late, days_ago=1)
+        self.pin(pinned_early, days_ago=2)
+
+        feed = list(Post.objects.published().feed())
+
+        self.assertEqual(feed, [pinned_early, pinned_late, new, old])
+
+    def test_expired_pin_is_a_regular_post(self):
+        """Test pins of authors without an active subscription are not boosted"""
+        new = self.create_post('New', days_ago=1)
+        expired = self.create_post('Expired pin', days_ago=5, author=self.create_pinning_author('a1'))
+        self.pin(expired, active=False)
+
+        feed = list(Post.objects.published().feed())
+
+        self.assertEqual(feed, [new, expired])
+        self.assertIsNone(feed[1].feed_pinned_at)
+
+    def test_category_and_author_feeds(self):
+        """Test category and author feeds share the same ordering"""
+        other_author = self.create_pinning_author('a1')
+        in_category = self.create_post('In category', days_ago=2)
+        pinned = self.create_post('Pinned', days_ago=4, author=other_author)
+        self.pin(pinned)
+        self.create_post('Other category', days_ago=1, category=self.other_category)
+
+        self.assertEqual(
+            list(Post.get_posts_for_feed(category=self.category)),
+            [pinned, in_category]
+        )
+        self.assertEqual(list(Post.get_posts_for_feed(author=other_author)), [pinned])
+
+    def test_feed_parts_load_related_data(self):
+        """Test pins and regular posts come with author, category and subscription, one query each"""
+        pinned = self.create_post('Pinned', days_ago=1, author=self.create_pinning_author('a1'))
+        self.pin(pinned)
+        self.create_post('Regular', days_ago=2)
+
+        with self.assertNumQueries(2):
+            for post in Post.objects.published().feed():
+                post.get_pinned_info()
+                str(post.author)
+                str(post.category)
+
+    def list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_endpoints_query_count_does_not_grow(self):
+        """Test feed endpoints run a constant number of queries per page"""
+        urls = ['/api/v1/posts/', f'/api/v1/posts/categories/{self.category.slug}/posts/']
+        self.pin(self.create_post('Pinned', days_ago=1, author=self.create_pinning_author('a0')))
+        self.create_post('Regular 0', days_ago=2)
+        baseline = [self.list_queries(url) for url in urls]
+
+        for i in range(1, 10):
+            self.pin(self.create_post(f'Pinned {i}', days_ago=i, author=self.create_pinning_author(f'a{i}')))
+            self.create_post(f'Regular {i}', days_ago=i + 2)
+
+        self.assertEqual([self.list_queries(url) for url in urls], baseline)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN format is SQLite specific')
+    def test_feed_plan_uses_indexes(self):
+        """Test every table in the feed queries is reached through an index"""
+        feeds = [
+            Post.objects.published().feed(),
+            Post.objects.published().feed(category=self.category),
+            Post.objects.published().feed(author=self.author),
+        ]
+        for feed in feeds:
+            for queryset in (feed.pinned, feed.regular):
+                plan = queryset[:20].explain()
+                scans = [line for line in plan.splitlines() if ' SCAN ' in f' {line.split(maxsplit=3)[-1]}']
+                self.assertEqual(scans, [], plan)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN format is SQLite specific')
+    def test_regular_posts_are_read_in_index_order(self):
+        """Test a feed page does not sort the matching posts in a temp B-tree"""
+        feeds = [
+            Post.objects.published().feed(),
+            Post.objects.published().for_list().feed(category=self.category),
+            Post.objects.published().feed(author=self.author),
+        ]
+        for feed in feeds:
+            plan = feed.regular[:20].explain()
+            self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_active_pin_is_not_repeated_among_regular_posts(self):
+        """Test the regular part excludes active pins but keeps expired ones"""
+        active = self.create_post('Active pin', days_ago=1, author=self.create_pinning_author('a1'))
+        expired = self.create_post('Expired pin', days_ago=2, author=self.create_pinning_author('a2'))
+        self.pin(active)
+        self.pin(expired, active=False)
+        feed = Post.objects.published().feed()
+
+        self.assertEqual(list(feed.pinned), [active])
+        self.assertEqual(list(feed.regular), [expired])
+        self.assertEqual(feed.count(), 2)
+
+
+class KeysetPaginationTests(FeedDataMixin, TestCase):
+    """
+    Tests for cursor pagination keyed on (created_at, id)
+    """
+
+    def walk(self, url, direction='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([post['id'] for post in response.data['results']])
+            url = response.data[direction]
+        return pages
+
+    def test_pages_follow_feed_order_without_gaps(self):
+        """Test walking cursors returns the whole feed once, pinned posts first"""
+        same_time = [self.create_post(f'Tie {i}', days_ago=3) for i in range(3)]
+        for i in range(4):
+            self.create_post(f'Post {i}', days_ago=i)
+        pinned = self.create_post('Pinned', days_ago=9, author=self.create_pinning_author('a1'))
+        self.pin(pinned)
+
+        pages = self.walk('/api/v1/posts/?page_size=2')
+
+        expected = [post.id for post in Post.objects.published().feed()]
+        self.assertEqual([post_id for page in pages for post_id in page], expected)
+        self.assertEqual(pages[0][0], pinned.id)
+        self.assertTrue(all(len(page) == 2 for page in pages[:-1]))
+        self.assertTrue(set(post.id for post in same_time) <= set(expected))
+
+    def test_previous_links_walk_back(self):
+        """Test previous cursors return the same pages in reverse"""
+        for i in range(5):
+            self.create_post(f'Post {i}', days_ago=i)
+
+        forward = self.walk('/api/v1/posts/?page_size=2')
+        last_page = self.client.get('/api/v1/posts/?page_size=2')
+        while last_page.data['next']:
+            last_page = self.client.get(last_page.data['next'])
+        backward = self.walk(last_page.data['previous'], direction='previous')
+
+        self.assertEqual(backward, list(reversed(forward[:-1])))
+
+    def test_pages_cross_from_pins_to_regular_posts(self):
+        """Test cursors walk both ways across a page shared by pins and regular posts"""
+        pinned = []
+        for i in range(3):
+            post = self.create_post(f'Pinned {i}', days_ago=10 + i, author=self.create_pinning_author(f'a{i}'))
+            self.pin(post, days_ago=3 - i)
+            pinned.append(post)
+        regular = [self.create_post(f'Post {i}', days_ago=i) for i in range(4)]
+
+        forward = self.walk('/api/v1/posts/?page_size=2')
+        last_page = self.client.get('/api/v1/posts/?page_size=2')
+        while last_page.data['next']:
+            last_page = self.client.get(last_page.data['next'])
+        backward = self.walk(last_page.data['previous'], direction='previous')
+
+        self.assertEqual(
+            [post_id for page in forward for post_id in page],
+            [post.id for post in pinned + regular]
+        )
+        self.assertEqual(forward[1], [pinned[2].id, regular[0].id])
+        self.assertEqual(backward, list(reversed(forward[:-1])))
+
+    def test_count_only_on_request(self):
+        """Test the total count is skipped unless ?count=true is passed"""
+        self.create_post('Post', days_ago=1)
+
+        response = self.client.get('/api/v1/posts/')
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get('/api/v1/posts/?count=true')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_cursor_is_opaque(self):
+        """Test cursors are opaque and invalid ones return 404"""
+        for i in range(3):
+            self.create_post(f'Post {i}', days_ago=i)
+
+        next_url = self.client.get('/api/v1/posts/?page_size=1').data['next']
+        self.assertNotIn('created_at', next_url)
+
+        response = self.client.get('/api/v1/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_non_keyset_ordering_falls_back_to_pages(self):
+        """Test orderings other than created_at use page-number pagination"""
+        self.create_post('B post', days_ago=1)
+        self.create_post('A post', days_ago=2)
+
+        response = self.client.get('/api/v1/posts/?ordering=title')
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'][0]['title'], 'A post')
+
+    def test_deep_page_uses_no_offset(self):
+        """Test following a cursor filters by position instead of OFFSET"""
+        for i in range(3):
+            self.create_post(f'Post {i}', days_ago=i)
+        next_url = self.client.get('/api/v1/posts/?page_size=1').data['next']
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(next_url)
+
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+
+class CategoryPostsEndpointTests(FeedDataMixin, TestCase):
+    """
+    Tests for paginated and streamed posts-by-category responses
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/v1/posts/categories/{self.category.slug}/posts/'
+        for i in range(5):
+            self.create_post(f'Post {i}', days_ago=i + 1)
+        self.create_post('Elsewhere', days_ago=1, category=self.other_category)
+        self.pinned = self.create_post('Pinned', days_ago=30, author=self.create_pinning_author('p1'))
+        self.pin(self.pinned)
+
+    def test_paginated_pinned_first(self):
+        """Test pages follow the feed and pinned posts open the first page"""
+        response = self.client.get(f'{self.url}?page_size=2&count=true')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category']['slug'], self.category.slug)
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual(response.data['posts'][0]['id'], self.pinned.id)
+        self.assertEqual(response.data['pinned_posts_count'], 1)
+
+        ids = []
+        url = f'{self.url}?page_size=2'
+        while url:
+            page = self.client.get(url)
+            ids.extend(post['id'] for post in page.data['posts'])
+            url = page.data['next']
+        expected = [post.id for post in Post.objects.published().feed(category=self.category)]
+        self.assertEqual(ids, expected)
+
+    def test_stream_returns_whole_category(self):
+        """Test streaming mode encodes every post from an iterator"""
+        with mock.patch('apps.main.views.STREAM_CHUNK_SIZE', 2):
+            response = self.client.get(f'{self.url}?stream=true')
+
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['category']['slug'], self.category.slug)
+        self.assertEqual(len(data['posts']), 6)
+        self.assertEqual(data['posts'][0]['id'], self.pinned.id)
+        self.assertEqual(data['pinned_posts_count'], 1)
+
+    def test_stream_uses_iterator(self):
+        """Test streaming reads both feed parts through QuerySet.iterator"""
+        with mock.patch('django.db.models.query.QuerySet.iterator', autospec=True,
+                        side_effect=lambda qs, chunk_size=None: iter(list(qs))) as iterator:
+            response = self.client.get(f'{self.url}?stream=true')
+            b''.join(response.streaming_content)
+
+        self.assertEqual([call.kwargs['chunk_size'] for call in iterator.call_args_list], [200, 200])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 fallback is SQLite only')
+class PostSearchTests(FeedDataMixin, TestCase):
+    """
+    Tests for full-text post search (?q=) on the FTS5 fallback
+    """
+
+    def create_article(self, title, content, days_ago=1):
+        post = self.create_post(title, days_ago=days_ago)
+        post.content = content
+        post.save()
+        return post
+
+    def test_title_matches_rank_above_content(self):
+        """Test posts matching in the title rank above content-only matches"""
+        body = self.create_article('Weekly notes', 'Some thoughts about django releases')
+        title = self.create_article('Django tips', 'Short list of tips')
+        self.create_article('Cooking', 'Nothing relevant here')
+
+        response = self.client.get('/api/v1/posts/?q=django')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [post['id'] for post in response.data['results']]
+        self.assertEqual(ids, [title.id, body.id])
+        self.assertGreater(response.data['results'][0]['rank'], response.data['results'][1]['rank'])
+
+    def test_results_include_highlight(self):
+        """Test results carry a snippet with the matched term highlighted"""
+        self.create_article('Release', 'The new search backend ships today')
+
+        response = self.client.get('/api/v1/posts/?q=backend')
+
+        self.assertIn('<mark>backend</mark>', response.data['results'][0]['highlight'])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test the FTS index is maintained by triggers"""
+        post = self.create_article('Old title', 'Old content')
+        post.title = 'Brand new title'
+        post.content = 'Rewritten content'
+        post.save()
+
+        self.assertEqual(self.client.get('/api/v1/posts/?q=old').data['count'], 0)
+        self.assertEqual(self.client.get('/api/v1/posts/?q=brand').data['count'], 1)
+
+        post.delete()
+        self.assertEqual(self.client.get('/api/v1/posts/?q=brand').data['count'], 0)
+
+    def test_search_respects_visibility_and_filters(self):
+        """Test drafts stay hidden and regular filters still apply"""
+        draft = self.create_article('Python draft', 'python')
+        Post.objects.filter(pk=draft.pk).update(status='draft')
+        other = self.create_post('Python science', days_ago=1, category=self.other_category)
+
+        response = self.client.get(f'/api/v1/posts/?q=python&category={self.other_category.id}')
+
+        self.assertEqual([post['id'] for post in response.data['results']], [other.id])
+
+    def test_special_characters_are_escaped(self):
+        """Test FTS operators in user input do not raise errors"""
+        self.create_article('Quotes', 'He said "hello" AND left')
+
+        response = self.client.get('/api/v1/posts/?q=hello" AND (*')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_explicit_ordering_overrides_rank(self):
+        """Test ?ordering= wins over relevance ordering"""
+        self.create_article('B django', 'django')
+        self.create_article('A notes', 'django')
+
+        response = self.client.get('/api/v1/posts/?q=django&ordering=title')
+
+        self.assertEqual(
+            [post['title'] for post in response.data['results']],
+            ['A notes', 'B django']
+        )
+
+
+class SparseFieldsetTests(FeedDataMixin, TestCase):
+    """
+    Tests for ?fields= / ?exclude= on post and comment lists
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.pinned = self.create_post('Pinned', 3)
+        self.pin(self.pinned)
+        for day in range(3):
+            post = self.create_post(f'Post {day}', day)
+        Comment.objects.create(post=post, author=self.author, content='First')
+
+    def post_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+
+    def test_fields_limit_payload_and_columns(self):
+        """Test that only requested fields are serialized and selected"""
+        response, queries = self.post_queries('/api/v1/posts/?fields=id,title,slug,image,created_at')
+
+        results = response.data['results']
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]['title'], 'Pinned')
+        for post in results:
+            self.assertEqual(set(post), {'id', 'title', 'slug', 'image', 'created_at'})
+        self.assertNotIn('pinned_posts_count', response.data)
+
+        post_select = [sql for sql in queries if sql.startswith('SELECT') and 'FROM "posts"' in sql][-1]
+        select_list = post_select.split(' FROM ')[0]
+        self.assertIn('"posts"."title"', select_list)
+        for column in ('"posts"."excerpt"', '"posts"."views_count"', '"users".', '"categories".'):
+            self.assertNotIn(column, select_list)
+
+    def test_fewer_fields_use_fewer_queries(self):
+        """Test that skipping relation fields does not add per-row queries"""
+        _, full = self.post_queries('/api/v1/posts/')
+        response, sparse = self.post_queries('/api/v1/posts/?fields=id,title,category,author')
+
+        self.assertLessEqual(len(sparse), len(full))
+        self.assertEqual(response.data['results'][0]['category'], 'Technology')
+        self.assertEqual(response.data['results'][0]['author'], 'author@example.com')
+
+    def test_exclude_and_pinned_info(self):
+        """Test ?exclude= and relation fields kept after narrowing"""
+        response, _ = self.post_queries('/api/v1/posts/?exclude=content,image_variants,unknown')
+        first = response.data['results'][0]
+        self.assertNotIn('content', first)
+        self.assertNotIn('image_variants', first)
+        self.assertTrue(first['pinned_info']['is_pinned'])
+        self.assertEqual(response.data['pinned_posts_count'], 1)
+
+        response, _ = self.post_queries('/api/v1/posts/?fields=pinned_info')
+        self.assertEqual(
+            response.data['results'][0]['pinned_info']['pinned_by']['username'], 'author'
+        )
+
+    def test_comment_fields(self):
+        """Test sparse fieldsets on the comment list"""
+        response, queries = self.post_queries('/api/v1/comments/?fields=id,content,is_reply')
+
+        self.assertEqual(response.data['results'], [
+            {'id': response.data['results'][0]['id'], 'content': 'First', 'is_reply': False}
+        ])
+        self.assertFalse(any('"users"' in sql for sql in queries))
+
+
+def run_fan_out_now(args, **options):
+    """Run the fan-out task synchronously instead of sending it to the broker"""
+    return fan_out_post(*args)
+
+
+class SharedTimelineStore(LocalTimelineStore):
+    """In-memory store standing in for Redis: web and worker code see the same instance"""
+    shared = True
+
+
+@override_settings(TIMELINE_CELEBRITY_THRESHOLD=4, TIMELINE_FANOUT_BATCH_SIZE=2)
+class TimelineTests(FeedDataMixin, TestCase):
+    """
+    Tests for follows and precomputed following timelines
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        reset_timeline_store()
+        self.addCleanup(reset_timeline_store)
+        self.use_store(SharedTimelineStore(800))
+        related = mock.patch('apps.main.related._enqueue_related_update')
+        related.start()
+        self.addCleanup(related.stop)
+        self.readers = [self.create_pinning_author(f'reader{i}') for i in range(3)]
+        for reader in self.readers:
+            Follow.objects.create(follower=reader, author=self.author)
+
+    def publish(self, title, author=None, status='published'):
+        with mock.patch.object(fan_out_post, 'apply_async', side_effect=run_fan_out_now) as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(
+                    title=title, content='Content', author=author or self.author,
+                    category=self.category, status=status
+                )
+        return post, enqueue
+
+    def use_store(self, store):
+        """Make store the timeline store of the current "process" """
+        patcher = mock.patch('apps.main.timelines._store', store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def timeline_titles(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/v1/posts/timeline/', params)
+        self.assertEqual(response.status_code, 200)
+        return [post['title'] for post in response.data['results']], response.data['next']
+
+    def test_follow_endpoint_maintains_counter(self):
+        """Test following, unfollowing and self-follow"""
+        fan = self.create_pinning_author('fan')
+        self.client.force_authenticate(fan)
+        url = f'/api/v1/auth/follow/{self.author.pk}/'
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['followers_count'], 4)
+        self.assertEqual(self.client.post(url).status_code, 200)
+
+        response = self.client.delete(url)
+        self.assertEqual((response.data['following'], response.data['followers_count']), (False, 3))
+        self.assertEqual(self.client.post(f'/api/v1/auth/follow/{fan.pk}/').status_code, 400)
+
+    def test_fan_out_in_batches(self):
+        """Test that publishing pushes the post to every follower in batches"""
+        self.create_post('Before', 1)
+        for reader in self.readers:
+            self.assertEqual(self.timeline_titles(reader)[0], ['Before'])
+
+        post, enqueue = self.publish('Fresh')
+        # Three followers with batch size 2: initial task plus one follow-up batch
+        self.assertEqual(enqueue.call_count, 2)
+        self.assertEqual(enqueue.call_args_list[1].args[0], (post.pk, self.readers[1].pk))
+        for reader in self.readers:
+            self.assertEqual(self.timeline_titles(reader)[0], ['Fresh', 'Before'])
+
+        stranger = self.create_pinning_author('stranger')
+        self.assertEqual(self.timeline_titles(stranger)[0], [])
+
+    def test_drafts_and_unfollow(self):
+        """Test that drafts are fanned out on publish and unfollow removes posts"""
+        reader = self.readers[0]
+        self.timeline_titles(reader)
+        draft, enqueue = self.publish('Draft', status='draft')
+        enqueue.assert_not_called()
+        self.assertEqual(self.timeline_titles(reader)[0], [])
+
+        draft.status = 'published'
+        with mock.patch.object(fan_out_post, 'apply_async', side_effect=run_fan_out_now):
+            with self.captureOnCommitCallbacks(execute=True):
+                draft.save()
+        self.assertEqual(self.timeline_titles(reader)[0], ['Draft'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.get(follower=reader, author=self.author).delete()
+        self.assertEqual(self.timeline_titles(reader)[0], [])
+
+    def test_local_stores_in_separate_processes(self):
+        """Test fan-out and reads in separate local stores: readers still see new posts"""
+        reader = self.readers[0]
+        web, other_web, worker = (LocalTimelineStore(800, ttl=60) for _ in range(3))
+        self.create_post('Before', 1)
+        for store in (web, other_web):
+            self.use_store(store)
+            self.assertEqual(self.timeline_titles(reader)[0], ['Before'])
+
+        # Published in the "web" process: fan-out runs there, not in the worker
+        self.use_store(web)
+        post, enqueue = self.publish('Fresh')
+        enqueue.assert_not_called()
+        self.use_store(worker)
+        self.assertEqual(fan_out_post(post.pk)['skipped'], True)
+        self.assertFalse(worker.is_seeded(reader.pk))
+
+        self.use_store(web)
+        self.assertEqual(self.timeline_titles(reader)[0], ['Fresh', 'Before'])
+
+        # Another process rebuilds its copy from the database once the TTL passes
+        self.use_store(other_web)
+        self.assertEqual(self.timeline_titles(reader)[0], ['Before'])
+        other_web._seeded_at[reader.pk] -= 60
+        self.assertEqual(self.timeline_titles(reader)[0], ['Fresh', 'Before'])
+
+    def test_celebrity_posts_are_merged_on_read(self):
+        """Test fan-out on read for authors above the follower threshold"""
+        star = self.create_pinning_author('star')
+        for reader in self.readers + [self.create_pinning_author('extra')]:
+            Follow.objects.create(follower=reader, author=star)
+        reader = self.readers[0]
+        self.timeline_titles(reader)
+
+        self.create_post('Old regular', 3)
+        own = self.create_post('Regular', 1)
+        get_timeline_store().add([reader.pk], [(own.pk, post_score(own.created_at))])
+        star_post = self.create_post('Star', 2, author=star)
+        self.assertIsNone(fan_out_batch(star_post.pk))
+
+        titles, _ = self.timeline_titles(reader)
+        self.assertEqual(titles, ['Regular', 'Star'])
+
+    def test_pagination_and_single_hydration_query(self):
+        """Test cursor pagination with equal timestamps and one query for posts"""
+        reader = self.readers[0]
+        posts = [self.create_post(f'Post {i}', 1) for i in range(5)]
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(created_at=self.now)
+
+        # The first read builds the timeline from the database
+        self.timeline_titles(reader)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/timeline/', {'page_size': 2})
+        post_queries = [q for q in queries.captured_queries if 'FROM "posts"' in q['sql']]
+        self.assertEqual(len(post_queries), 1)
+
+        titles = [post['title'] for post in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            titles += [post['title'] for post in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(titles, [f'Post {i}' for i in reversed(range(5))])
+
+        response = self.client.get('/api/v1/posts/timeline/', {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 404)
+
+
+class AuthorStatsTests(FeedDataMixin, TestCase):
+    """
+    Tests for precomputed per-author daily statistics
+    """
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        Subscription.objects.create(
+            user=self.author, plan=self.plan, status='active',
+            start_date=self.now - timedelta(days=1), end_date=self.now + timedelta(days=30),
+        )
+        self.popular = self.create_post('Popular', 0)
+        self.older = self.create_post('Older', 1)
+        Post.objects.filter(pk=self.popular.pk).update(views_count=50)
+        self.fans = [self.create_pinning_author(f'fan{i}') for i in range(2)]
+        for fan in self.fans:
+            Follow.objects.create(follower=fan, author=self.author)
+        Comment.objects.create(post=self.popular, author=self.fans[0], content='Nice')
+        PostViewDay.objects.create(post=self.popular, author=self.author, day=self.today, views=7)
+        PostViewDay.objects.create(post=self.older, author=self.author, day=self.yesterday, views=4)
+
+    def stats_row(self, day):
+        return AuthorDailyStats.objects.filter(author=self.author, day=day).values(
+            'views', 'comments', 'posts_published', 'new_followers', 'followers'
+        ).get()
+
+    def test_update_is_idempotent_and_snapshots_followers_today(self):
+        """Test daily rows are recomputed from that day's data"""
+        update_author_stats()
+        update_author_stats()
+        self.assertEqual(self.stats_row(self.today), {
+            'views': 7, 'comments': 1, 'posts_published': 1, 'new_followers': 2, 'followers': 2,
+        })
+        self.assertEqual(self.stats_row(self.yesterday), {
+            'views': 4, 'comments': 0, 'posts_published': 1, 'new_followers': 0, 'followers': None,
+        })
+        self.assertEqual(AuthorDailyStats.objects.filter(author=self.fans[0]).count(), 0)
+
+    def test_losing_all_followers_and_activity_resets_rows(self):
+        """Test a zero follower snapshot is kept and stale day rows are zeroed"""
+        update_author_stats()
+        AuthorDailyStats.objects.create(author=self.fans[0], day=self.yesterday, comments=3)
+        AuthorDailyStats.objects.filter(author=self.author, day=self.yesterday).update(followers=2)
+
+        Follow.objects.filter(author=self.author).delete()
+        Comment.objects.filter(post=self.popular).set_active(False)
+        update_author_stats()
+
+        self.assertEqual(self.stats_row(self.today), {
+            'views': 7, 'comments': 0, 'posts_published': 1, 'new_followers': 0, 'followers': 0,
+        })
+        self.assertEqual(AuthorDailyStats.objects.get(author=self.fans[0], day=self.yesterday).comments, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(build_author_stats(self.author, 7)['series'][-1]['followers'], 0)
+
+    def test_stats_endpoint_is_cached_per_author(self):
+        """Test the endpoint reads aggregates once and then serves from cache"""
+        update_author_stats()
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/my-stats/', {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals']['views'], 11)
+        self.assertEqual(response.data['totals']['new_followers'], 2)
+        self.assertEqual(len(response.data['series']), 30)
+        self.assertEqual(response.data['series'][-1]['followers'], 2)
+        self.assertEqual([post['title'] for post in response.data['top_posts']], ['Popular', 'Older'])
+        sql = [q['sql'] for q in queries.captured_queries]
+        self.assertEqual(len([q for q in sql if 'author_daily_stats' in q]), 1)
+        self.assertFalse([q for q in sql if 'FROM "post_view' in q or 'FROM "comments"' in q])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/posts/my-stats/', {'days': 30})
+        self.assertFalse([q for q in queries.captured_queries if 'author_daily_stats' in q['sql']])
+
+    def test_stats_require_subscription(self):
+        """Test statistics are a subscriber feature"""
+        self.client.force_authenticate(self.fans[0])
+        self.assertEqual(self.client.get('/api/v1/posts/my-stats/').status_code, 403)
+
+    def test_update_command_backfills(self):
+        """Test the update_author_stats command with --since"""
+        out = io.StringIO()
+        call_command('update_author_stats', '--since', str(self.today - timedelta(days=3)), stdout=out)
+        self.assertIn('daily rows written', out.getvalue())
+        self.assertEqual(self.stats_row(self.yesterday)['views'], 4)
+        with self.assertRaises(CommandError):
+            call_command('update_author_stats', '--since', 'yesterday')
+
+
+class AsyncReadPathTests(FeedDataMixin, TestCase):
+    """
+    Tests for the async read endpoints served by AsyncAPIView
+    """
+    client_class = APIClient
+
+    def test_read_endpoints_are_async(self):
+        """Test that the hot read endpoints resolve to non-atomic coroutine views"""
+        post = self.create_post('Async post', days_ago=0)
+        for url in [
+            '/api/v1/posts/recent/', '/api/v1/posts/popular/', '/api/v1/posts/featured/',
+            f'/api/v1/posts/{post.slug}/', f'/api/v1/comments/post/{post.id}/',
+            '/api/v1/subscribe/pinned-posts/',
+        ]:
+            view = resolve(url).func
+            self.assertTrue(iscoroutinefunction(view), url)
+            self.assertIn('default', view._non_atomic_requests, url)
+
+    def test_detail_writes_run_in_transaction(self):
+        """Test that sync write handlers keep the ATOMIC_REQUESTS behaviour"""
+        post = self.create_post('Editable', days_ago=0)
+        baseline = len(connection.atomic_blocks)
+        depths = []
+        original = PostDetailView.partial_update
+
+        def partial_update(view, request, *args, **kwargs):
+            depths.append(len(connection.atomic_blocks))
+            return original(view, request, *args, **kwargs)
+
+        self.client.force_authenticate(self.author)
+        with mock.patch.object(PostDetailView, 'partial_update', partial_update):
+            response = self.client.patch(f'/api/v1/posts/{post.slug}/', {'title': 'Edited'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(depths, [baseline + 1])
+        post.refresh_from_db()
+        self.assertEqual(post.title, 'Edited')
+
+    def test_run_concurrently_uses_separate_threads(self):
+        """Test that independent parts run at the same time outside a transaction"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def part():
+            # Fails with BrokenBarrierError if the parts run one after another
+            barrier.wait()
+            return threading.get_ident()
+
+        with mock.patch('apps.main.asyncapi._in_transaction', return_value=False):
+            threads = async_to_sync(run_concurrently)(part, part, part)
+        self.assertEqual(len(set(threads)), 3)
+
+    def test_run_concurrently_inside_transaction_sees_its_data(self):
+        """Test that inside a transaction the parts use the transaction's connection"""
+        self.create_post('Uncommitted', days_ago=0)
+        counts = async_to_sync(run_concurrently)(Post.objects.count, Category.objects.count)
+        self.assertEqual(counts, [1, 2])
+
+
+# Hundreds of users per test: hashing each password with PBKDF2 dominated the run time
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryCountRegressionTests(FeedDataMixin, TestCase):
+    """
+    Query counts of list and detail endpoints must not grow with the number of rows.
+    Each endpoint is measured with N=1, 10 and 100 rows; the counts are printed
+    as a table at the end of the run so they can be diffed between commits.
+    """
+
+    sizes = (1, 10, 100)
+    query_counts = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.query_counts:
+            width = max(len(name) for name in cls.query_counts)
+            lines = ['', 'Query counts by rows (N)', f'{"endpoint":<{width}}' + ''.join(
+                f'{f"N={size}":>8}' for size in cls.sizes
+            )]
+            for name in sorted(cls.query_counts):
+                lines.append(f'{name:<{width}}' + ''.join(f'{count:>8}' for count in cls.query_counts[name]))
+            sys.stderr.write('\n'.join(lines) + '\n')
+
+    def setUp(self):
+        super().setUp()
+        self.reader = self.create_pinning_author('reader')
+        patcher = override_settings(RESPONSE_CACHE_ENABLED=False)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def count_queries(self, client, url):
+        """Queries of the second request: the first one fills per-process caches"""
+        for attempt in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assertConstantQueries(self, name, url, add_row, user=None, client=None):
+        """Add rows one by one up to each size and check the query count does not grow"""
+        if client is None:
+            client = APIClient()
+            if user is not None:
+                client.force_authenticate(user)
+        rows = 0
+        counts = []
+        for size in self.sizes:
+            while rows < size:
+                add_row(rows)
+                rows += 1
+            counts.append(self.count_queries(client, url))
+        type(self).query_counts[name] = counts
+        # Fewer is fine: a feed page filled by pins skips the regular posts query
+        self.assertEqual(max(counts), counts[0], f'{name}: query count grows with rows: {counts}')
+
+    def author_post(self, i, **kwargs):
+        """Post by a new author; every third one is pinned"""
+        post = self.create_post(f'Post {i}', i % 30, author=self.create_pinning_author(f'writer{i}'), **kwargs)
+        if i % 3 == 0:
+            self.pin(post)
+        return post
+
+    def comment(self, post, author, parent=None):
+        return Comment.objects.create(post=post, author=author, parent=parent, content='Comment text')
+
+    def test_post_list(self):
+        """Test that the post feed does not query per post or pin"""
+        self.assertConstantQueries('posts: list', '/api/v1/posts/', self.author_post)
+
+    def test_post_list_authenticated(self):
+        """Test that the post feed does not query per post for an authenticated reader"""
+        self.assertConstantQueries('posts: list (auth)', '/api/v1/posts/', self.author_post, user=self.reader)
+
+    def test_post_by_category(self):
+        """Test that the streamed category feed does not query per post"""
+        url = f'/api/v1/posts/categories/{self.category.slug}/posts/'
+        self.assertConstantQueries('posts: by category', url, self.author_post)
+
+    def test_my_posts(self):
+        """Test that the author's own posts do not query per post"""
+        def add_row(i):
+            post = self.create_post(f'Mine {i}', i % 30, author=self.reader)
+            if i == 0:
+                self.pin(post)
+
+        self.assertConstantQueries('posts: my posts', '/api/v1/posts/my-posts/', add_row, user=self.reader)
+
+    def test_post_comments(self):
+        """Test that comment threads of a post do not query per comment or reply"""
+        post = self.create_post('Discussed', 1)
+
+        def add_row(i):
+            author = self.create_pinning_author(f'commenter{i}')
+            self.comment(post, self.reader, self.comment(post, author))
+
+        self.assertConstantQueries('comments: post comments', f'/api/v1/comments/post/{post.pk}/', add_row)
+
+    def test_comment_replies(self):
+        """Test that replies to a comment do not query per reply"""
+        post = self.create_post('Discussed', 1)
+        parent = self.comment(post, self.author)
+
+        def add_row(i):
+            author = self.create_pinning_author(f'commenter{i}')
+            self.comment(post, self.reader, self.comment(post, author, parent))
+
+        self.assertConstantQueries('comments: replies', f'/api/v1/comments/{parent.pk}/replies/', add_row)
+
+    def test_comment_list(self):
+        """Test that the comment list does not query per comment"""
+        post = self.create_post('Discussed', 1)
+
+        def add_row(i):
+            author = self.create_pinning_author(f'commenter{i}')
+            self.comment(post, self.reader, self.comment(post, author))
+
+        self.assertConstantQueries('comments: list', '/api/v1/comments/', add_row)
+
+    def test_my_comments(self):
+        """Test that the reader's own comments do not query per comment"""
+        def add_row(i):
+            post = self.create_post(f'Discussed {i}', 1)
+            parent = self.comment(post, self.author)
+            self.comment(post, self.author, self.comment(post, self.reader, parent))
+
+        self.assertConstantQueries(
+            'comments: my comments', '/api/v1/comments/my-comments/', add_row, user=self.reader
+        )
+
+    def test_pinned_posts_list(self):
+        """Test that the pinned board does not query per pin"""
+        def add_row(i):
+            self.pin(self.create_post(f'Pinned {i}', 1, author=self.create_pinning_author(f'writer{i}')))
+
+        self.assertConstantQueries('subscribe: pinned posts', '/api/v1/subscribe/pinned-posts/', add_row)
+
+    def test_subscription_status(self):
+        """Test that subscription status does not depend on the user's posts or history"""
+        self.pin(self.create_post('Pinned', 1, author=self.reader))
+        subscription = Subscription.objects.get(user=self.reader)
+
+        def add_row(i):
+            self.create_post(f'Mine {i}', 1, author=self.reader)
+            SubscriptionHistory.objects.create(subscription=subscription, action='renewed')
+
+        self.assertConstantQueries(
+            'subscribe: status', '/api/v1/subscribe/status/', add_row, user=self.reader
+        )
+
+    def test_profile(self):
+        """Test that the profile does not depend on the user's posts, comments or followers"""
+        def add_row(i):
+            post = self.create_post(f'Mine {i}', 1, author=self.reader)
+            self.comment(post, self.reader)
+            Follow.objects.create(follower=self.create_pinning_author(f'follower{i}'), author=self.reader)
+
+        self.assertConstantQueries('accounts: profile', '/api/v1/auth/profile/', add_row, user=self.reader)
+
+    def test_admin_changelists(self):
+        """Test every changelist of the project's admin: a new ModelAdmin needs a row factory here"""
+        post = self.create_post('Discussed', 1)
+        subscription = self.pin(self.create_post('Pinned', 1)).user.subscription
+
+        def add_subscriber(i, prefix='subscriber'):
+            user = self.create_pinning_author(f'{prefix}{i}')
+            return Subscription.objects.create(
+                user=user, plan=self.plan, status='active',
+                start_date=self.now, end_date=self.now + timedelta(days=30),
+            )
+
+        def add_plan(i):
+            plan = SubscriptionPlan.objects.create(name=f'Plan {i}', price=Decimal('1'), stripe_price_id=f'price_{i}')
+            Subscription.objects.create(
+                user=self.create_pinning_author(f'planner{i}'), plan=plan, status='active',
+                start_date=self.now, end_date=self.now + timedelta(days=30),
+            )
+
+        add_row = {
+            Category: lambda i: Category.objects.create(name=f'Category {i}'),
+            Post: self.author_post,
+            Comment: lambda i: self.comment(post, self.create_pinning_author(f'c{i}'), self.comment(post, self.author)),
+            User: lambda i: self.create_pinning_author(f'member{i}'),
+            Follow: lambda i: Follow.objects.create(
+                follower=self.create_pinning_author(f'follower{i}'), author=self.author
+            ),
+            SubscriptionPlan: add_plan,
+            Subscription: add_subscriber,
+            PinnedPost: lambda i: self.pin(
+                self.create_post(f'Pinned {i}', 1, author=self.create_pinning_author(f'pinner{i}'))
+            ),
+            SubscriptionHistory: lambda i: SubscriptionHistory.objects.create(
+                subscription=subscription if i % 2 else add_subscriber(i, 'renewer'), action='created'
+            ),
+        }
+        project_models = [
+            model for model in admin.site._registry if model.__module__.startswith('apps.')
+        ]
+        self.assertEqual(set(project_models) - set(add_row), set())
+
+        superuser = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        client = self.client_class()
+        client.force_login(superuser)
+        for model in project_models:
+            opts = model._meta
+            with self.subTest(model=opts.label):
+                self.assertConstantQueries(
+                    f'admin: {opts.label_lower}', f'/admin/{opts.app_label}/{opts.model_name}/',
+                    add_row[model], client=client,
+                )
 
 
 class MainAPICurlTests(APITestCase):
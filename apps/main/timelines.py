@@ -0,0 +1,343 @@
+"""
+Ленты подписок.
+
+При публикации поста его id раскладывается в ленты подписчиков автора
+(fan-out при записи): Celery-задача перебирает подписчиков пачками по id.
+Лента пользователя - ограниченный TIMELINE_SIZE список (id поста, время
+публикации) в ZSET Redis, общем для веб-процессов и воркеров.
+
+Хранилище local держит ленты в памяти процесса и подходит только для
+разработки: воркер Celery не видит памяти веб-процессов, поэтому раскладка
+выполняется в процессе, опубликовавшем пост, а задача fan_out_post ее
+пропускает. Ленты других процессов собираются из БД заново через
+TIMELINE_LOCAL_TTL секунд.
+
+Посты авторов с числом подписчиков от TIMELINE_CELEBRITY_THRESHOLD не
+раскладываются: они читаются при запросе ленты (fan-out при чтении) и
+сливаются с сохраненной лентой по времени. Посты загружаются из БД
+одним запросом по списку id.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def post_score(created_at):
+    """Время публикации в микросекундах: целое, точно хранится в ZSET"""
+    return (created_at - EPOCH) // timedelta(microseconds=1)
+
+
+def score_datetime(score):
+    return EPOCH + timedelta(microseconds=score)
+
+
+def _entry_key(entry):
+    # Новые первыми, при равном времени - больший id (как -created_at, -id)
+    return entry[1], entry[0]
+
+
+def _before(entry, position):
+    return position is None or _entry_key(entry) < (position[1], position[0])
+
+
+class LocalTimelineStore:
+    """Ленты в памяти текущего процесса; через ttl секунд собираются заново"""
+
+    # Раскладка из другого процесса (воркера) сюда не попадет
+    shared = False
+
+    def __init__(self, size, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._timelines = {}
+        self._seeded_at = {}
+
+    def is_seeded(self, user_id):
+        if user_id not in self._timelines:
+            return False
+        return self.ttl is None or time.monotonic() - self._seeded_at[user_id] < self.ttl
+
+    def seed(self, user_id, entries):
+        with self._lock:
+            self._timelines[user_id] = dict(heapq.nlargest(self.size, entries, key=_entry_key))
+            self._seeded_at[user_id] = time.monotonic()
+
+    def add(self, user_ids, entries):
+        """Добавляет записи (post_id, score) в уже созданные ленты"""
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.get(user_id)
+                if timeline is None:
+                    # Лента будет собрана из БД при первом чтении
+                    continue
+                timeline.update(entries)
+                if len(timeline) > self.size:
+                    self._timelines[user_id] = dict(
+                        heapq.nlargest(self.size, timeline.items(), key=_entry_key)
+                    )
+
+    def remove(self, user_id, post_ids):
+        with self._lock:
+            timeline = self._timelines.get(user_id)
+            if timeline is not None:
+                for post_id in post_ids:
+                    timeline.pop(post_id, None)
+
+    def page(self, user_id, before, limit):
+        """До limit записей после позиции before (post_id, score), новые первыми"""
+        with self._lock:
+            items = [
+                item for item in self._timelines.get(user_id, {}).items()
+                if _before(item, before)
+            ]
+            return heapq.nlargest(limit, items, key=_entry_key)
+
+
+class RedisTimelineStore:
+    """Ленты в ZSET Redis, общие для всех процессов"""
+
+    shared = True
+    timeline_key = 'timeline:{user_id}'
+    seeded_key = 'timeline:{user_id}:seeded'
+
+    def __init__(self, url, size):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.size = size
+
+    def is_seeded(self, user_id):
+        return bool(self._client.exists(self.seeded_key.format(user_id=user_id)))
+
+    def seed(self, user_id, entries):
+        key = self.timeline_key.format(user_id=user_id)
+        pipe = self._client.pipeline()
+        pipe.delete(key)
+        if entries:
+            pipe.zadd(key, dict(entries))
+            pipe.zremrangebyrank(key, 0, -(self.size + 1))
+        pipe.set(self.seeded_key.format(user_id=user_id), 1)
+        pipe.execute()
+
+    def add(self, user_ids, entries):
+        entries = dict(entries)
+        user_ids = list(user_ids)
+        # Только в созданные ленты: остальные собираются из БД при чтении
+        pipe = self._client.pipeline()
+        for user_id in user_ids:
+            pipe.exists(self.seeded_key.format(user_id=user_id))
+        seeded = pipe.execute()
+
+        pipe = self._client.pipeline(transaction=False)
+        for user_id, is_seeded in zip(user_ids, seeded):
+            if is_seeded:
+                key = self.timeline_key.format(user_id=user_id)
+                pipe.zadd(key, entries)
+                pipe.zremrangebyrank(key, 0, -(self.size + 1))
+        pipe.execute()
+
+    def remove(self, user_id, post_ids):
+        post_ids = list(post_ids)
+        if post_ids:
+            self._client.zrem(self.timeline_key.format(user_id=user_id), *post_ids)
+
+    def page(self, user_id, before, limit):
+        key = self.timeline_key.format(user_id=user_id)
+        if before is None:
+            items = self._client.zrevrangebyscore(key, '+inf', '-inf', start=0, num=limit, withscores=True)
+        else:
+            # Записи с тем же временем, что и позиция, отбираются по id
+            ties = self._client.zcount(key, before[1], before[1])
+            items = self._client.zrevrangebyscore(
+                key, before[1], '-inf', start=0, num=limit + ties, withscores=True
+            )
+        entries = [(int(post_id), int(score)) for post_id, score in items]
+        return heapq.nlargest(
+            limit, [entry for entry in entries if _before(entry, before)], key=_entry_key
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_timeline_store():
+    """Возвращает хранилище лент, выбранное в настройках"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                size = getattr(settings, 'TIMELINE_SIZE', 800)
+                if getattr(settings, 'TIMELINE_BACKEND', 'local') == 'redis':
+                    _store = RedisTimelineStore(settings.VIEW_COUNTER_REDIS_URL, size)
+                else:
+                    _store = LocalTimelineStore(size, getattr(settings, 'TIMELINE_LOCAL_TTL', 60))
+    return _store
+
+
+def reset_timeline_store():
+    """Сбрасывает выбранное хранилище (используется в тестах)"""
+    global _store
+    _store = None
+
+
+def celebrity_threshold():
+    return getattr(settings, 'TIMELINE_CELEBRITY_THRESHOLD', 10000)
+
+
+def _published_entries(queryset, limit):
+    return [
+        (post_id, post_score(created_at))
+        for post_id, created_at in queryset.filter(status='published')
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at')[:limit]
+    ]
+
+
+def followed_author_ids(user_id, celebrities):
+    """id авторов, на которых подписан пользователь: обычных или знаменитостей"""
+    from apps.accounts.models import Follow
+
+    followers_filter = (
+        {'author__followers_count__gte': celebrity_threshold()} if celebrities
+        else {'author__followers_count__lt': celebrity_threshold()}
+    )
+    return list(
+        Follow.objects.filter(follower_id=user_id, **followers_filter)
+        .values_list('author_id', flat=True)
+    )
+
+
+def rebuild_timeline(user_id):
+    """Собирает ленту пользователя из БД (при первом чтении)"""
+    from .models import Post
+
+    store = get_timeline_store()
+    author_ids = followed_author_ids(user_id, celebrities=False) + [user_id]
+    entries = _published_entries(Post.objects.filter(author_id__in=author_ids), store.size)
+    store.seed(user_id, entries)
+    return len(entries)
+
+
+def fan_out_batch(post_id, after_follower_id=0, batch_size=None):
+    """
+    Добавляет пост в ленты следующей пачки подписчиков автора.
+    Возвращает id последнего обработанного подписчика или None, если пачек больше нет.
+    """
+    from apps.accounts.models import Follow
+    from .models import Post
+
+    batch_size = batch_size or getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+    post = Post.objects.filter(pk=post_id, status='published').select_related('author').first()
+    if post is None or post.author.followers_count >= celebrity_threshold():
+        return None
+
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id, follower_id__gt=after_follower_id)
+        .order_by('follower_id')
+        .values_list('follower_id', flat=True)[:batch_size]
+    )
+    recipients = follower_ids if after_follower_id else follower_ids + [post.author_id]
+    get_timeline_store().add(recipients, [(post.pk, post_score(post.created_at))])
+    if len(follower_ids) < batch_size:
+        return None
+    return follower_ids[-1]
+
+
+def fan_out_all(post_id):
+    """Раскладывает пост по лентам всех подписчиков в текущем процессе"""
+    last_follower_id = fan_out_batch(post_id)
+    while last_follower_id is not None:
+        last_follower_id = fan_out_batch(post_id, last_follower_id)
+
+
+def schedule_fan_out(post):
+    """Ставит раскладку поста по лентам в очередь после коммита"""
+    transaction.on_commit(partial(_enqueue_fan_out, post.pk))
+
+
+def _enqueue_fan_out(post_id):
+    from .tasks import fan_out_post
+
+    if not get_timeline_store().shared:
+        # Ленты в памяти этого процесса: воркер Celery их не видит
+        try:
+            fan_out_all(post_id)
+        except Exception:
+            logger.exception('Timeline fan-out failed for post %s', post_id)
+        return
+
+    try:
+        fan_out_post.apply_async((post_id,), retry=False)
+    except Exception:
+        logger.exception('Failed to enqueue timeline fan-out for post %s', post_id)
+
+
+def add_author_posts(follower_id, author_id):
+    """Добавляет недавние посты автора в ленту нового подписчика"""
+    from apps.accounts.models import User
+    from .models import Post
+
+    store = get_timeline_store()
+    if not store.is_seeded(follower_id):
+        return
+    if User.objects.filter(pk=author_id, followers_count__gte=celebrity_threshold()).exists():
+        # Посты знаменитостей читаются при запросе ленты
+        return
+    store.add([follower_id], _published_entries(Post.objects.filter(author_id=author_id), store.size))
+
+
+def remove_author_posts(follower_id, author_id):
+    """Убирает посты автора из ленты после отписки"""
+    from .models import Post
+
+    store = get_timeline_store()
+    if store.is_seeded(follower_id):
+        post_ids = Post.objects.filter(author_id=author_id).order_by('-created_at')
+        store.remove(follower_id, list(post_ids.values_list('id', flat=True)[:store.size]))
+
+
+def timeline_page(user_id, before=None, limit=20):
+    """
+    Страница ленты: записи (post_id, score) новые первыми, после
+    позиции before = (post_id, score). Сохраненная лента сливается
+    с постами знаменитостей.
+    """
+    from .models import Post
+
+    store = get_timeline_store()
+    if not store.is_seeded(user_id):
+        rebuild_timeline(user_id)
+    entries = store.page(user_id, before, limit)
+
+    celebrity_ids = followed_author_ids(user_id, celebrities=True)
+    if celebrity_ids:
+        queryset = Post.objects.filter(author_id__in=celebrity_ids)
+        if before is not None:
+            created_at = score_datetime(before[1])
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=before[0])
+            )
+        entries = heapq.nlargest(
+            limit, set(entries) | set(_published_entries(queryset, limit)), key=_entry_key
+        )
+    return entries
+
+
+def hydrate(entries, queryset):
+    """Посты записей ленты одним запросом, в порядке ленты"""
+    posts = queryset.filter(status='published').in_bulk([post_id for post_id, _ in entries])
+    return [posts[post_id] for post_id, _ in entries if post_id in posts]
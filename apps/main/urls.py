@@ -11,8 +11,16 @@ urlpatterns = [
     path('', views.PostListCreateView.as_view(), name='post-list'),
     path('my-posts/', views.MyPostsView.as_view(), name='my-posts'),
     path('popular/', views.popular_posts, name='popular-posts'),
+    path('hot/', views.hot_posts_list, name='hot-posts'),
     path('pinned/', views.pinned_posts_only, name='pinned-posts-only'),
     path('featured/', views.featured_posts, name='featured-posts'),
     path('recent/', views.recent_posts, name='recent-posts'),
+    path('timeline/', views.timeline, name='timeline'),
+    path('my-analytics/', views.my_analytics, name='my-analytics'),
+    path('my-stats/', views.my_stats, name='my-stats'),
+    path('cache-stats/', views.response_cache_stats, name='response-cache-stats'),
+    path('export/<slug:entity>/', views.export_data, name='export-data'),
     path('<slug:slug>/', views.PostDetailView.as_view(), name='post-detail'),
+    path('<slug:slug>/related/', views.related_posts, name='related-posts'),
+    path('<slug:slug>/analytics/', views.post_analytics, name='post-analytics'),
 ]
\ No newline at end of file
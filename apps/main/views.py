@@ -1,13 +1,20 @@
 # Full version of views.py after creating subscribe and payment apps
 
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.utils.encoders import JSONEncoder
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.db.models import Q
-from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 
-from .models import Category, Post
+from .models import FEED_RELATED, Category, Post
 from .serializers import (
     CategorySerializer,
     PostListSerializer,
@@ -15,6 +22,23 @@ from .serializers import (
     PostCreateUpdateSerializer
 )
 from .permissions import IsAuthorOrReadOnly
+from .pagination import KeysetPagination
+from .search import FullTextSearchFilter
+from .sparse import SparseFieldsetViewMixin
+from .timelines import hydrate, timeline_page
+from .related import related_posts_for
+from .leaderboards import ALL_TIME, WEEK, atop_posts, top_posts
+from .hot import hot_posts
+from .analytics import views_series
+from .author_stats import get_author_stats
+from .response_cache import cache_response, get_cache_stats, post_tags
+from .conditional import Validators, request_parts
+from .asyncapi import AsyncAPIView, aserialize, async_api_view, run_concurrently
+from .query_budget import query_budget
+from .exporter import CONTENT_TYPES, ExportError, export_filename, export_stream, parse_since
+
+# Размер порции при потоковой выдаче постов из серверного курсора
+STREAM_CHUNK_SIZE = 200
 
 
 class CategoryListCreateView(generics.ListCreateAPIView):
@@ -26,6 +50,7 @@ class CategoryListCreateView(generics.ListCreateAPIView):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    query_budget = {'GET': 6}
 
 
 class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -36,23 +61,24 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = 'slug'
 
 
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """
     API endpoint для постов c поддержкой закрепленных постов.
     Закрепленные посты отображаются первыми в порядке закрепления.
     """
     serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    query_budget = {'GET': 6}
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['category', 'author', 'status']
-    search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'updated_at', 'views_count', 'title']
     ordering = ['-created_at']
 
     def get_queryset(self):
         """Возвращает посты с учетом прав доступа"""
 
-        queryset = Post.objects.select_related('author', 'category')
+        queryset = Post.objects.select_related('author', 'category').for_list()
 
         # фильрация по правам доступа
         if not self.request.user.is_authenticated:
@@ -62,17 +88,21 @@ class PostListCreateView(generics.ListCreateAPIView):
                 Q(status='published') | Q(author=self.request.user)
             )
 
-        # Проверяем, нужна ли сортировка с учетом закрепленных постов
+        return queryset
+
+    def show_pinned_first(self):
+        """Проверяет, нужна ли сортировка с учетом закрепленных постов"""
+        # Результаты поиска сортируются по релевантности
+        if FullTextSearchFilter().get_search_query(self.request):
+            return False
         ordering = self.request.query_params.get('ordering', '')
-        show_pinned_first = not ordering or ordering in ['-created_at', 'created_at']
-        
-        if show_pinned_first:
-            return Post.get_posts_for_feed().filter(
-                Q(status='published') | (
-                    Q(author=self.request.user) if self.request.user.is_authenticated else Q()
-                )
-            )
+        return not ordering or ordering in ['-created_at', 'created_at']
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method == 'GET' and self.show_pinned_first():
+            # Порядок ленты применяется после фильтров и OrderingFilter
+            return queryset.feed()
         return queryset
     
     def get_serializer_class(self):
@@ -81,138 +111,216 @@ class PostListCreateView(generics.ListCreateAPIView):
         return PostListSerializer
     
     def list(self, request, *args, **kwargs):
+        # Версия ленты меняется при любой записи в посты, комментарии и закрепления
+        validators = Validators(['feed', 'pins'], request.get_full_path(), *request_parts(request))
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
         response = super().list(request, *args, **kwargs)
+        validators.apply(response)
 
-        # Статистика закрепленных постов
+        # Статистика закрепленных постов (если поле is_pinned не исключено через ?fields=)
         if hasattr(response, 'data') and 'results' in response.data:
-            pinned_count = sum(1 for post in response.data['results'] if post.get('is_pinned', False))
-            response.data['pinned_posts_count'] = pinned_count
+            results = response.data['results']
+            if all('is_pinned' in post for post in results):
+                response.data['pinned_posts_count'] = sum(1 for post in results if post['is_pinned'])
         
         return response
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    """API endpoint для конкретного поста"""
+class PostDetailView(AsyncAPIView, generics.RetrieveUpdateDestroyAPIView):
+    """API endpoint для конкретного поста (GET выполняется асинхронно)"""
     queryset = Post.objects.select_related('author', 'category')
     serializer_class = PostDetailSerializer
     permission_classes = [IsAuthorOrReadOnly]
     lookup_field = 'slug'
+    query_budget = {'GET': 7}
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return PostCreateUpdateSerializer
         return PostDetailSerializer
     
-    def retrieve(self, request, *args, **kwargs):
+    async def aget_object(self):
+        """get_object() с асинхронным запросом к БД"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = await aget_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    async def get(self, request, *args, **kwargs):
         """Увеличивает счетчик просмотров при GET запросе"""
-        instance = self.get_object()
+        instance = await self.aget_object()
 
-        if request.method == 'GET':
-            instance.increment_views()
+        # Просмотр засчитывается и при ответе 304
+        await sync_to_async(instance.increment_views)(request.user)
 
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        # pins: can_pin и pinned_info зависят от подписок
+        validators = await Validators.acreate(
+            [f'post:{instance.pk}', 'pins'], instance.pk, *request_parts(request),
+            modified_at=instance.updated_at
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        data = await aserialize(self.get_serializer(instance))
+        return validators.apply(Response(data))
     
-class MyPostsView(generics.ListAPIView):
+class MyPostsView(SparseFieldsetViewMixin, generics.ListAPIView):
     """API endpoint для постов текущего пользователя"""
     serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['category', 'status']
-    search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'updated_at', 'views_count', 'title']
     ordering = ['-created_at']
+    query_budget = 5
 
     def get_queryset(self):
         return Post.objects.filter(
             author=self.request.user
-        ).select_related('author', 'category')
+        ).select_related(*FEED_RELATED).for_list()
     
 
+# Теги кэша публичных эндпоинтов (см. response_cache)
+def _category_posts_tags(request, response, category_slug):
+    return ['pins', f'category:{response.data["category"]["id"]}'] + post_tags(response.data['posts'])
+
+
+def _popular_tags(request, response):
+    return ['leaderboard'] + post_tags(response.data)
+
+
+def _hot_tags(request, response):
+    return ['hot'] + post_tags(response.data)
+
+
+def _recent_tags(request, response):
+    return ['posts'] + post_tags(response.data)
+
+
+def _pinned_tags(request, response):
+    return ['pins'] + post_tags(response.data['results'])
+
+
+def _related_tags(request, response, slug):
+    return ['related', f'related:{response.data["post_id"]}'] + post_tags(response.data['results'])
+
+
+def _featured_tags(request, response):
+    return ['pins', 'leaderboard'] + post_tags(
+        response.data['pinned_posts'] + response.data['popular_posts']
+    )
+
+
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_response('post_by_category', tags=_category_posts_tags)
 def post_by_category(request, category_slug):
-    """Посты определенной категории"""
+    """
+    Посты определенной категории: закрепленные первыми, затем по дате.
+    Ответ разбит на страницы курсором; ?stream=true отдает все посты
+    потоком, читая их из БД порциями.
+    """
     category = get_object_or_404(Category, slug=category_slug)
     
-    # Получаем посты с учетом закрепления
-    # Используем менеджер модели для получения with_subscription_info
-    posts = Post.objects.with_subscription_info().filter(
-        category=category,
-        status='published'
-    )
-    
-    # Сортируем с учетом закрепленных постов
-    # Используем сложную аннотацию для правильной сортировки
-    from django.db.models import Case, When, Value, DateTimeField, BooleanField
-    from django.utils import timezone
-    
-    posts = posts.annotate(
-        effective_date=Case(
-            When(
-                pin_info__isnull=False,
-                pin_info__user__subscription__status='active',
-                pin_info__user__subscription__end_date__gt=timezone.now(),
-                then='pin_info__pinned_at'
-            ),
-            default='created_at',
-            output_field=DateTimeField()
-        ),
-        is_pinned_flag=Case(
-            When(
-                pin_info__isnull=False,
-                pin_info__user__subscription__status='active',
-                pin_info__user__subscription__end_date__gt=timezone.now(),
-                then=Value(True)
-            ),
-            default=Value(False),
-            output_field=BooleanField()
+    # Закрепленные посты первыми, затем по дате
+    posts = Post.objects.published().for_list().feed(category=category)
+    context = {'request': request}
+
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return StreamingHttpResponse(
+            _stream_category_posts(category, posts, context),
+            content_type='application/json'
         )
-    ).order_by('-is_pinned_flag', 'effective_date', '-created_at')
-    
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
-    
-    return Response({
-        'category': CategorySerializer(category).data,
+
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(posts, request)
+    serializer = PostListSerializer(page, many=True, context=context)
+
+    data = {'category': CategorySerializer(category).data}
+    if paginator.count is not None:
+        data['count'] = paginator.count
+    data.update({
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
         'posts': serializer.data,
-        'pinned_posts_count': sum(1 for post in serializer.data if post.get('is_pinned', False))
+        # По объектам, а не по данным: поле is_pinned может быть исключено
+        'pinned_posts_count': sum(1 for post in page if post.is_pinned),
     })
+    return Response(data)
 
-@api_view(['GET'])
+
+def _stream_category_posts(category, posts, context):
+    """Кодирует ответ по частям, не держа все посты в памяти"""
+    encoder = JSONEncoder(ensure_ascii=False)
+    serializer = PostListSerializer(context=context)
+    pinned_count = 0
+
+    yield '{"category": %s, "posts": [' % encoder.encode(CategorySerializer(category).data)
+    for index, post in enumerate(posts.iterator(chunk_size=STREAM_CHUNK_SIZE)):
+        data = serializer.to_representation(post)
+        pinned_count += post.is_pinned
+        yield (',' if index else '') + encoder.encode(data)
+    yield '], "pinned_posts_count": %d}' % pinned_count
+
+@query_budget(5)
+@async_api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def popular_posts(request):
-    """10 самых популярных постов"""
-    posts = Post.objects.with_subscription_info().filter(
-        status='published'
-    ).order_by('-views_count')[:10]
+@cache_response('popular_posts', tags=_popular_tags, timeout=60)
+async def popular_posts(request):
+    """10 самых популярных постов (из лидерборда за все время)"""
+    posts = await atop_posts(ALL_TIME, 10, Post.objects.with_subscription_info().for_list())
     
     serializer = PostListSerializer(
         posts, 
         many=True, 
         context={'request': request}
     )
-    return Response(serializer.data)
+    return Response(await aserialize(serializer))
 
 
+@query_budget(5)
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def recent_posts(request):
+@cache_response('hot_posts', tags=_hot_tags, timeout=60)
+def hot_posts_list(request):
+    """10 "горячих" постов: популярность с затуханием по возрасту (см. hot.py)"""
+    posts = hot_posts(Post.objects.with_subscription_info().for_list(), 10)
+    serializer = PostListSerializer(posts, many=True, context={'request': request})
+    return Response(serializer.data)
+
+
+@query_budget(5)
+@async_api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cache_response('recent_posts', tags=_recent_tags)
+async def recent_posts(request):
     """10 последних опубликованных постов"""
-    posts = Post.objects.with_subscription_info().filter(
+    posts = [post async for post in Post.objects.with_subscription_info().for_list().filter(
         status='published'
-    ).order_by('-created_at')[:10]
+    ).order_by('-created_at')[:10]]
     
     serializer = PostListSerializer(
         posts, 
         many=True, 
         context={'request': request}
     )
-    return Response(serializer.data)
+    return Response(await aserialize(serializer))
 
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_response('pinned_posts_only', tags=_pinned_tags)
 def pinned_posts_only(request):
     """Только закрепленные посты"""
-    posts = Post.objects.pinned_posts()
+    posts = Post.objects.pinned_posts().for_list()
     serializer = PostListSerializer(
         posts,
         many=True,
@@ -224,28 +332,28 @@ def pinned_posts_only(request):
     })
 
 
-@api_view(['GET'])
+@query_budget(5)
+@async_api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def featured_posts(request):
+@cache_response('featured_posts', tags=_featured_tags, timeout=60)
+async def featured_posts(request):
     """
     Рекомендуемые посты для главной страницы:
     - Закрепленные посты (максимум 3)
     - Популярные посты за последнюю неделю
+    Закрепленные, популярные и число закрепленных загружаются параллельно.
     """
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    # Получаем последние 3 закрепленных поста
-    pinned_posts = Post.objects.pinned_posts()[:3]
-    
-    # Получаем популярные посты за неделю (исключая уже закрепленные)
-    week_ago = timezone.now() - timedelta(days=7)
-    popular_posts = Post.objects.with_subscription_info().filter(
-        status='published',
-        created_at__gte=week_ago
-    ).exclude(
-        id__in=[post.id for post in pinned_posts]
-    ).order_by('-views_count')[:6]
+    pinned = Post.objects.pinned_posts()
+    pinned_posts, popular_posts, total_pinned = await run_concurrently(
+        lambda: list(pinned.for_list()[:3]),
+        # С запасом на закрепленные, которые исключаются ниже
+        lambda: top_posts(WEEK, 6 + 3, Post.objects.with_subscription_info().for_list()),
+        pinned.count,
+    )
+
+    # Популярные за неделю из лидерборда (исключая уже закрепленные)
+    pinned_ids = {post.id for post in pinned_posts}
+    popular_posts = [post for post in popular_posts if post.id not in pinned_ids][:6]
     
     # Сериализуем данные
     pinned_serializer = PostListSerializer(
@@ -260,11 +368,26 @@ def featured_posts(request):
     )
     
     return Response({
-        'pinned_posts': pinned_serializer.data,
-        'popular_posts': popular_serializer.data,
-        'total_pinned': Post.objects.pinned_posts().count()
+        'pinned_posts': await aserialize(pinned_serializer),
+        'popular_posts': await aserialize(popular_serializer),
+        'total_pinned': total_pinned,
     })
 
+@query_budget(6)
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cache_response('related_posts', tags=_related_tags)
+def related_posts(request, slug):
+    """Похожие посты из предрассчитанной таблицы (см. related.py)"""
+    post = get_object_or_404(Post.objects.only('id'), slug=slug, status='published')
+    posts = related_posts_for(post.pk, Post.objects.select_related(*FEED_RELATED).for_list())
+    serializer = PostListSerializer(posts, many=True, context={'request': request})
+    return Response({
+        'post_id': post.pk,
+        'results': serializer.data,
+    })
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def toggle_post_pin_status(request, slug):
@@ -311,6 +434,132 @@ def toggle_post_pin_status(request, slug):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+TIMELINE_MAX_PAGE_SIZE = 100
+
+
+@query_budget(8)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def timeline(request):
+    """
+    Лента подписок текущего пользователя.
+    id постов берутся из предрассчитанной ленты, посты загружаются одним запросом.
+    """
+    try:
+        page_size = min(
+            int(request.query_params.get('page_size', api_settings.PAGE_SIZE)),
+            TIMELINE_MAX_PAGE_SIZE
+        )
+        cursor = request.query_params.get('cursor')
+        before = tuple(int(part) for part in cursor.split('_')) if cursor else None
+    except ValueError:
+        raise NotFound('Invalid cursor')
+    if page_size <= 0 or (before is not None and len(before) != 2):
+        raise NotFound('Invalid cursor')
+
+    entries = timeline_page(request.user.pk, before, page_size)
+    posts = hydrate(entries, Post.objects.select_related(*FEED_RELATED).for_list())
+
+    next_url = None
+    if len(entries) == page_size:
+        post_id, score = entries[-1]
+        next_url = replace_query_param(
+            request.build_absolute_uri(), 'cursor', f'{post_id}_{score}'
+        )
+    return Response({
+        'next': next_url,
+        'results': PostListSerializer(posts, many=True, context={'request': request}).data,
+    })
+
+
+def _analytics_days(request):
+    """Длина ряда из ?days= (по умолчанию 90)"""
+    max_days = getattr(settings, 'ANALYTICS_MAX_DAYS', 365)
+    try:
+        days = int(request.query_params.get('days', 90))
+    except ValueError:
+        raise ValidationError({'days': 'Must be an integer.'})
+    if not 1 <= days <= max_days:
+        raise ValidationError({'days': f'Must be between 1 and {max_days}.'})
+    return days
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def post_analytics(request, slug):
+    """Просмотры поста по дням (автору поста и персоналу)"""
+    post = get_object_or_404(Post.objects.only('id', 'author_id'), slug=slug)
+    if post.author_id != request.user.id and not request.user.is_staff:
+        raise PermissionDenied('Only the author can view post analytics.')
+    days = _analytics_days(request)
+    series = views_series(days, post=post)
+    return Response({
+        'post_id': post.pk,
+        'days': days,
+        'total_views': sum(point['views'] for point in series),
+        'series': series,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def my_analytics(request):
+    """Просмотры всех постов текущего пользователя по дням"""
+    days = _analytics_days(request)
+    series = views_series(days, author=request.user)
+    return Response({
+        'days': days,
+        'total_views': sum(point['views'] for point in series),
+        'series': series,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def my_stats(request):
+    """Статистика автора из предрассчитанных агрегатов (для подписчиков)"""
+    user = request.user
+    if not user.is_staff and not (hasattr(user, 'subscription') and user.subscription.is_active):
+        raise PermissionDenied('Active subscription required for statistics.')
+    return Response(get_author_stats(user, _analytics_days(request)))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def response_cache_stats(request):
+    """Статистика попаданий в кэш ответов публичных эндпоинтов"""
+    return Response(get_cache_stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_data(request, entity):
+    """
+    Потоковая выгрузка сущности для сотрудников.
+    Параметры: output=ndjson|csv, gzip=true, since=<дата или дата-время>
+    """
+    fmt = request.query_params.get('output', 'ndjson')
+    compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        chunks = export_stream(
+            entity,
+            fmt=fmt,
+            since=parse_since(request.query_params.get('since')),
+            compress=compress,
+        )
+    except ExportError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if compress else f'{CONTENT_TYPES[fmt]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export_filename(entity, fmt, compress)}"'
+    )
+    return response
+
+
 
 
 
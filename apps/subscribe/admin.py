@@ -1,5 +1,6 @@
 # backend/apps/subscribe/admin.py
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
@@ -35,11 +36,13 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
 
     def subscriptions_count(self, obj):
         """Количество подписок на план"""
-        return obj.subscriptions.count()
+        return obj.subscriptions_total
     subscriptions_count.short_description = 'Subscriptions'
+    subscriptions_count.admin_order_field = 'subscriptions_total'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('subscriptions')
+        # Число подписок считает БД, а не загрузка всех подписок плана
+        return super().get_queryset(request).annotate(subscriptions_total=Count('subscriptions'))
 
 
 class SubscriptionHistoryInline(admin.TabularInline):
@@ -228,7 +231,9 @@ class SubscriptionHistoryAdmin(admin.ModelAdmin):
         return False
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('subscription', 'subscription__user')
+        return super().get_queryset(request).select_related(
+            'subscription', 'subscription__user', 'subscription__plan'
+        )
 
 
 # Дополнительные настройки админки
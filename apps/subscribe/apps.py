@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SubscribeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.subscribe'
+
+    def ready(self):
+        # Только инвалидация кэша: обработчики из signals.py не подключены
+        from . import invalidation  # noqa: F401
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.main.response_cache import invalidate_tags
+from .models import SubscriptionPlan, Subscription, PinnedPost
+
+
+@receiver(post_save, sender=PinnedPost)
+@receiver(post_delete, sender=PinnedPost)
+def pinned_post_changed(sender, instance, **kwargs):
+    """Сбрасывает кэш списков закрепленных постов"""
+    invalidate_tags('pins', f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    """Закрепления активны только при действующей подписке"""
+    invalidate_tags('pins')
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def subscription_plan_changed(sender, instance, **kwargs):
+    """Сбрасывает кэш списка тарифных планов"""
+    invalidate_tags('plans')
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptionhistory',
+            index=models.Index(fields=['subscription', '-created_at'], name='subscriptio_subscri_8a69f7_idx'),
+        ),
+    ]
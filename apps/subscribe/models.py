@@ -177,6 +177,9 @@ class SubscriptionHistory(models.Model):
         verbose_name = 'Subscription History'
         verbose_name_plural = 'Subscription History'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subscription', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.subscription.user.username} - {self.action}"
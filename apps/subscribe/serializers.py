@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.utils import timezone
+from apps.main.sparse import SparseFieldsetSerializerMixin
 from .models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
 
 
@@ -25,7 +26,7 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
         return data
     
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для подписки"""
     plan_info = SubscriptionPlanSerializer(source='plan', read_only=True)
     user_info = serializers.SerializerMethodField()
@@ -88,7 +89,7 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PinnedPostSerializer(serializers.ModelSerializer):
+class PinnedPostSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для закрепленного поста"""
     post_info = serializers.SerializerMethodField()
     
@@ -141,7 +142,7 @@ class PinnedPostSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
     
 
-class SubscriptionHistorySerializer(serializers.ModelSerializer):
+class SubscriptionHistorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для истории подписки"""
     
     class Meta:
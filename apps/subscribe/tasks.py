@@ -1,5 +1,7 @@
 from celery import shared_task
 from django.utils import timezone
+
+from config.db_router import read_only
 from .models import Subscription, PinnedPost, SubscriptionHistory
 
 
@@ -41,6 +43,7 @@ def check_expired_subscriptions():
     }
 
 @shared_task
+@read_only
 def send_subscription_expiry_reminder():
     """Отправка напоминаний о скором истечении подписки"""
     from datetime import timedelta
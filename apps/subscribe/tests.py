@@ -321,6 +321,29 @@ class SubscribeAPICurlTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
 
+    def test_subscription_history_cursor_pagination(self):
+        """Тест курсорной пагинации истории подписки"""
+        subscription = Subscription.objects.create(
+            user=self.user1,
+            plan=self.plan1,
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=30),
+            status='active'
+        )
+        for action in ['created', 'activated', 'renewed', 'cancelled', 'expired']:
+            SubscriptionHistory.objects.create(subscription=subscription, action=action)
+
+        url = '/api/v1/subscribe/history/?page_size=2'
+        actions = []
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.token1}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            actions.extend(item['action'] for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(actions, ['expired', 'cancelled', 'renewed', 'activated', 'created'])
+
     def test_pin_post_no_subscription_curl(self):
         """Тест закрепления поста без подписки"""
         print("\n=== CURL: Pin Post (No Subscription) ===")
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 
 from .models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
 from .serializers import (
@@ -16,14 +17,21 @@ from .serializers import (
     PinPostSerializer,
     UnpinPostSerializer
 )
+from apps.main.asyncapi import async_api_view
 from apps.main.models import Post
+from apps.main.pagination import KeysetPagination
+from apps.main.query_budget import query_budget
+from apps.main.response_cache import cache_response, post_tags
+from apps.main.sparse import SparseFieldsetViewMixin
 
 
+@method_decorator(cache_response('subscription_plans', tags=['plans']), name='list')
 class SubscriptionPlanListView(generics.ListAPIView):
     """Список доступных тарифных планов"""
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 6
 
 
 class SubscriptionPlanDetailView(generics.RetrieveAPIView):
@@ -58,10 +66,11 @@ class UserSubscriptionView(generics.RetrieveAPIView):
         
     
 
-class SubscriptionHistoryView(generics.ListAPIView):
+class SubscriptionHistoryView(SparseFieldsetViewMixin, generics.ListAPIView):
     """История изменений подписки пользователя"""
     serializer_class = SubscriptionHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Возвращает историю подписки пользователя"""
@@ -117,6 +126,7 @@ class PinnedPostView(generics.RetrieveUpdateDestroyAPIView):
             }, status=status.HTTP_404_NOT_FOUND)
         
 
+@query_budget(8)
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def subscription_status(request):
@@ -226,9 +236,13 @@ def cancel_subscription(request):
             'error': 'No subscription found'
         }, status=status.HTTP_404_NOT_FOUND)
     
-@api_view(['GET'])
+@query_budget(6)
+@async_api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def pinned_posts_list(request):
+@cache_response('pinned_posts_list', tags=lambda request, response: (
+    ['pins'] + post_tags(response.data['results'])
+))
+async def pinned_posts_list(request):
     """Возвращает список всех закрепленных постов для отображения в топе"""
     # Получаем только закрепленные посты пользователей с активной подпиской
     pinned_posts = PinnedPost.objects.select_related(
@@ -237,17 +251,17 @@ def pinned_posts_list(request):
         user__subscription__status='active',
         user__subscription__end_date__gt=timezone.now(),
         post__status='published'
-    ).order_by('pinned_at')
+    ).defer('post__content').order_by('pinned_at')
 
     # Формируем ответ с информацией о посте
     posts_data = []
-    for pinned_post in pinned_posts:
+    async for pinned_post in pinned_posts:
         post = pinned_post.post
         posts_data.append({
             'id': post.id,
             'title': post.title,
             'slug': post.slug,
-            'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
+            'content': post.excerpt,
             'image': post.image.url if post.image else None,
             'category': post.category.name if post.category else None,
             'author': {
@@ -0,0 +1,245 @@
+"""
+Чтение с реплик PostgreSQL.
+
+ReplicaRouter отправляет запись и миграции в default, а чтение - на
+реплику, только если текущий контекст это разрешает:
+- ReplicaMiddleware разрешает реплики для GET/HEAD/OPTIONS;
+- задачи Celery, которые только читают, оборачиваются декоратором read_only.
+После первой записи в контексте чтение до его конца идет с основной БД.
+
+Чтение своих записей: после небезопасного запроса клиент
+READ_YOUR_WRITES_SECONDS секунд читает с основной БД. Срок хранится в
+cookie, а для клиентов с JWT - в кэше по id пользователя из токена
+(токен проверяется без запроса к БД).
+
+Реплика с отставанием больше REPLICA_MAX_LAG_SECONDS пропускается;
+отставание каждой реплики проверяется не чаще раза в
+REPLICA_LAG_CHECK_INTERVAL секунд. Если подходящих реплик нет, чтение
+идет с основной БД.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'db_primary_until'
+PRIMARY_CACHE_KEY = 'db-primary:{user_id}'
+
+# Ноль, если реплика воспроизвела все полученные записи: иначе на простаивающей
+# основной БД время последней транзакции растет и реплика считается отстающей
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReadState:
+    """Разрешено ли чтение с реплик и была ли запись в текущем контексте"""
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.wrote = False
+
+
+_state = ContextVar('db_read_state', default=None)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Контекст, в котором чтение может идти с реплик"""
+    token = _state.set(ReadState(enabled))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def read_only(func):
+    """Декоратор для задач, которые только читают из БД"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def replica_aliases():
+    return list(getattr(settings, 'REPLICA_DATABASES', ()))
+
+
+def measure_lag(alias):
+    """Отставание реплики в секундах; бесконечность, если она недоступна"""
+    try:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except Exception:
+        logger.warning('Replica %s is unavailable', alias, exc_info=True)
+        return math.inf
+
+
+_lags = {}
+_lags_lock = threading.Lock()
+
+
+def replica_lag(alias):
+    """Отставание реплики с кэшированием на REPLICA_LAG_CHECK_INTERVAL секунд"""
+    now = time.monotonic()
+    checked = _lags.get(alias)
+    if checked is not None and now - checked[0] < getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5.0):
+        return checked[1]
+    lag = measure_lag(alias)
+    with _lags_lock:
+        _lags[alias] = (now, lag)
+    return lag
+
+
+def reset_replica_lags():
+    """Сбрасывает сохраненные отставания (используется в тестах)"""
+    with _lags_lock:
+        _lags.clear()
+
+
+def choose_replica():
+    """Случайная реплика без большого отставания или None"""
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5.0)
+    healthy = [alias for alias in replica_aliases() if replica_lag(alias) <= max_lag]
+    return random.choice(healthy) if healthy else None
+
+
+class ReplicaRouter:
+    """Запись - в default, чтение - на реплики, если контекст разрешает"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replicas or state.wrote:
+            return None
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Дальше в этом контексте читаем свои записи с основной БД
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def token_user_id(request):
+    """id пользователя из JWT запроса или None"""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken
+    from rest_framework_simplejwt.settings import api_settings
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+    except InvalidToken:
+        # Запрос отклонит аутентификация DRF
+        return None
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик для безопасных запросов (WSGI и ASGI)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        safe = request.method in SAFE_METHODS
+        user_id = token_user_id(request)
+        with replica_reads(safe and not self.reads_own_writes(request, user_id)):
+            response = self.get_response(request)
+        if not safe:
+            self.stick_to_primary(response, user_id)
+        return response
+
+    async def __acall__(self, request):
+        safe = request.method in SAFE_METHODS
+        user_id = token_user_id(request)
+        # Состояние в contextvar переходит в потоки sync_to_async
+        with replica_reads(safe and not await self.areads_own_writes(request, user_id)):
+            response = await self.get_response(request)
+        if not safe:
+            await self.astick_to_primary(response, user_id)
+        return response
+
+    def window(self):
+        return getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10.0)
+
+    def cookie_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def reads_own_writes(self, request, user_id):
+        """Клиент недавно писал и должен читать с основной БД"""
+        if self.cookie_pinned(request):
+            return True
+        return user_id is not None and bool(cache.get(PRIMARY_CACHE_KEY.format(user_id=user_id)))
+
+    async def areads_own_writes(self, request, user_id):
+        if self.cookie_pinned(request):
+            return True
+        return user_id is not None and bool(await cache.aget(PRIMARY_CACHE_KEY.format(user_id=user_id)))
+
+    def set_cookie(self, response, window):
+        response.set_cookie(
+            PRIMARY_COOKIE, f'{time.time() + window:.3f}',
+            max_age=math.ceil(window), httponly=True, samesite='Lax',
+        )
+
+    def stick_to_primary(self, response, user_id):
+        window = self.window()
+        if window <= 0:
+            return
+        self.set_cookie(response, window)
+        if user_id is not None:
+            cache.set(PRIMARY_CACHE_KEY.format(user_id=user_id), 1, timeout=math.ceil(window))
+
+    async def astick_to_primary(self, response, user_id):
+        window = self.window()
+        if window <= 0:
+            return
+        self.set_cookie(response, window)
+        if user_id is not None:
+            await cache.aset(PRIMARY_CACHE_KEY.format(user_id=user_id), 1, timeout=math.ceil(window))
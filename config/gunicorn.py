@@ -0,0 +1,42 @@
+"""
+Профиль gunicorn. По умолчанию - синхронные воркеры (WSGI), 2 x ядра + 1:
+
+    gunicorn config.wsgi:application -c config/gunicorn.py
+
+Воркеры uvicorn (ASGI) включаются явно, по одному на ядро:
+
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn config.asgi:application -c config/gunicorn.py
+
+Под ASGI асинхронные представления (лента, популярные, детальная страница
+поста, комментарии, доска закрепленных) обслуживаются в цикле событий
+воркера, и ожидание БД не занимает воркер целиком. Это выигрывает, только
+когда запросы к БД ждут сеть; с быстрой локальной БД переходы между
+потоками делают uvicorn медленнее синхронных воркеров. Профили сравнивает
+manage.py bench_workers (задержка запросов к БД задается QUERY_DELAY_MS).
+
+Под ASGI каждый выполняющийся запрос держит свое соединение с БД, поэтому
+соединений до workers x одновременных запросов: для PostgreSQL нужен
+PgBouncer (transaction pooling) или запас в max_connections.
+"""
+import multiprocessing
+
+# Не "from decouple import config": gunicorn считает имена модуля настройками,
+# а config - его собственная настройка
+import decouple
+
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+worker_class = decouple.config('GUNICORN_WORKER_CLASS', default='sync')
+_cores = multiprocessing.cpu_count()
+# Синхронный воркер обслуживает один запрос за раз, асинхронному достаточно процесса на ядро
+_default_workers = _cores if 'Uvicorn' in worker_class else 2 * _cores + 1
+workers = decouple.config('GUNICORN_WORKERS', default=_default_workers, cast=int)
+# Очередь соединений, ожидающих accept()
+backlog = decouple.config('GUNICORN_BACKLOG', default=2048, cast=int)
+keepalive = decouple.config('GUNICORN_KEEPALIVE', default=5, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = decouple.config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+# Перезапуск воркеров ограничивает рост памяти; jitter разносит перезапуски
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=10000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=1000, cast=int)
+accesslog = decouple.config('GUNICORN_ACCESS_LOG', default=None)
+errorlog = '-'
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -39,6 +39,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.main.query_budget.QueryBudgetMiddleware',
+    'config.db_router.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +81,23 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: хосты через запятую, остальные параметры как у default
+REPLICA_DATABASES = []
+for number, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'ATOMIC_REQUESTS': False,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+# После записи клиент столько секунд читает с основной БД
+READ_YOUR_WRITES_SECONDS = config('READ_YOUR_WRITES_SECONDS', default=10.0, cast=float)
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5.0, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=5.0, cast=float)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -259,6 +278,77 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_ACCEPT_CONTENT = ['json']
 
+# Кэш: Redis, если задан CACHE_REDIS_URL, иначе память процесса
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'news-default',
+        }
+    }
+
+# Кэш ответов публичных эндпоинтов (инвалидация по тегам)
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Буферизованный счетчик просмотров постов
+VIEW_COUNTER_BACKEND = config('VIEW_COUNTER_BACKEND', default='local')  # local или redis
+VIEW_COUNTER_REDIS_URL = config('VIEW_COUNTER_REDIS_URL', default=CELERY_BROKER_URL)
+VIEW_COUNTER_FLUSH_INTERVAL = config('VIEW_COUNTER_FLUSH_INTERVAL', default=10.0, cast=float)
+VIEW_COUNTER_BATCH_SIZE = config('VIEW_COUNTER_BATCH_SIZE', default=500, cast=int)
+
+# Аналитика просмотров: почасовые корзины сворачиваются в дневные агрегаты
+ANALYTICS_HOURLY_RETENTION_DAYS = config('ANALYTICS_HOURLY_RETENTION_DAYS', default=14, cast=int)
+ANALYTICS_MAX_DAYS = config('ANALYTICS_MAX_DAYS', default=365, cast=int)  # максимум дней в запросе ряда
+AUTHOR_STATS_CACHE_TIMEOUT = config('AUTHOR_STATS_CACHE_TIMEOUT', default=60, cast=int)  # секунд
+
+# Лидерборды популярных постов (обновляются при сбросе просмотров)
+LEADERBOARD_BACKEND = config('LEADERBOARD_BACKEND', default=VIEW_COUNTER_BACKEND)  # local или redis
+LEADERBOARD_SIZE = config('LEADERBOARD_SIZE', default=100, cast=int)
+LEADERBOARD_BUCKET_SIZE = config('LEADERBOARD_BUCKET_SIZE', default=1000, cast=int)
+LEADERBOARD_LOCAL_TTL = config('LEADERBOARD_LOCAL_TTL', default=300, cast=int)  # секунд до пересборки лидерборда local из БД
+
+# Ленты подписок (fan-out при публикации поста)
+# local - ленты в памяти процесса, только для разработки; в продакшене redis
+TIMELINE_BACKEND = config('TIMELINE_BACKEND', default=VIEW_COUNTER_BACKEND)  # local или redis
+TIMELINE_LOCAL_TTL = config('TIMELINE_LOCAL_TTL', default=60, cast=int)  # секунд до пересборки ленты local
+TIMELINE_SIZE = config('TIMELINE_SIZE', default=800, cast=int)  # постов в ленте пользователя
+TIMELINE_FANOUT_BATCH_SIZE = config('TIMELINE_FANOUT_BATCH_SIZE', default=1000, cast=int)
+# Посты авторов с таким числом подписчиков читаются при запросе ленты
+TIMELINE_CELEBRITY_THRESHOLD = config('TIMELINE_CELEBRITY_THRESHOLD', default=10000, cast=int)
+
+# Похожие посты (TF-IDF), пересчитываются при публикации и раз в сутки
+RELATED_POSTS_COUNT = config('RELATED_POSTS_COUNT', default=10, cast=int)
+RELATED_POSTS_BLOCK_SIZE = config('RELATED_POSTS_BLOCK_SIZE', default=256, cast=int)  # строк на умножение
+RELATED_POSTS_MIN_SCORE = config('RELATED_POSTS_MIN_SCORE', default=0.05, cast=float)
+
+# "Горячие" посты: (просмотры * вес + комментарии * вес) / (часы + 2) ** GRAVITY
+HOT_VIEW_WEIGHT = config('HOT_VIEW_WEIGHT', default=1.0, cast=float)
+HOT_COMMENT_WEIGHT = config('HOT_COMMENT_WEIGHT', default=5.0, cast=float)
+HOT_GRAVITY = config('HOT_GRAVITY', default=1.8, cast=float)
+HOT_WINDOW_DAYS = config('HOT_WINDOW_DAYS', default=30, cast=int)  # старые посты не пересчитываются
+HOT_BATCH_SIZE = config('HOT_BATCH_SIZE', default=50000, cast=int)
+# Оценка записывается, если изменилась больше чем на эту долю
+HOT_MIN_CHANGE = config('HOT_MIN_CHANGE', default=0.01, cast=float)
+HOT_REFRESH_INTERVAL = config('HOT_REFRESH_INTERVAL', default=300.0, cast=float)
+
+# Бюджет SQL-запросов на HTTP-запрос (см. apps/main/query_budget.py)
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=None, cast=lambda value: int(value) if value else None)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)  # исключение вместо записи в лог
+# Server-Timing и X-DB-Queries раскрывают время БД: по умолчанию только в DEBUG
+QUERY_TIMING_HEADERS = config('QUERY_TIMING_HEADERS', default=DEBUG, cast=bool)
+# Задержка перед каждым запросом к БД, мс: имитирует сетевой путь до БД в бенчмарках (bench_workers)
+QUERY_DELAY_MS = config('QUERY_DELAY_MS', default=0.0, cast=float)
+TEST_RUNNER = 'config.test_runner.QueryBudgetTestRunner'  # тесты - в строгом режиме
+
 # Celery Beat настройки для периодических задач
 CELERY_BEAT_SCHEDULE = {
     'check-expired-subscriptions': {
@@ -269,6 +359,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.subscribe.tasks.send_subscription_expiry_reminder',
         'schedule': 86400.0,  # Каждый день
     },
+    'flush-post-views': {
+        'task': 'apps.main.tasks.flush_post_views',
+        'schedule': VIEW_COUNTER_FLUSH_INTERVAL,
+    },
+    'rebuild-post-leaderboards': {
+        'task': 'apps.main.tasks.rebuild_post_leaderboards',
+        'schedule': 86400.0,  # Каждый день
+    },
+    'rollup-post-views': {
+        'task': 'apps.main.tasks.rollup_post_views',
+        'schedule': 3600.0,  # Каждый час
+    },
+    'refresh-hot-scores': {
+        'task': 'apps.main.tasks.refresh_post_hot_scores',
+        'schedule': HOT_REFRESH_INTERVAL,
+    },
+    'rebuild-related-posts': {
+        'task': 'apps.main.tasks.rebuild_post_related',
+        'schedule': 86400.0,  # Каждый день
+    },
     # 'cleanup-old-payments': {
     #     'task': 'apps.payment.tasks.cleanup_old_payments',
     #     'schedule': 604800.0,  # Каждую неделю